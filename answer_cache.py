@@ -0,0 +1,243 @@
+import hashlib
+import json
+import logging
+import os
+import string
+import threading
+import time
+
+from tool_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: set ANSWER_CACHE_PATH to a SQLite file to answer repeat questions without a run
+DEFAULT_ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH")
+DEFAULT_ANSWER_TTL = float(os.getenv("ANSWER_CACHE_TTL", "300"))
+DEFAULT_MEMORY_SIZE = 1024
+DEFAULT_DISK_SIZE = 100_000
+PRUNE_EVERY = 256  # stores between sweeps of the disk tier
+
+_STRIP = string.punctuation + string.whitespace
+
+
+def normalize_question(text):
+    """
+    Normalizes a question so that "Weather in SF?" and "weather in  sf" share an answer.
+    """
+    return " ".join(str(text).casefold().split()).strip(_STRIP)
+
+
+def question_key(question, context=()):
+    """
+    Returns the cache key of a question asked after the questions in `context`.
+
+    Earlier turns of a conversation change what a question means ("and
+    tomorrow?"), so they are part of the key.
+    """
+    parts = [normalize_question(q) for q in context] + [normalize_question(question)]
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def outputs_fingerprint(outputs):
+    """
+    Hashes the tool outputs an answer was written from.
+    """
+    canonical = json.dumps(list(outputs), separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def failed_output(output):
+    """
+    Tells whether a tool output reports a failure: an "Error: ..." string, or
+    a batch tool's JSON list with an entry that has an "error".
+    """
+    text = str(output)
+    if text.startswith("Error: "):
+        return True
+    if not text.startswith("["):
+        return False
+    try:
+        entries = json.loads(text)
+    except ValueError:
+        return False
+    return isinstance(entries, list) and any(isinstance(entry, dict) and "error" in entry for entry in entries)
+
+
+class AnswerCache:
+    """
+    Maps normalized questions to finished answers, so repeats skip the model.
+
+    An entry remembers the tool calls its answer came from and a fingerprint
+    of their outputs. On lookup the calls are replayed through `call_tool`
+    (normally served from the tool caches in microseconds) and the entry is
+    only used if the outputs are unchanged; otherwise it is dropped. Entries
+    also expire after `ttl` seconds.
+
+    Entries live in a bounded in-memory LRU tier in front of an optional
+    SQLite file, so answers survive restarts and are shared between
+    processes using the same file.
+
+    Args:
+        call_tool: Function (name, arguments JSON) -> output string, used to replay tool calls.
+        path: SQLite file for the disk tier, or None for memory only.
+        ttl: Seconds an answer stays valid.
+        memory_size: Maximum entries in the memory tier.
+        disk_size: Maximum entries kept on disk.
+        clock: Function returning the current Unix time.
+    """
+
+    def __init__(self, call_tool, path=DEFAULT_ANSWER_CACHE_PATH, ttl=DEFAULT_ANSWER_TTL,
+                 memory_size=DEFAULT_MEMORY_SIZE, disk_size=DEFAULT_DISK_SIZE, clock=time.time):
+        self.call_tool = call_tool
+        self.path = path
+        self.ttl = ttl
+        self.disk_size = disk_size
+        self.clock = clock
+        self.memory = TTLCache(ttl=ttl, maxsize=memory_size)
+        self._lock = threading.Lock()
+        self._db = None
+        self._stores_since_prune = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.stores = 0
+        if path:
+            import sqlite3
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, question TEXT, answer TEXT, tool_calls TEXT, "
+                "fingerprint TEXT, expires_at REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS answers_expires_at ON answers (expires_at)")
+            self._prune()
+
+    def get(self, question, context=()):
+        """
+        Returns the cached answer for a question, or None.
+
+        Args:
+            question: The user's message.
+            context: The earlier questions of the conversation, oldest first.
+        """
+        key = question_key(question, context)
+        entry = self.memory.get(key)
+        if entry is None:
+            entry = self._disk_get(key)
+            if entry is not None:
+                self.disk_hits += 1
+                self.memory.set(key, entry)
+        if entry is None or entry["expires_at"] <= self.clock():
+            self.misses += 1
+            return None
+
+        if not self._still_valid(entry):
+            logger.debug(f"Answer for {question!r} is stale: its tool outputs changed")
+            self.invalidate(key)
+            self.stale += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["answer"]
+
+    def put(self, question, answer, tool_calls=(), context=()):
+        """
+        Stores the answer to a question.
+
+        Answers whose tool calls failed, including a single location of a
+        batch call, are not stored, since the failure is usually transient.
+
+        Args:
+            question: The user's message.
+            answer: The assistant's reply text.
+            tool_calls: Dicts with the "name", "arguments" and "output" of every tool call the run made.
+            context: The earlier questions of the conversation, oldest first.
+        """
+        if not answer:
+            return
+        tool_calls = list(tool_calls)
+        outputs = [call["output"] for call in tool_calls]
+        if any(failed_output(output) for output in outputs):
+            return
+        key = question_key(question, context)
+        entry = {
+            "answer": answer,
+            "tool_calls": [{"name": call["name"], "arguments": call["arguments"]} for call in tool_calls],
+            "fingerprint": outputs_fingerprint(outputs),
+            "expires_at": self.clock() + self.ttl,
+        }
+        self.memory.set(key, entry)
+        self.stores += 1
+        if self._db is not None:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, normalize_question(question), answer, json.dumps(entry["tool_calls"]),
+                     entry["fingerprint"], entry["expires_at"]),
+                )
+                self._stores_since_prune += 1
+                if self._stores_since_prune >= PRUNE_EVERY:
+                    self._prune_locked()
+
+    def invalidate(self, key):
+        self.memory.pop(key)
+        if self._db is not None:
+            with self._lock:
+                self._db.execute("DELETE FROM answers WHERE key = ?", (key,))
+
+    def _still_valid(self, entry):
+        try:
+            outputs = [self.call_tool(call["name"], call["arguments"]) for call in entry["tool_calls"]]
+        except Exception as e:
+            logger.debug(f"Replaying tool calls failed: {e}")
+            return False
+        return outputs_fingerprint(outputs) == entry["fingerprint"]
+
+    def _disk_get(self, key):
+        if self._db is None:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT answer, tool_calls, fingerprint, expires_at FROM answers WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        answer, tool_calls, fingerprint, expires_at = row
+        return {"answer": answer, "tool_calls": json.loads(tool_calls),
+                "fingerprint": fingerprint, "expires_at": expires_at}
+
+    def _prune(self):
+        with self._lock:
+            self._prune_locked()
+
+    def _prune_locked(self):
+        # Drop expired answers, then the soonest to expire beyond disk_size
+        self._stores_since_prune = 0
+        self._db.execute("DELETE FROM answers WHERE expires_at <= ?", (self.clock(),))
+        self._db.execute(
+            "DELETE FROM answers WHERE key IN ("
+            "SELECT key FROM answers ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.disk_size,),
+        )
+
+    def close(self):
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+                self._db = None
+
+    def stats(self):
+        """
+        Returns the cache counters as a dict.
+        """
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "stores": self.stores,
+            "memory": self.memory.stats(),
+        }
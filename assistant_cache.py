@@ -0,0 +1,130 @@
+from collections import namedtuple
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.getenv("ASSISTANT_CACHE_PATH", ".assistant_cache.json")
+
+# Stand-in for the Assistant object when the ID comes from the local cache.
+# The chat loops only ever read `assistant.id`.
+CachedAssistant = namedtuple("CachedAssistant", ["id", "model", "instructions"])
+
+
+def assistant_fingerprint(model, instructions, tools):
+    """
+    Hashes an assistant definition so that any change to the model,
+    instructions or tool schemas produces a different fingerprint.
+    """
+    definition = {"model": model, "instructions": instructions, "tools": tools}
+    canonical = json.dumps(definition, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def remote_fingerprint(assistant):
+    """
+    Fingerprints an Assistant returned by the API, comparably to `assistant_fingerprint`.
+    """
+    tools = []
+    for tool in assistant.tools or []:
+        tool = tool.model_dump(exclude_none=True) if hasattr(tool, "model_dump") else dict(tool)
+        function = tool.get("function")
+        if isinstance(function, dict) and function.get("strict") is False:
+            # The API reports the default explicitly; local definitions leave it out
+            tool["function"] = {key: value for key, value in function.items() if key != "strict"}
+        tools.append(tool)
+    return assistant_fingerprint(assistant.model, assistant.instructions, tools)
+
+
+def load_cache(path=DEFAULT_CACHE_PATH):
+    """
+    Reads the assistant cache file, returning an empty dict if it is missing or corrupt.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable assistant cache {path}: {e}")
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def save_cache(data, path=DEFAULT_CACHE_PATH):
+    """
+    Writes the assistant cache file atomically.
+    """
+    import tempfile
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".assistant_cache-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def get_cached_assistant(client, model, instructions, tools, assistant_id=None,
+                         name="weather-bot", path=DEFAULT_CACHE_PATH):
+    """
+    Returns the assistant for a definition, calling the API only when it changed.
+
+    When the cached fingerprint for `name` matches the definition, the cached
+    ID is returned without any network round trip. Otherwise the known
+    assistant (the cached one, or `assistant_id`) is retrieved and only updated
+    in place if its remote definition differs, or a new one is created if
+    there is none, and the cache is rewritten.
+
+    Args:
+        client: The initialized API client.
+        model: The model the assistant should use.
+        instructions: The assistant's instructions.
+        tools: The `tools=[...]` payload.
+        assistant_id: Optional ID of an existing assistant to reuse.
+        name: Cache slot, so several assistant definitions can share one file.
+        path: Location of the cache file.
+
+    Returns:
+        An Assistant object, or a CachedAssistant when served from the cache.
+    """
+    fingerprint = assistant_fingerprint(model, instructions, tools)
+    cache = load_cache(path)
+    entry = cache.get(name) or {}
+
+    if entry.get("fingerprint") == fingerprint and assistant_id in (None, entry.get("id")):
+        logger.debug(f"Using cached assistant {entry['id']}")
+        return CachedAssistant(entry["id"], model, instructions)
+
+    target_id = assistant_id or entry.get("id")
+    assistant = None
+    if target_id is not None:
+        from openai import NotFoundError
+        try:
+            assistant = client.beta.assistants.retrieve(target_id)
+        except NotFoundError:
+            logger.warning(f"Assistant {target_id} no longer exists; creating a new one")
+        if assistant is not None and remote_fingerprint(assistant) != fingerprint:
+            assistant = client.beta.assistants.update(
+                target_id,
+                model=model,
+                instructions=instructions,
+                tools=tools,
+            )
+            logger.info(f"Updated assistant {assistant.id} to the current definition")
+
+    if assistant is None:
+        assistant = client.beta.assistants.create(
+            model=model,
+            instructions=instructions,
+            tools=tools,
+        )
+        logger.info(f"Created assistant {assistant.id}")
+
+    cache[name] = {"id": assistant.id, "fingerprint": fingerprint}
+    save_cache(cache, path)
+    return assistant
@@ -0,0 +1,241 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+if __name__ == "__main__":
+    # Project modules read their settings from the environment when they are
+    # imported, so the .env file has to be loaded before any of them
+    from dotenv import load_dotenv
+    load_dotenv()
+
+from main import get_assistant, initialize_client, message_text, run_turn
+from weather_tools import new_answer_cache, new_executor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 8
+
+
+def read_questions(lines, id_field="id", question_field="question"):
+    """
+    Parses JSONL question rows.
+
+    Each line is either a JSON object with an id and a question, or a bare JSON
+    string. Rows without an id are numbered by their line.
+
+    Yields:
+        (row_id, question, row) tuples.
+    """
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            logger.warning(f"Skipping line {line_number}: {e}")
+            continue
+        if isinstance(row, str):
+            row = {question_field: row}
+        if not isinstance(row, dict) or not str(row.get(question_field, "")).strip():
+            logger.warning(f"Skipping line {line_number}: no '{question_field}'")
+            continue
+        row_id = str(row.get(id_field, line_number))
+        yield row_id, str(row[question_field]).strip(), row
+
+
+def load_finished(output_path):
+    """
+    Returns the ids already answered successfully in an existing output file.
+
+    The output file doubles as the checkpoint: every finished row is appended
+    and flushed as soon as it completes, so an interrupted job can be resumed
+    by skipping these ids. Rows that failed are retried.
+    """
+    finished = set()
+    if not os.path.exists(output_path):
+        return finished
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A partially written last line from an interrupted run
+                continue
+            if record.get("status") == "completed":
+                finished.add(str(record.get("id")))
+    return finished
+
+
+def usage_dict(run):
+    usage = getattr(run, "usage", None)
+    if usage is None:
+        return None
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens,
+    }
+
+
+def answer_question(client, assistant, executor, row_id, question, keep_threads=False, answer_cache=None):
+    """
+    Answers one question in its own thread and returns the output record.
+
+    With an AnswerCache, a repeat question is answered from the cache
+    without creating a thread or a run.
+    """
+    started = time.perf_counter()
+    record = {"id": row_id, "question": question}
+    if answer_cache is not None:
+        cached = answer_cache.get(question)
+        if cached is not None:
+            record.update({"status": "completed", "answer": cached, "cached": True})
+            record["latency_s"] = round(time.perf_counter() - started, 3)
+            return record
+
+    thread = None
+    try:
+        thread = client.beta.threads.create()
+        result = run_turn(client, assistant, thread.id, question, executor)
+        record.update({
+            "status": result.run.status,
+            "answer": message_text(result.reply),
+            "usage": usage_dict(result.run),
+            "tool_calls": result.tool_calls,
+            "polls": sum(stats.polls for stats in result.poll_stats),
+            "poll_added_latency_s": round(sum(stats.max_added_latency for stats in result.poll_stats), 3),
+            "thread_id": thread.id,
+        })
+        if answer_cache is not None and result.reply is not None:
+            answer_cache.put(question, record["answer"], result.tool_calls)
+    except Exception as e:
+        record.update({"status": "error", "error": str(e)})
+    finally:
+        if thread is not None and not keep_threads:
+            try:
+                client.beta.threads.delete(thread.id)
+            except Exception as e:
+                logger.warning(f"Failed to delete thread {thread.id}: {e}")
+    record["latency_s"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def run_batch(client, assistant, rows, output, concurrency=DEFAULT_CONCURRENCY,
+              finished=frozenset(), keep_threads=False, answer_cache=None):
+    """
+    Answers question rows concurrently and writes each record as soon as it is done.
+
+    Args:
+        client: The initialized API client.
+        assistant: The assistant instance to interact with.
+        rows: Iterable of (row_id, question, row) tuples.
+        output: Writable text file receiving one JSON record per line.
+        concurrency: Maximum number of questions in flight.
+        finished: Ids to skip because they were answered in an earlier run.
+        keep_threads: Keep each question's thread instead of deleting it.
+        answer_cache: Optional AnswerCache for repeat questions.
+
+    Returns:
+        A dict of counters.
+    """
+    executor = new_executor()
+    write_lock = threading.Lock()
+    # Bounds in-flight work so a huge input file is not read into memory at once
+    slots = threading.BoundedSemaphore(concurrency)
+    counts = {"submitted": 0, "skipped": 0, "completed": 0, "failed": 0, "cached": 0}
+
+    def work(row_id, question):
+        try:
+            record = answer_question(client, assistant, executor, row_id, question, keep_threads, answer_cache)
+            line = json.dumps(record, ensure_ascii=False)
+            with write_lock:
+                output.write(line + "\n")
+                output.flush()
+                counts["completed" if record["status"] == "completed" else "failed"] += 1
+                counts["cached"] += bool(record.get("cached"))
+        finally:
+            slots.release()
+
+    pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch")
+    try:
+        for row_id, question, _ in rows:
+            if row_id in finished:
+                counts["skipped"] += 1
+                continue
+            slots.acquire()
+            counts["submitted"] += 1
+            pool.submit(work, row_id, question)
+        pool.shutdown(wait=True)
+    except KeyboardInterrupt:
+        # Finished rows are already on disk; rerun the same command to resume
+        pool.shutdown(wait=True, cancel_futures=True)
+        raise
+    finally:
+        executor.shutdown()
+    return counts
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Answer weather questions from a JSONL file in bulk.")
+    parser.add_argument("input", help="JSONL file of questions, or '-' for stdin")
+    parser.add_argument("-o", "--output", required=True,
+                        help="JSONL file receiving answers; also used to resume an interrupted job")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--assistant-id", default=None)
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--question-field", default="question")
+    parser.add_argument("--keep-threads", action="store_true",
+                        help="Do not delete each question's thread after answering it")
+    parser.add_argument("--answer-cache", default=None,
+                        help="SQLite file of earlier answers to reuse for repeat questions "
+                             "(default: ANSWER_CACHE_PATH, if set)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.concurrency < 1:
+        print("--concurrency must be at least 1.")
+        sys.exit(2)
+
+    try:
+        # Batch calls queue behind interactive ones sharing the same account limits
+        client = initialize_client().with_lane("batch")
+        assistant = get_assistant(client, args.assistant_id)
+        answer_cache = new_answer_cache(args.answer_cache)
+    except Exception as init_e:
+        print(f"Failed to initialize client or assistant: {init_e}")
+        sys.exit(1)
+
+    finished = load_finished(args.output)
+    source = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8")
+    started = time.perf_counter()
+    try:
+        with source, open(args.output, "a", encoding="utf-8") as output:
+            counts = run_batch(
+                client,
+                assistant,
+                read_questions(source, args.id_field, args.question_field),
+                output,
+                concurrency=args.concurrency,
+                finished=finished,
+                keep_threads=args.keep_threads,
+                answer_cache=answer_cache,
+            )
+    except KeyboardInterrupt:
+        print("\nInterrupted. Run the same command again to resume.")
+        sys.exit(130)
+    finally:
+        if answer_cache is not None:
+            answer_cache.close()
+        from http_client import close_pool
+        close_pool()
+
+    counts["elapsed_s"] = round(time.perf_counter() - started, 3)
+    print(json.dumps(counts), file=sys.stderr)
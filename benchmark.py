@@ -0,0 +1,322 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import warnings
+
+import gazetteer
+import get_current_temperature
+import get_rain_probability
+from http_client import new_client, pool_stats
+import main
+import main_stream
+from mock_server import MockScript, MockServer, weather_tool_rounds
+from run_poller import AdaptivePoller
+from tool_executor import ToolExecutor
+from weather_tools import INSTRUCTIONS, MODEL, registry
+
+logger = logging.getLogger(__name__)
+
+QUESTION = "What's the weather in San Francisco today and the likelihood it'll rain?"
+DEFAULT_TOLERANCE = 0.25  # allowed slowdown against a baseline before a metric counts as a regression
+DEFAULT_MIN_DELTA = 0.01  # seconds; smaller slowdowns are treated as noise
+
+
+class TurnClock:
+    """
+    Collects timestamps for the turn running on each thread.
+
+    The HTTP hooks and the tool executor only know which thread they run on,
+    so every mark is filed under the current thread's ident.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._marks = {}
+
+    def reset(self):
+        with self._lock:
+            self._marks[threading.get_ident()] = {"tool_starts": [], "submit_responses": []}
+
+    def mark(self, name, value=None):
+        value = time.perf_counter() if value is None else value
+        with self._lock:
+            marks = self._marks.setdefault(threading.get_ident(), {"tool_starts": [], "submit_responses": []})
+            if isinstance(marks.get(name), list):
+                marks[name].append(value)
+            else:
+                marks.setdefault(name, value)
+
+    def take(self):
+        with self._lock:
+            return self._marks.pop(threading.get_ident(), {})
+
+
+class TimedExecutor(ToolExecutor):
+    """
+    ToolExecutor that marks when each round of tool calls starts.
+    """
+
+    def __init__(self, clock, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.clock = clock
+
+    def run(self, tool_calls):
+        self.clock.mark("tool_starts")
+        return super().run(tool_calls)
+
+
+def build_client(base_url, clock):
+    def on_response(response):
+        if response.request.url.path.endswith("/submit_tool_outputs"):
+            clock.mark("submit_responses")
+
+    # Sessions share one connection pool, like the real entry points
+    return new_client(event_hooks={"response": [on_response]}, base_url=base_url, api_key="mock", max_retries=0)
+
+
+def percentiles(samples):
+    """
+    Summarizes a list of seconds as count/mean/p50/p95/p99.
+    """
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+    }
+
+
+def scripted_time(script):
+    """
+    Seconds the mock server deliberately spends on one turn; the rest is our overhead.
+    """
+    chunks = sum(1 for _ in script.reply_chunks())
+    return script.think_time * (len(script.tool_rounds) + 1) + script.token_delay * max(0, chunks - 1)
+
+
+def tool_round_trips(marks):
+    # Time from learning about a requires_action to the resumed run being accepted
+    return [end - start for start, end in zip(marks.get("tool_starts", []), marks.get("submit_responses", []))]
+
+
+def polling_session(client, assistant, executor, poller, clock, turns):
+    thread = client.beta.threads.create()
+    samples = []
+    for _ in range(turns):
+        clock.reset()
+        started = time.perf_counter()
+        result = main.run_turn(client, assistant, thread.id, QUESTION, executor, poller=poller)
+        finished = time.perf_counter()
+        if result.run.status != "completed":
+            raise RuntimeError(f"Run ended with status {result.run.status}")
+        samples.append({"turn_s": finished - started, "tool_rtt_s": tool_round_trips(clock.take()),
+                        "polls": sum(stats.polls for stats in result.poll_stats)})
+    return samples
+
+
+class TimedEventHandler(main_stream.EventHandler):
+    """
+    EventHandler that marks the first token instead of printing the reply.
+    """
+
+    def __init__(self, client, executor, clock):
+        super().__init__(client, executor)
+        self.clock = clock
+
+    def on_text_delta(self, text):
+        self.clock.mark("first_token")
+
+    def on_run_done(self):
+        pass
+
+
+def streaming_session(client, assistant, executor, clock, turns):
+    thread = client.beta.threads.create()
+    handler = TimedEventHandler(client, executor, clock)
+    samples = []
+    for _ in range(turns):
+        clock.reset()
+        started = time.perf_counter()
+        client.beta.threads.messages.create(thread_id=thread.id, role="user", content=QUESTION)
+        run = main_stream.run_stream(client, thread.id, assistant.id, handler)
+        finished = time.perf_counter()
+        if run.status != "completed":
+            raise RuntimeError(f"Run ended with status {run.status}")
+        marks = clock.take()
+        samples.append({
+            "turn_s": finished - started,
+            "ttft_s": marks["first_token"] - started if "first_token" in marks else None,
+            "tool_rtt_s": tool_round_trips(marks),
+        })
+    return samples
+
+
+def run_sessions(session, sessions, concurrency):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: session(), range(sessions)))
+    elapsed = time.perf_counter() - started
+    return [sample for samples in results for sample in samples], elapsed
+
+
+def summarize(samples, elapsed, sessions, script):
+    baseline = scripted_time(script)
+    turn = [s["turn_s"] for s in samples]
+    report = {
+        "sessions": sessions,
+        "turns": len(samples),
+        "sessions_per_s": sessions / elapsed if elapsed else 0.0,
+        "turn_s": percentiles(turn),
+        "overhead_s": percentiles([t - baseline for t in turn]),
+        "tool_rtt_s": percentiles([rtt for s in samples for rtt in s["tool_rtt_s"]]),
+    }
+    ttft = [s["ttft_s"] for s in samples if s.get("ttft_s") is not None]
+    if ttft:
+        report["ttft_s"] = percentiles(ttft)
+    if samples and "polls" in samples[0]:
+        report["polls_per_turn"] = sum(s["polls"] for s in samples) / len(samples)
+    return report
+
+
+def run_benchmark(script, sessions=20, turns=2, concurrency=4):
+    """
+    Runs both chat paths against a fresh mock server and returns the report dict.
+    """
+    clock = TurnClock()
+    report = {
+        "config": {
+            "sessions": sessions,
+            "turns_per_session": turns,
+            "concurrency": concurrency,
+            "tool_rounds": len(script.tool_rounds),
+            "think_time": script.think_time,
+            "token_delay": script.token_delay,
+            "scripted_turn_s": scripted_time(script),
+        }
+    }
+    with MockServer(script) as server:
+        client = build_client(server.base_url, clock)
+        assistant = client.beta.assistants.create(
+            model=MODEL, instructions=INSTRUCTIONS, tools=registry.tools_payload()
+        )
+
+        executor = TimedExecutor(clock, registry.handle_tool_call, call_batch=registry.handle_tool_calls,
+                                 can_batch=registry.supports_batch)
+        poller = AdaptivePoller()
+        samples, elapsed = run_sessions(
+            lambda: polling_session(client, assistant, executor, poller, clock, turns), sessions, concurrency
+        )
+        report["polling"] = summarize(samples, elapsed, sessions, script)
+
+        samples, elapsed = run_sessions(
+            lambda: streaming_session(client, assistant, executor, clock, turns), sessions, concurrency
+        )
+        report["streaming"] = summarize(samples, elapsed, sessions, script)
+
+        report["mock_requests"] = server.state.requests
+        report["http_pool"] = pool_stats()
+    return report
+
+
+def find_regressions(report, baseline, tolerance=DEFAULT_TOLERANCE, min_delta=DEFAULT_MIN_DELTA):
+    """
+    Compares p50 latencies and throughput against a baseline report.
+
+    Returns:
+        A list of human-readable regression descriptions (empty if none).
+    """
+    regressions = []
+    for path in ("polling", "streaming"):
+        for metric in ("turn_s", "overhead_s", "tool_rtt_s", "ttft_s"):
+            current = report.get(path, {}).get(metric, {}).get("p50")
+            previous = baseline.get(path, {}).get(metric, {}).get("p50")
+            if current is None or previous is None or previous <= 0:
+                continue
+            if current > previous * (1 + tolerance) and current - previous > min_delta:
+                regressions.append(f"{path}.{metric}.p50: {current:.4f}s vs baseline {previous:.4f}s")
+        current = report.get(path, {}).get("sessions_per_s")
+        previous = baseline.get(path, {}).get("sessions_per_s")
+        if current and previous and current < previous * (1 - tolerance):
+            regressions.append(f"{path}.sessions_per_s: {current:.2f} vs baseline {previous:.2f}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the chat loops against a local mock Assistants API.")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=2, help="Turns per session")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--tool-rounds", type=int, default=1)
+    parser.add_argument("--locations", type=int, default=1, help="Cities asked about in each tool round")
+    parser.add_argument("--grid", help="Answer temperatures from this weather_grid.py file; "
+                                           "'synthetic' generates one in a temporary directory")
+    parser.add_argument("--rain", help="Answer rain probabilities from these rain_climatology.py tables; "
+                                           "'synthetic' builds them from generated history")
+    parser.add_argument("--think-time", type=float, default=0.05)
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="Fail if results regress against this JSON report")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--min-delta", type=float, default=DEFAULT_MIN_DELTA)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # Per-request logs and SDK deprecation notices would drown out the report
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    warnings.simplefilter("ignore", DeprecationWarning)
+
+    locations = [f"City {i}" for i in range(args.locations)]
+    if args.grid:
+        grid_path = args.grid
+        if grid_path == "synthetic":
+            from weather_grid import write_synthetic_grid
+            grid_path = os.path.join(tempfile.mkdtemp(), "synthetic.wgrid")
+            write_synthetic_grid(grid_path)
+        get_current_temperature.GRID_PATH = grid_path
+    if args.rain:
+        table_path = args.rain
+        if table_path == "synthetic":
+            from rain_climatology import build_from_history, write_synthetic_precipitation
+            directory = tempfile.mkdtemp()
+            table_path = os.path.join(directory, "synthetic.rclm")
+            build_from_history(write_synthetic_precipitation(os.path.join(directory, "history.wgrid")), table_path)
+        get_rain_probability.TABLE_PATH = table_path
+    if args.grid or args.rain:
+        # Ask about places the data backends can resolve
+        known = sorted(gazetteer.LOCATIONS)
+        locations = [known[i % len(known)] for i in range(args.locations)]
+    script = MockScript(
+        tool_rounds=weather_tool_rounds(args.tool_rounds, locations),
+        think_time=args.think_time,
+        token_delay=args.token_delay,
+    )
+    report = run_benchmark(script, args.sessions, args.turns, args.concurrency)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = find_regressions(report, json.load(f), args.tolerance, args.min_delta)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
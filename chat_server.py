@@ -0,0 +1,446 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import uuid
+
+from dotenv import load_dotenv
+from openai import AsyncAssistantEventHandler
+from typing_extensions import override
+
+if __name__ == "__main__":
+    # Project modules read their settings from the environment when they are imported
+    load_dotenv()
+
+from assistant_cache import get_cached_assistant
+from http_client import new_async_client, new_client, stream_timeout
+from main_stream import DEFAULT_MAX_TOOL_ROUNDS
+from output_sink import AsyncQueueSink
+from weather_tools import INSTRUCTIONS, MODEL, new_answer_cache, new_executor, registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENT_RUNS = 64
+DEFAULT_MAX_SESSIONS = 1000
+DEFAULT_QUEUE_SIZE = 256  # buffered text deltas per session before the run is paused
+
+# Marks the end of a turn in a session queue
+_END_OF_TURN = object()
+
+
+class AsyncEventHandler(AsyncAssistantEventHandler):
+    """
+    Async counterpart of main_stream.EventHandler.
+
+    Text deltas are coalesced by an AsyncQueueSink into the session's bounded
+    queue instead of being printed. When the queue is full, the sink blocks,
+    which pauses reading from this run's stream until the client catches up.
+    A `requires_action` event is only recorded here; the turn loop in
+    ChatServer submits the outputs. Deltas are also appended to
+    `transcript` when given, so the turn's full reply can be cached.
+    """
+
+    def __init__(self, sink, transcript=None):
+        super().__init__()
+        self.sink = sink
+        self.transcript = transcript
+        self.required_action = None
+
+    @override
+    async def on_event(self, event):
+        if event.event == 'thread.run.requires_action':
+            self.required_action = event.data
+
+    @override
+    async def on_text_delta(self, delta, snapshot):
+        if delta.value:
+            if self.transcript is not None:
+                self.transcript.append(delta.value)
+            await self.sink.write(delta.value)
+
+
+class Session:
+    """
+    One conversation, backed by one OpenAI thread.
+    """
+
+    def __init__(self, thread_id, session_id=None):
+        self.id = session_id or uuid.uuid4().hex
+        self.thread_id = thread_id
+        # Bounded queue of text deltas for the turn in progress
+        self.queue = None
+        # A thread only accepts one active run at a time
+        self.lock = asyncio.Lock()
+        # Questions asked so far, and cached exchanges not yet posted to the thread
+        self.asked = []
+        self.unsynced = []
+
+
+class ChatServer:
+    """
+    Serves many concurrent conversations from one process.
+
+    Each session owns a thread and a bounded delta queue. A global semaphore
+    limits how many runs stream at once, and a per-session lock keeps turns
+    of the same conversation in order. Replies are sent to clients as
+    Server-Sent Events.
+
+    Args:
+        client: The AsyncOpenAI client.
+        assistant: The assistant to run (only `assistant.id` is used).
+        max_concurrent_runs: Maximum number of runs streaming at the same time.
+        max_sessions: Maximum number of open sessions.
+        queue_size: Maximum buffered text deltas per session.
+        executor: ToolExecutor used for tool calls.
+        answer_cache: Optional AnswerCache answering repeat questions without a run.
+    """
+
+    def __init__(self, client, assistant, max_concurrent_runs=DEFAULT_MAX_CONCURRENT_RUNS,
+                 max_sessions=DEFAULT_MAX_SESSIONS, queue_size=DEFAULT_QUEUE_SIZE, executor=None,
+                 answer_cache=None):
+        self.client = client
+        self.assistant = assistant
+        self.answer_cache = answer_cache
+        self.max_sessions = max_sessions
+        self.queue_size = queue_size
+        self.executor = executor or new_executor()
+        self.sessions = {}
+        self._run_slots = asyncio.Semaphore(max_concurrent_runs)
+        # Turns being streamed to a client; `drain` waits for them
+        self.active_turns = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    async def create_session(self, thread_id=None, session_id=None):
+        """
+        Opens a conversation and returns its Session.
+
+        Args:
+            thread_id: An existing thread to continue, instead of creating one.
+            session_id: The ID to give the session, instead of a random one.
+        """
+        if len(self.sessions) >= self.max_sessions:
+            raise RuntimeError("Too many open sessions.")
+        if thread_id is None:
+            thread = await self.client.beta.threads.create()
+            thread_id = thread.id
+        session = Session(thread_id, session_id)
+        self.sessions[session.id] = session
+        return session
+
+    async def close_session(self, session_id):
+        self.sessions.pop(session_id, None)
+
+    async def run_turn(self, session, user_input, queue):
+        """
+        Answers the user's message and streams the reply into `queue`.
+
+        A repeat question found in the answer cache is answered without
+        taking a run slot; anything else goes to `run_assistant`.
+        """
+        # One sink per turn, shared by every round's handler
+        sink = AsyncQueueSink(queue)
+        try:
+            async with session.lock:
+                cached = None
+                if self.answer_cache is not None:
+                    # Replaying the answer's tool calls may block, like any tool call
+                    cached = await asyncio.to_thread(self.answer_cache.get, user_input, session.asked)
+                if cached is not None:
+                    await sink.write(cached)
+                    await sink.flush()
+                    session.asked.append(user_input)
+                    session.unsynced.append((user_input, cached))
+                else:
+                    await self.run_assistant(session, user_input, sink)
+        except Exception:
+            await sink.flush()
+            await queue.put(_END_OF_TURN)
+            raise
+        finally:
+            sink.discard()
+        # Not reached on cancellation: the client went away and nobody reads the queue
+        await queue.put(_END_OF_TURN)
+
+    async def run_assistant(self, session, user_input, sink):
+        """
+        Posts the user's message and streams the run's reply into `sink`.
+
+        Rounds of tool calls are handled in a loop: each `requires_action`
+        is answered by one `submit_tool_outputs_stream` call, up to
+        DEFAULT_MAX_TOOL_ROUNDS rounds before the run is cancelled.
+        """
+        transcript = []
+        answered = []  # every tool call of the turn, for the answer cache
+        async with self._run_slots:
+            # Bring the thread up to date with answers served from the cache
+            for question, answer in session.unsynced:
+                await self.client.beta.threads.messages.create(
+                    thread_id=session.thread_id, role="user", content=question)
+                await self.client.beta.threads.messages.create(
+                    thread_id=session.thread_id, role="assistant", content=answer)
+            session.unsynced.clear()
+
+            await self.client.beta.threads.messages.create(
+                thread_id=session.thread_id,
+                role="user",
+                content=user_input,
+            )
+
+            handler = AsyncEventHandler(sink, transcript)
+            stream_manager = self.client.beta.threads.runs.stream(
+                thread_id=session.thread_id,
+                assistant_id=self.assistant.id,
+                event_handler=handler,
+                timeout=stream_timeout(),
+            )
+            rounds = 0
+            while True:
+                async with stream_manager as stream:
+                    await stream.until_done()
+
+                # Deliver what was said before the tools run, or the end of the reply
+                await sink.flush()
+                if handler.required_action is None:
+                    break
+
+                run = handler.required_action
+                if rounds >= DEFAULT_MAX_TOOL_ROUNDS:
+                    await self.client.beta.threads.runs.cancel(run.id, thread_id=session.thread_id)
+                    raise RuntimeError(
+                        f"Run {run.id} needed more than {DEFAULT_MAX_TOOL_ROUNDS} rounds of tool calls."
+                    )
+                rounds += 1
+                tool_calls = run.required_action.submit_tool_outputs.tool_calls
+                # Tools are blocking functions, so keep them off the event loop
+                tool_outputs = await asyncio.to_thread(self.executor.run, tool_calls)
+                answered.extend(
+                    {"name": tool.function.name, "arguments": tool.function.arguments, "output": output["output"]}
+                    for tool, output in zip(tool_calls, tool_outputs)
+                )
+
+                handler = AsyncEventHandler(sink, transcript)
+                stream_manager = self.client.beta.threads.runs.submit_tool_outputs_stream(
+                    thread_id=session.thread_id,
+                    run_id=run.id,
+                    tool_outputs=tool_outputs,
+                    event_handler=handler,
+                    timeout=stream_timeout(),
+                )
+
+        if self.answer_cache is not None:
+            await asyncio.to_thread(self.answer_cache.put, user_input, "".join(transcript).strip(), answered,
+                                    list(session.asked))
+        session.asked.append(user_input)
+
+    async def drain(self, timeout=None):
+        """
+        Waits until no turn is being streamed.
+
+        Returns:
+            False if `timeout` ran out first.
+        """
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def stream_turn(self, session, user_input):
+        """
+        Runs a turn and yields its text deltas as they arrive.
+        """
+        # A fresh queue per turn, so nothing left over from an abandoned turn leaks into this one
+        session.queue = asyncio.Queue(maxsize=self.queue_size)
+        producer = asyncio.create_task(self.run_turn(session, user_input, session.queue))
+        try:
+            while True:
+                item = await session.queue.get()
+                if item is _END_OF_TURN:
+                    break
+                yield item
+            # Re-raise any error from the run
+            await producer
+        finally:
+            if not producer.done():
+                producer.cancel()
+
+    # --- HTTP -----------------------------------------------------------------
+
+    async def handle_connection(self, reader, writer):
+        try:
+            request = await read_request(reader)
+            if request is None:
+                return
+            method, path, _, body = request
+            await self.route(method, path, body, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logger.exception("Request failed")
+            await send_json(writer, 500, {"error": str(e)})
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body, writer):
+        parts = [part for part in path.split("?", 1)[0].split("/") if part]
+
+        if method == "POST" and parts == ["sessions"]:
+            try:
+                options = json.loads(body or b"{}")
+            except ValueError:
+                options = {}
+            try:
+                # A dispatcher in front of several workers hands each one its threads
+                session = await self.create_session(options.get("thread_id"), options.get("session_id"))
+            except RuntimeError as e:
+                await send_json(writer, 503, {"error": str(e)})
+                return
+            await send_json(writer, 201, {"session_id": session.id, "thread_id": session.thread_id})
+            return
+
+        if len(parts) >= 2 and parts[0] == "sessions":
+            session = self.sessions.get(parts[1])
+            if session is None:
+                await send_json(writer, 404, {"error": "Unknown session."})
+                return
+            if method == "DELETE" and len(parts) == 2:
+                await self.close_session(session.id)
+                await send_json(writer, 200, {"deleted": session.id})
+                return
+            if method == "POST" and parts[2:] == ["messages"]:
+                try:
+                    content = json.loads(body or b"{}").get("content", "").strip()
+                except ValueError:
+                    content = ""
+                if not content:
+                    await send_json(writer, 400, {"error": "Missing 'content'."})
+                    return
+                await self.send_sse(writer, session, content)
+                return
+
+        await send_json(writer, 404, {"error": "Not found."})
+
+    async def send_sse(self, writer, session, content):
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        deltas = self.stream_turn(session, content)
+        self.active_turns += 1
+        self._idle.clear()
+        try:
+            async for delta in deltas:
+                writer.write(f"data: {json.dumps({'delta': delta})}\n\n".encode("utf-8"))
+                # Waits only on this client's socket, so a slow reader never blocks other sessions
+                await writer.drain()
+            writer.write(b"event: done\ndata: {}\n\n")
+        except ConnectionError:
+            raise
+        except Exception as e:
+            logger.exception(f"Turn failed for session {session.id}")
+            writer.write(f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n".encode("utf-8"))
+        finally:
+            # Stops the run right away if the client disconnected mid-stream
+            await deltas.aclose()
+            self.active_turns -= 1
+            if not self.active_turns:
+                self._idle.set()
+        await writer.drain()
+
+    async def serve(self, host="127.0.0.1", port=8000):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        logger.info(f"Serving on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+_REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+            500: "Internal Server Error", 502: "Bad Gateway", 503: "Service Unavailable"}
+
+
+async def read_request(reader):
+    """
+    Reads one HTTP request.
+
+    Returns:
+        (method, path, headers, body), or None if the client sent nothing.
+    """
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    body = b""
+    length = int(headers.get("content-length", 0))
+    if length:
+        body = await reader.readexactly(length)
+    return method, path, headers, body
+
+
+async def send_json(writer, status, payload):
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(
+        f"HTTP/1.1 {status} {_REASONS.get(status, 'OK')}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: close\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the weather assistant to many concurrent sessions.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--assistant-id", default=None)
+    parser.add_argument("--max-concurrent-runs", type=int, default=DEFAULT_MAX_CONCURRENT_RUNS)
+    parser.add_argument("--max-sessions", type=int, default=DEFAULT_MAX_SESSIONS)
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE)
+    parser.add_argument("--answer-cache", default=None,
+                        help="SQLite file of answers to reuse for repeat questions (default: ANSWER_CACHE_PATH, if set)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    try:
+        # Startup lookup is a one-off, so the blocking client is fine here
+        assistant = get_cached_assistant(
+            new_client(api_key=api_key),
+            model=MODEL,
+            instructions=INSTRUCTIONS,
+            tools=registry.tools_payload(),
+            assistant_id=args.assistant_id,
+        )
+    except Exception as init_e:
+        print(f"Failed to initialize client or assistant: {init_e}")
+        sys.exit(1)
+
+    server = ChatServer(
+        new_async_client(api_key=api_key),
+        assistant,
+        max_concurrent_runs=args.max_concurrent_runs,
+        max_sessions=args.max_sessions,
+        queue_size=args.queue_size,
+        answer_cache=new_answer_cache(args.answer_cache),
+    )
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nShutting down.")
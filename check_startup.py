@@ -0,0 +1,84 @@
+import argparse
+import os
+import subprocess
+import sys
+
+# Entry points and tool modules that must stay cheap to import
+DEFAULT_MODULES = ("main", "main_stream", "main_1", "batch", "weather_tools",
+                   "get_current_temperature", "get_rain_probability")
+DEFAULT_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "100"))
+DEFAULT_RUNS = 3
+
+# Heavy dependencies that may only be imported once they are actually used
+DEFERRED_MODULES = ("openai", "httpx", "pydantic", "numpy", "dotenv", "asyncio", "sqlite3")
+
+
+def import_profile(module, python=sys.executable):
+    """
+    Imports `module` in a fresh interpreter under `-X importtime`.
+
+    Returns:
+        (cumulative microseconds for the module, set of every module imported).
+    """
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    cumulative = None
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        imported.add(name)
+        if name == module:
+            cumulative = int(total)
+    if cumulative is None:
+        raise RuntimeError(f"No import time reported for {module}.")
+    return cumulative, imported
+
+
+def check(modules=DEFAULT_MODULES, budget_ms=DEFAULT_BUDGET_MS, runs=DEFAULT_RUNS):
+    """
+    Checks every module against the import-time budget and the deferred imports.
+
+    The best of `runs` cold imports is used, so one slow run on a busy
+    machine does not fail the check.
+
+    Returns:
+        A list of failure messages, empty when everything is within budget.
+    """
+    failures = []
+    for module in modules:
+        profiles = [import_profile(module) for _ in range(runs)]
+        best_ms = min(cumulative for cumulative, _ in profiles) / 1000
+        eager = sorted(name for name in DEFERRED_MODULES if name in profiles[0][1])
+        status = "ok" if best_ms <= budget_ms and not eager else "FAIL"
+        print(f"{module:<26} {best_ms:7.1f} ms  {status}" + (f"  (imports {', '.join(eager)})" if eager else ""))
+        if best_ms > budget_ms:
+            failures.append(f"{module} takes {best_ms:.1f} ms to import, over the {budget_ms:g} ms budget")
+        if eager:
+            failures.append(f"{module} imports {', '.join(eager)} at startup")
+    return failures
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Fail if importing the entry points gets slower than the startup budget.")
+    parser.add_argument("modules", nargs="*", default=list(DEFAULT_MODULES))
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="Maximum cumulative import time per module (default: STARTUP_BUDGET_MS or 100)")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="Cold imports per module; the best counts")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    failures = check(args.modules, args.budget_ms, args.runs)
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
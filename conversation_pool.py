@@ -0,0 +1,149 @@
+from collections import deque
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOW_WATER = 4
+DEFAULT_MAX_AGE = 3600.0  # seconds an unused thread is kept before it is deleted
+DEFAULT_RETRY_DELAY = 5.0  # seconds to wait after a failed create before trying again
+
+
+class ConversationPool:
+    """
+    Keeps a stock of empty conversation threads created ahead of time.
+
+    A background worker calls `client.beta.threads.create()` until the pool
+    holds `low_water` threads, so a new session can take one with `acquire()`
+    instead of waiting on a round trip. Threads that sat unused for longer
+    than `max_age` are deleted and replaced.
+
+    Args:
+        client: The initialized API client, used when `acquire` has to create
+            a thread for a waiting user.
+        low_water: Number of ready threads the worker keeps in stock.
+        max_age: Seconds an unused thread may wait in the pool.
+        clock: Function returning the current time in seconds.
+        background_client: Client for pre-creating and deleting threads, e.g.
+            a lower-priority lane of `client`; defaults to `client`.
+    """
+
+    def __init__(self, client, low_water=DEFAULT_LOW_WATER, max_age=DEFAULT_MAX_AGE,
+                 clock=time.monotonic, background_client=None):
+        self.client = client
+        self.background_client = background_client or client
+        self.low_water = low_water
+        self.max_age = max_age
+        self.clock = clock
+        self._ready = deque()  # (created_at, thread), oldest first
+        self._cond = threading.Condition()
+        self._worker = None
+        self._stopped = False
+        self.created = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def start(self):
+        """
+        Starts the background worker and returns the pool.
+        """
+        with self._cond:
+            if self._worker is None:
+                self._stopped = False
+                self._worker = threading.Thread(target=self._run, name="conversation-pool", daemon=True)
+                self._worker.start()
+        return self
+
+    def acquire(self):
+        """
+        Returns an empty thread, taking a pre-created one when available.
+        """
+        with self._cond:
+            # Take the newest thread; expired ones are left for the worker to delete
+            if self._ready and self._ready[-1][0] > self.clock() - self.max_age:
+                _, thread = self._ready.pop()
+                self.hits += 1
+                self._cond.notify()
+                return thread
+            self.misses += 1
+            self._cond.notify()
+        # Pool ran dry; a user is waiting, so create one on the caller's own client
+        return self.client.beta.threads.create()
+
+    def close(self, delete_unused=True):
+        """
+        Stops the worker and, by default, deletes the threads nobody took.
+        """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+            worker, self._worker = self._worker, None
+            unused = [thread for _, thread in self._ready]
+            self._ready.clear()
+        if worker is not None:
+            worker.join()
+        if delete_unused:
+            for thread in unused:
+                self._delete(thread)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "ready": len(self._ready),
+                "low_water": self.low_water,
+                "created": self.created,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+            }
+
+    def _collect_expired_locked(self):
+        # Called with the lock held; returns the threads that were dropped
+        expired = []
+        cutoff = self.clock() - self.max_age
+        while self._ready and self._ready[0][0] <= cutoff:
+            expired.append(self._ready.popleft()[1])
+        self.expired += len(expired)
+        return expired
+
+    def _delete(self, thread):
+        try:
+            self.background_client.beta.threads.delete(thread.id)
+        except Exception as e:
+            logger.warning(f"Failed to delete pooled thread {thread.id}: {e}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                expired = self._collect_expired_locked()
+                if self._stopped:
+                    break
+                if not expired and len(self._ready) >= self.low_water:
+                    # Sleep until a thread is taken or the oldest one expires
+                    timeout = self._ready[0][0] + self.max_age - self.clock() if self._ready else None
+                    self._cond.wait(timeout)
+                    continue
+                missing = self.low_water - len(self._ready)
+
+            for thread in expired:
+                self._delete(thread)
+
+            for _ in range(max(0, missing)):
+                try:
+                    thread = self.background_client.beta.threads.create()
+                except Exception as e:
+                    logger.warning(f"Failed to pre-create thread: {e}")
+                    with self._cond:
+                        self._cond.wait(DEFAULT_RETRY_DELAY)
+                    break
+                with self._cond:
+                    self.created += 1
+                    stopped = self._stopped
+                    if not stopped:
+                        self._ready.append((self.clock(), thread))
+                if stopped:
+                    # Closed while the request was in flight
+                    self._delete(thread)
+                    break
@@ -0,0 +1,299 @@
+from collections import namedtuple
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = os.getenv("CONVERSATION_STORE_PATH", ".conversations.sqlite")
+DEFAULT_BATCH_SIZE = 256      # writes committed per transaction at most
+DEFAULT_FLUSH_INTERVAL = 0.5  # seconds a write may wait for others to share its commit
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    thread_id TEXT NOT NULL,
+    assistant_id TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    turn INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT,
+    message_id TEXT,
+    run_id TEXT,
+    cached INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, turn);
+CREATE INDEX IF NOT EXISTS messages_created_at ON messages (created_at);
+CREATE TABLE IF NOT EXISTS tool_calls (
+    session_id TEXT NOT NULL,
+    turn INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    arguments TEXT,
+    output TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tool_calls_session ON tool_calls (session_id, turn);
+"""
+
+# A conversation as recorded locally
+StoredSession = namedtuple("StoredSession", ["id", "thread_id", "assistant_id", "created_at", "updated_at"])
+# One message of a conversation; `cached` marks answers served by the AnswerCache
+StoredMessage = namedtuple("StoredMessage", ["turn", "role", "content", "message_id", "run_id", "cached",
+                                             "created_at"])
+StoredToolCall = namedtuple("StoredToolCall", ["turn", "name", "arguments", "output", "created_at"])
+
+
+def pending_exchanges(messages):
+    """
+    Returns the (question, answer) pairs that were answered from the
+    AnswerCache after the last real run. Those were never posted to the
+    thread, so a resumed conversation has to post them before its next run.
+
+    Args:
+        messages: A session's StoredMessages, in order.
+    """
+    turns = {}
+    for message in messages:
+        turns.setdefault(message.turn, {})[message.role] = message
+    pending = []
+    for turn in sorted(turns, reverse=True):
+        exchange = turns[turn]
+        if not all(message.cached for message in exchange.values()):
+            break
+        if "user" in exchange and "assistant" in exchange:
+            pending.append((exchange["user"].content, exchange["assistant"].content))
+    return pending[::-1]
+
+
+class _Flush:
+    # Asks the writer to commit everything queued so far, then set the event
+    def __init__(self):
+        self.event = threading.Event()
+
+
+_STOP = object()
+
+
+class ConversationStore:
+    """
+    Keeps every conversation in a local SQLite file.
+
+    Writes are write-behind: the record_* methods only put a statement on a
+    queue, and a background writer commits whatever has queued up in one
+    transaction, so the chat loop never waits on the disk. Reads use their
+    own connection; call `flush` first to see writes still in the queue.
+
+    Args:
+        path: The SQLite file.
+        batch_size: Maximum writes committed per transaction.
+        flush_interval: Seconds the writer waits for more writes before committing.
+        clock: Function returning the current Unix time.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, clock=time.time):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self._queue = queue.Queue()
+        self._reader = self._connect()
+        self._reader.executescript(_SCHEMA)
+        self._read_lock = threading.Lock()
+        self.writes = 0
+        self.commits = 0
+        self._writer = threading.Thread(target=self._run, name="conversation-store", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        # sqlite3 is only loaded once a store is opened
+        import sqlite3
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    # --- writes -----------------------------------------------------------------
+
+    def new_session(self, thread_id, assistant_id=None, session_id=None):
+        """
+        Records a new conversation and returns its session ID.
+        """
+        session_id = session_id or os.urandom(16).hex()
+        now = self.clock()
+        self._put("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?)",
+                  (session_id, thread_id, assistant_id, now, now))
+        return session_id
+
+    def record_message(self, session_id, turn, role, content, message_id=None, run_id=None, cached=False):
+        now = self.clock()
+        self._put("INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                  (session_id, turn, role, content, message_id, run_id, int(cached), now))
+        self._put("UPDATE sessions SET updated_at = ? WHERE id = ?", (now, session_id))
+
+    def record_tool_calls(self, session_id, turn, tool_calls):
+        """
+        Records the tool calls of a turn, as dicts with "name", "arguments" and "output".
+        """
+        now = self.clock()
+        for call in tool_calls:
+            arguments = call["arguments"]
+            if not isinstance(arguments, str):
+                arguments = json.dumps(arguments)
+            self._put("INSERT INTO tool_calls VALUES (?, ?, ?, ?, ?, ?)",
+                      (session_id, turn, call["name"], arguments, call["output"], now))
+
+    def _put(self, sql, params):
+        if self._writer is None:
+            raise RuntimeError("The conversation store is closed.")
+        self._queue.put((sql, params))
+
+    def flush(self, timeout=None):
+        """
+        Waits until every write queued so far is committed.
+
+        Returns:
+            False if `timeout` ran out first.
+        """
+        if self._writer is None:
+            return True
+        marker = _Flush()
+        self._queue.put(marker)
+        return marker.event.wait(timeout)
+
+    def close(self):
+        """
+        Commits pending writes and stops the writer.
+        """
+        if self._writer is not None:
+            self._queue.put(_STOP)
+            self._writer.join()
+            self._writer = None
+        with self._read_lock:
+            self._reader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _run(self):
+        import sqlite3
+        db = self._connect()
+        try:
+            stopping = False
+            while not stopping:
+                batch = [self._queue.get()]
+                # Let a burst of writes share one commit
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size and isinstance(batch[-1], tuple):
+                    try:
+                        batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                    except queue.Empty:
+                        break
+
+                writes = [item for item in batch if isinstance(item, tuple)]
+                if writes:
+                    try:
+                        db.execute("BEGIN")
+                        for sql, params in writes:
+                            db.execute(sql, params)
+                        db.execute("COMMIT")
+                        self.writes += len(writes)
+                        self.commits += 1
+                    except sqlite3.Error as e:
+                        db.execute("ROLLBACK")
+                        logger.debug(f"Batch of {len(writes)} conversation store writes failed ({e}); "
+                                     f"retrying them one at a time")
+                        self._write_each(db, writes)
+                for item in batch:
+                    if isinstance(item, _Flush):
+                        item.event.set()
+                    elif item is _STOP:
+                        stopping = True
+        finally:
+            db.close()
+
+    def _write_each(self, db, writes):
+        # Autocommit per statement, so one bad write only loses itself
+        import sqlite3
+        for sql, params in writes:
+            try:
+                db.execute(sql, params)
+                self.writes += 1
+                self.commits += 1
+            except sqlite3.Error as e:
+                logger.warning(f"Dropped a conversation store write: {e}")
+
+    # --- reads ------------------------------------------------------------------
+
+    def _query(self, sql, params=()):
+        with self._read_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def get_session(self, session_id):
+        """
+        Returns the StoredSession with this ID, or with this unique ID prefix.
+
+        Raises:
+            KeyError: No session, or more than one, matches.
+        """
+        rows = self._query("SELECT * FROM sessions WHERE id = ?", (session_id,))
+        if not rows:
+            # A prefix range scan on the primary key
+            rows = self._query("SELECT * FROM sessions WHERE id >= ? AND id < ? LIMIT 2",
+                               (session_id, session_id + "\uffff"))
+        if len(rows) != 1:
+            raise KeyError(f"{'No' if not rows else 'More than one'} session matches '{session_id}'.")
+        return StoredSession(*rows[0])
+
+    def list_sessions(self, since=None, limit=20):
+        """
+        Returns the most recently active sessions, newest first.
+
+        Args:
+            since: Only sessions active at or after this Unix time.
+            limit: Maximum number of sessions.
+        """
+        return [StoredSession(*row) for row in self._query(
+            "SELECT * FROM sessions WHERE updated_at >= ? ORDER BY updated_at DESC LIMIT ?",
+            (since or 0.0, limit),
+        )]
+
+    def messages(self, session_id, since=None):
+        """
+        Returns a session's messages in order.
+
+        Args:
+            since: Only messages created at or after this Unix time.
+        """
+        return [StoredMessage(*row) for row in self._query(
+            "SELECT turn, role, content, message_id, run_id, cached, created_at FROM messages "
+            "WHERE session_id = ? AND created_at >= ? ORDER BY turn, rowid",
+            (session_id, since or 0.0),
+        )]
+
+    def tool_calls(self, session_id, turn=None):
+        """
+        Returns a session's tool calls in order, optionally for one turn.
+        """
+        if turn is None:
+            rows = self._query("SELECT turn, name, arguments, output, created_at FROM tool_calls "
+                               "WHERE session_id = ? ORDER BY turn, rowid", (session_id,))
+        else:
+            rows = self._query("SELECT turn, name, arguments, output, created_at FROM tool_calls "
+                               "WHERE session_id = ? AND turn = ? ORDER BY rowid", (session_id, turn))
+        return [StoredToolCall(*row) for row in rows]
+
+    def stats(self):
+        return {"writes": self.writes, "commits": self.commits, "queued": self._queue.qsize()}
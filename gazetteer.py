@@ -0,0 +1,529 @@
+import bisect
+from collections import namedtuple
+import csv
+import hashlib
+import itertools
+import mmap
+import os
+import struct
+import sys
+import threading
+
+from tool_cache import normalize_location
+
+# Set WEATHER_GAZETTEER_PATH to an index built with `python gazetteer.py build`
+INDEX_PATH = os.getenv("WEATHER_GAZETTEER_PATH")
+
+# Countries that report temperatures in Fahrenheit
+FAHRENHEIT_COUNTRIES = frozenset({"US", "LR", "MM", "BS", "KY", "PW", "FM", "MH"})
+
+# Names people use for countries besides their ISO code
+COUNTRY_ALIASES = {
+    "AE": ["united arab emirates", "uae"],
+    "AR": ["argentina"],
+    "AT": ["austria"],
+    "AU": ["australia"],
+    "BE": ["belgium"],
+    "BR": ["brazil"],
+    "BS": ["bahamas", "the bahamas"],
+    "CA": ["canada"],
+    "CH": ["switzerland"],
+    "CN": ["china"],
+    "DE": ["germany"],
+    "DK": ["denmark"],
+    "EG": ["egypt"],
+    "ES": ["spain"],
+    "FI": ["finland"],
+    "FM": ["micronesia"],
+    "FR": ["france"],
+    "GB": ["uk", "united kingdom", "great britain", "england", "scotland", "wales", "northern ireland"],
+    "GR": ["greece"],
+    "ID": ["indonesia"],
+    "IE": ["ireland"],
+    "IL": ["israel"],
+    "IN": ["india"],
+    "IT": ["italy"],
+    "JP": ["japan"],
+    "KE": ["kenya"],
+    "KR": ["south korea", "korea"],
+    "KY": ["cayman islands"],
+    "LR": ["liberia"],
+    "MH": ["marshall islands"],
+    "MM": ["myanmar", "burma"],
+    "MN": ["mongolia"],
+    "MX": ["mexico"],
+    "NG": ["nigeria"],
+    "NL": ["netherlands", "the netherlands", "holland"],
+    "NO": ["norway"],
+    "NZ": ["new zealand"],
+    "PH": ["philippines"],
+    "PL": ["poland"],
+    "PT": ["portugal"],
+    "PW": ["palau"],
+    "RU": ["russia"],
+    "SA": ["saudi arabia"],
+    "SE": ["sweden"],
+    "SG": ["singapore"],
+    "TH": ["thailand"],
+    "TR": ["turkey", "turkiye"],
+    "US": ["usa", "united states", "united states of america", "america"],
+    "VN": ["vietnam"],
+    "ZA": ["south africa"],
+}
+
+# Names of first-level regions, by country and admin1 code. Regions of other
+# countries are only matched by their code (e.g. "Paris, 11")
+ADMIN1_NAMES = {
+    "US": {
+        "AL": "Alabama", "AK": "Alaska", "AZ": "Arizona", "AR": "Arkansas", "CA": "California",
+        "CO": "Colorado", "CT": "Connecticut", "DE": "Delaware", "DC": "District of Columbia",
+        "FL": "Florida", "GA": "Georgia", "HI": "Hawaii", "ID": "Idaho", "IL": "Illinois", "IN": "Indiana",
+        "IA": "Iowa", "KS": "Kansas", "KY": "Kentucky", "LA": "Louisiana", "ME": "Maine", "MD": "Maryland",
+        "MA": "Massachusetts", "MI": "Michigan", "MN": "Minnesota", "MS": "Mississippi", "MO": "Missouri",
+        "MT": "Montana", "NE": "Nebraska", "NV": "Nevada", "NH": "New Hampshire", "NJ": "New Jersey",
+        "NM": "New Mexico", "NY": "New York", "NC": "North Carolina", "ND": "North Dakota", "OH": "Ohio",
+        "OK": "Oklahoma", "OR": "Oregon", "PA": "Pennsylvania", "RI": "Rhode Island",
+        "SC": "South Carolina", "SD": "South Dakota", "TN": "Tennessee", "TX": "Texas", "UT": "Utah",
+        "VT": "Vermont", "VA": "Virginia", "WA": "Washington", "WV": "West Virginia", "WI": "Wisconsin",
+        "WY": "Wyoming",
+    },
+}
+
+def _qualifier_codes():
+    # Normalized country or region name -> the normalized codes it can stand for
+    codes = {}
+    for country, aliases in COUNTRY_ALIASES.items():
+        for alias in aliases:
+            codes.setdefault(alias, set()).add(country.casefold())
+    for regions in ADMIN1_NAMES.values():
+        for code, name in regions.items():
+            codes.setdefault(name.casefold(), set()).add(code.casefold())
+    return codes
+
+
+_QUALIFIER_CODES = _qualifier_codes()
+
+
+class UnknownLocationError(LookupError, ValueError):
+    """
+    Raised when a location cannot be resolved, including when its region or
+    country does not match any place of that name.
+    """
+
+Place = namedtuple("Place", ["name", "admin1", "country", "latitude", "longitude", "population"])
+
+# Places the tools can resolve when no index is configured
+LOCATIONS = {
+    "san francisco, ca": Place("San Francisco", "CA", "US", 37.7749, -122.4194, 873965),
+    "new york, ny": Place("New York", "NY", "US", 40.7128, -74.0060, 8804190),
+    "los angeles, ca": Place("Los Angeles", "CA", "US", 34.0522, -118.2437, 3898747),
+    "chicago, il": Place("Chicago", "IL", "US", 41.8781, -87.6298, 2746388),
+    "seattle, wa": Place("Seattle", "WA", "US", 47.6062, -122.3321, 737015),
+    "london, uk": Place("London", "ENG", "GB", 51.5074, -0.1278, 8961989),
+    "paris, france": Place("Paris", "11", "FR", 48.8566, 2.3522, 2138551),
+    "tokyo, japan": Place("Tokyo", "40", "JP", 35.6762, 139.6503, 8336599),
+    "sydney, australia": Place("Sydney", "02", "AU", -33.8688, 151.2093, 4627345),
+    "ulaanbaatar, mongolia": Place("Ulaanbaatar", "20", "MN", 47.8864, 106.9057, 1396288),
+}
+
+# Index file layout (all little-endian): header, place records, hash slots,
+# key records sorted by key bytes, then a pool of UTF-8 strings. Every
+# section is fixed-width, so lookups read straight from the mapped file.
+MAGIC = b"GZIX"
+VERSION = 1
+_HEADER = struct.Struct("<4sIIIIIIII")  # magic, version, places, slots, keys, then the four section offsets
+_PLACE = struct.Struct("<ffI2s2xIH2x")  # latitude, longitude, population, country, label offset, label length
+_SLOT = struct.Struct("<QI")            # key hash, key record index + 1 (0 means empty)
+_KEY = struct.Struct("<IHxxI")          # key offset, key length, place index
+_LABEL_SEPARATOR = "\x1f"               # between name and admin1 in a place label
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def place_matches(place, qualifier):
+    """
+    Tells whether a qualifier such as "TX", "Texas", "US" or "United States" describes a place.
+    """
+    qualifier = normalize_location(qualifier)
+    names = {place.admin1.casefold(), place.country.casefold()}
+    names.update(COUNTRY_ALIASES.get(place.country, ()))
+    region = ADMIN1_NAMES.get(place.country, {}).get(place.admin1)
+    if region:
+        names.add(region.casefold())
+    return qualifier in names
+
+
+def place_keys(name, admin1, country):
+    """
+    Returns the normalized names a place can be looked up by, e.g. "paris",
+    "paris, 11", "paris, fr", "paris, france".
+    """
+    qualifiers = [admin1, country] + COUNTRY_ALIASES.get(country, [])
+    keys = [normalize_location(name)]
+    for qualifier in qualifiers:
+        if qualifier:
+            keys.append(normalize_location(f"{name}, {qualifier}"))
+    if admin1 and country:
+        keys.append(normalize_location(f"{name}, {admin1}, {country}"))
+    return keys
+
+
+def read_geonames(path):
+    """
+    Reads places from a GeoNames dump (e.g. cities15000.txt), tab-separated.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < 15:
+                continue
+            yield Place(fields[1], fields[10], fields[8], float(fields[4]), float(fields[5]),
+                        int(fields[14] or 0))
+
+
+def read_csv(path):
+    """
+    Reads places from a CSV file with the columns name, admin1, country,
+    latitude, longitude and population.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            yield Place(row["name"], row.get("admin1", ""), row["country"], float(row["latitude"]),
+                        float(row["longitude"]), int(row.get("population") or 0))
+
+
+def build_index(places, path):
+    """
+    Builds a gazetteer index file from an iterable of Place.
+
+    When several places share a key, the most populous one wins, so "paris"
+    resolves to Paris, France and "paris, tx" to the one in Texas.
+
+    Returns:
+        The number of places written.
+    """
+    places = sorted(places, key=lambda place: -place.population)
+    key_places = {}
+    for index, place in enumerate(places):
+        for key in place_keys(place.name, place.admin1, place.country):
+            key_places.setdefault(key.encode("utf-8"), index)
+
+    pool = bytearray()
+    place_records = []
+    for place in places:
+        label = f"{place.name}{_LABEL_SEPARATOR}{place.admin1}".encode("utf-8")
+        place_records.append(_PLACE.pack(place.latitude, place.longitude, place.population,
+                                         place.country.encode("ascii")[:2], len(pool), len(label)))
+        pool += label
+
+    keys = sorted(key_places)
+    key_records = []
+    for key in keys:
+        key_records.append(_KEY.pack(len(pool), len(key), key_places[key]))
+        pool += key
+
+    # Open addressing with linear probing, kept at most half full
+    n_slots = 1
+    while n_slots < 2 * len(keys):
+        n_slots *= 2
+    slots = [(0, 0)] * n_slots
+    for index, key in enumerate(keys):
+        key_hash = _hash(key)
+        slot = key_hash & (n_slots - 1)
+        while slots[slot][1]:
+            slot = (slot + 1) & (n_slots - 1)
+        slots[slot] = (key_hash, index + 1)
+
+    places_offset = _HEADER.size
+    slots_offset = places_offset + _PLACE.size * len(places)
+    keys_offset = slots_offset + _SLOT.size * n_slots
+    pool_offset = keys_offset + _KEY.size * len(keys)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(places), n_slots, len(keys),
+                             places_offset, slots_offset, keys_offset, pool_offset))
+        f.write(b"".join(place_records))
+        f.write(b"".join(_SLOT.pack(*slot) for slot in slots))
+        f.write(b"".join(key_records))
+        f.write(pool)
+    os.replace(tmp_path, path)
+    return len(places)
+
+
+def edit_distance(a, b, limit):
+    """
+    Levenshtein distance between two strings, or limit + 1 once it exceeds `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class _SortedKeys:
+    # Sequence view of the sorted key records, so bisect can search the mapped file
+    def __init__(self, gazetteer):
+        self.gazetteer = gazetteer
+
+    def __len__(self):
+        return self.gazetteer.n_keys
+
+    def __getitem__(self, index):
+        return self.gazetteer._key(index)[0]
+
+
+class Gazetteer:
+    """
+    Resolves free-text locations to places using a prebuilt index file.
+
+    The file is memory-mapped, so opening it costs one header read no matter
+    how many places it holds. Exact names are found through a hash table in
+    O(1); prefixes through binary search over the sorted keys in
+    O(log n + k); misspellings through a bounded edit-distance scan over keys
+    that share the first letter.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.n_places, self.n_slots, self.n_keys,
+         self._places_offset, self._slots_offset, self._keys_offset, self._pool_offset) = _HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a gazetteer index.")
+        if version != VERSION:
+            raise ValueError(f"Unsupported gazetteer index version {version} in {path}.")
+        self._sorted_keys = _SortedKeys(self)
+
+    def close(self):
+        self._map.close()
+
+    def _key(self, index):
+        offset, length, place = _KEY.unpack_from(self._map, self._keys_offset + index * _KEY.size)
+        return self._map[offset + self._pool_offset:offset + self._pool_offset + length], place
+
+    def place(self, index):
+        latitude, longitude, population, country, offset, length = _PLACE.unpack_from(
+            self._map, self._places_offset + index * _PLACE.size)
+        start = self._pool_offset + offset
+        name, admin1 = self._map[start:start + length].decode("utf-8").split(_LABEL_SEPARATOR)
+        return Place(name, admin1, country.decode("ascii"), latitude, longitude, population)
+
+    def _find(self, key):
+        key_hash = _hash(key)
+        mask = self.n_slots - 1
+        slot = key_hash & mask
+        while True:
+            slot_hash, record = _SLOT.unpack_from(self._map, self._slots_offset + slot * _SLOT.size)
+            if not record:
+                return None
+            if slot_hash == key_hash:
+                stored, place = self._key(record - 1)
+                if stored == key:
+                    return place
+            slot = (slot + 1) & mask
+
+    def lookup(self, location):
+        """
+        Returns the Place for an exact (normalized) name, or None.
+        """
+        index = self._find(normalize_location(location).encode("utf-8"))
+        return None if index is None else self.place(index)
+
+    def _key_range(self, prefix):
+        start = bisect.bisect_left(self._sorted_keys, prefix)
+        end = bisect.bisect_left(self._sorted_keys, prefix + b"\xff", lo=start)
+        return start, end
+
+    def prefix(self, text, limit=10):
+        """
+        Returns up to `limit` places whose names start with `text`.
+
+        Keys are walked in name order and the walk stops at the `limit`-th
+        distinct place, so the cost does not grow with the size of the
+        range; the places found are returned most populous first.
+        """
+        start, end = self._key_range(normalize_location(text).encode("utf-8"))
+        indexes = set()
+        for i in range(start, end):
+            if len(indexes) >= limit:
+                break
+            indexes.add(self._key(i)[1])
+        # Place records are stored by descending population
+        return [self.place(index) for index in sorted(indexes)]
+
+    def fuzzy(self, location, max_distance=2):
+        """
+        Returns the closest place within `max_distance` edits, or None.
+        """
+        key = normalize_location(location)
+        if not key:
+            return None
+        best = None
+        start, end = self._key_range(key[0].encode("utf-8"))
+        for i in range(start, end):
+            candidate, index = self._key(i)
+            if abs(len(candidate) - len(key)) > max_distance:
+                continue
+            distance = edit_distance(key, candidate.decode("utf-8"), max_distance)
+            if distance <= max_distance and (best is None or (distance, index) < best):
+                best = (distance, index)
+        return None if best is None else self.place(best[1])
+
+    def _candidates(self, name, qualifiers):
+        # Most specific first: the name with every qualifier spelled as codes
+        # ("Paris, Texas, USA" -> "paris, tx, us"), then with one qualifier,
+        # then the bare name, then the same through fuzzy matching
+        meanings = [{normalize_location(q)} | _QUALIFIER_CODES.get(normalize_location(q), set())
+                    for q in qualifiers]
+        for codes in itertools.product(*meanings):
+            yield self.lookup(", ".join([name, *codes]))
+        singles = sorted(set().union(*meanings)) if meanings else []
+        for code in singles:
+            yield self.lookup(f"{name}, {code}")
+        yield self.lookup(name)
+        for code in singles:
+            yield self.fuzzy(f"{name}, {code}")
+        yield self.fuzzy(name)
+
+    def resolve(self, location):
+        """
+        Resolves a location such as "Paris", "Paris, TX" or "Paris, Texas, USA".
+
+        Everything after the first comma must agree with the place found:
+        region and country names are matched against its admin1 code and
+        country (see ADMIN1_NAMES and COUNTRY_ALIASES). A qualifier that
+        matches is only dropped when it adds nothing, so "Paris, Texas" is
+        never answered with Paris, France. Misspelled names fall back to
+        fuzzy matching under the same rule.
+
+        Raises:
+            UnknownLocationError: If no place matches the name and every qualifier.
+        """
+        place = self.lookup(location)
+        if place is not None:
+            return place
+        parts = [part.strip() for part in str(location).split(",") if part.strip()]
+        if not parts:
+            raise UnknownLocationError(f"Unknown location '{location}'")
+        name, qualifiers = parts[0], parts[1:]
+        for place in self._candidates(name, qualifiers):
+            if place is not None and all(place_matches(place, qualifier) for qualifier in qualifiers):
+                return place
+        if qualifiers and self.lookup(name) is not None:
+            raise UnknownLocationError(f"No place called '{name}' matches '{', '.join(qualifiers)}'")
+        raise UnknownLocationError(f"Unknown location '{location}'")
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer(path=None):
+    """
+    Returns the shared Gazetteer, opening it on first use, or None when no index is configured.
+    """
+    global _gazetteer
+    path = path or INDEX_PATH
+    if not path:
+        return None
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer(path)
+    return _gazetteer
+
+
+def resolve_location(location):
+    """
+    Returns the Place for a location name or a "lat, lon" string.
+
+    Uses the configured index, or the built-in LOCATIONS without one.
+
+    Raises:
+        UnknownLocationError: If the location cannot be resolved.
+    """
+    try:
+        latitude, longitude = (float(part) for part in str(location).split(","))
+        return Place(str(location), "", "", latitude, longitude, 0)
+    except ValueError:
+        pass
+    gazetteer = get_gazetteer()
+    if gazetteer is not None:
+        return gazetteer.resolve(location)
+    place = LOCATIONS.get(normalize_location(location))
+    if place is None:
+        raise UnknownLocationError(f"Unknown location '{location}'")
+    return place
+
+
+def temperature_unit(country):
+    """
+    Returns the unit temperatures are usually given in for an ISO country code.
+    """
+    return "Fahrenheit" if country in FAHRENHEIT_COUNTRIES else "Celsius"
+
+
+def infer_unit(location):
+    """
+    Returns the temperature unit used at a location, for calls that leave it out.
+
+    Only a configured index knows enough places to tell; without one (or
+    for a place it does not know) this is Celsius, like the tools' default.
+    """
+    gazetteer = get_gazetteer()
+    if gazetteer is None:
+        return "Celsius"
+    try:
+        return temperature_unit(gazetteer.resolve(location).country)
+    except ValueError:
+        return "Celsius"
+
+
+def parse_args(argv=None):
+    # Only the command line needs argparse; the tools import this module
+    import argparse
+    parser = argparse.ArgumentParser(description="Build or query the location index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Build an index from a GeoNames dump or a CSV file")
+    build.add_argument("source", help="GeoNames .txt dump, or .csv with name,admin1,country,latitude,longitude,population")
+    build.add_argument("index")
+
+    lookup = commands.add_parser("lookup", help="Resolve a location")
+    lookup.add_argument("index")
+    lookup.add_argument("location")
+
+    prefix = commands.add_parser("prefix", help="List places starting with a prefix")
+    prefix.add_argument("index")
+    prefix.add_argument("text")
+    prefix.add_argument("--limit", type=int, default=10)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "build":
+        reader = read_csv if args.source.endswith(".csv") else read_geonames
+        count = build_index(reader(args.source), args.index)
+        print(f"Indexed {count} places into {args.index}")
+    elif args.command == "lookup":
+        try:
+            place = Gazetteer(args.index).resolve(args.location)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+        print(f"{place.name}, {place.admin1}, {place.country}: {place.latitude:.4f}, {place.longitude:.4f} "
+              f"({temperature_unit(place.country)})")
+    else:
+        for place in Gazetteer(args.index).prefix(args.text, args.limit):
+            print(f"{place.name}, {place.admin1}, {place.country} ({place.population})")
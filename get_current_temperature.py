@@ -1,10 +1,104 @@
+from datetime import datetime, timezone
+import math
+import os
 import random
+import threading
+
+from gazetteer import infer_unit, resolve_location
+from tool_cache import convert_temperature
+
+# Set WEATHER_GRID_PATH to a grid written by weather_grid.py to answer from
+# real data; without it the tool keeps returning random readings
+GRID_PATH = os.getenv("WEATHER_GRID_PATH")
+
+_grid = None
+_grid_lock = threading.Lock()
+
+
+def get_grid(path=None):
+    """
+    Returns the memory-mapped TemperatureGrid, opening it on first use, or
+    None when no grid is configured.
+    """
+    global _grid
+    path = path or GRID_PATH
+    if not path:
+        return None
+    if _grid is None:
+        with _grid_lock:
+            if _grid is None:
+                # numpy is only needed when a grid is configured
+                from weather_grid import TemperatureGrid
+                _grid = TemperatureGrid.open(path)
+    return _grid
+
+
 def get_current_temperature(**kwargs) -> str:
     location = kwargs.get("location", "Unknown Location")
-    unit = kwargs.get("unit", "Celsius")  # Default to Celsius if not provided
+    unit = kwargs.get("unit") or infer_unit(location)  # Default to the unit used at the location
 
     if unit not in ["Celsius", "Fahrenheit"]:
         raise ValueError("Invalid unit. Must be 'Celsius' or 'Fahrenheit'.")
 
-    temperature = random.randint(30, 50)
-    return f"{temperature} {unit}"
\ No newline at end of file
+    grid = get_grid()
+    if grid is None:
+        temperature = random.randint(30, 50)
+        return f"{temperature} {unit}"
+
+    place = resolve_location(location)
+    celsius = grid.lookup(place.latitude, place.longitude)
+    temperature = round(convert_temperature(celsius, "Celsius", unit))
+    return f"{temperature} {unit}"
+
+
+def parse_time(value):
+    """
+    Converts an ISO 8601 time (naive times are UTC) to Unix seconds; None stays None.
+    """
+    if value is None:
+        return None
+    parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def get_current_temperatures(calls):
+    """
+    Batch variant of `get_current_temperature`.
+
+    Locations are resolved one by one, then every reading comes from a
+    single vectorized grid lookup.
+
+    Args:
+        calls: List of argument dicts like {"location", "unit", "time"}; unit and time are optional.
+
+    Returns:
+        One output per call: a "NN Unit" string, or the exception raised for that call.
+    """
+    outputs = [None] * len(calls)
+    pending = []  # (index, unit, place, when) of calls that need a reading
+    grid = get_grid()
+    for index, kwargs in enumerate(calls):
+        try:
+            location = kwargs.get("location", "Unknown Location")
+            unit = kwargs.get("unit") or infer_unit(location)
+            if unit not in ["Celsius", "Fahrenheit"]:
+                raise ValueError("Invalid unit. Must be 'Celsius' or 'Fahrenheit'.")
+            if grid is None:
+                outputs[index] = f"{random.randint(30, 50)} {unit}"
+                continue
+            when = parse_time(kwargs.get("time"))
+            pending.append((index, unit, resolve_location(location), math.nan if when is None else when))
+        except ValueError as e:
+            outputs[index] = e
+
+    if pending:
+        readings = grid.lookup_many(
+            [place.latitude for _, _, place, _ in pending],
+            [place.longitude for _, _, place, _ in pending],
+            [when for _, _, _, when in pending],
+        )
+        for (index, unit, _, _), celsius in zip(pending, readings.tolist()):
+            outputs[index] = f"{round(convert_temperature(celsius, 'Celsius', unit))} {unit}"
+    return outputs
@@ -0,0 +1,74 @@
+import math
+import os
+import threading
+
+from gazetteer import resolve_location
+from get_current_temperature import parse_time
+
+# Set WEATHER_RAIN_TABLE_PATH to tables built with rain_climatology.py to
+# answer from climatology; without it the tool keeps its fixed answer
+TABLE_PATH = os.getenv("WEATHER_RAIN_TABLE_PATH")
+
+_climatology = None
+_climatology_lock = threading.Lock()
+
+
+def get_climatology(path=None):
+    """
+    Returns the memory-mapped RainClimatology, opening it on first use, or
+    None when no tables are configured.
+    """
+    global _climatology
+    path = path or TABLE_PATH
+    if not path:
+        return None
+    if _climatology is None:
+        with _climatology_lock:
+            if _climatology is None:
+                # numpy is only needed when tables are configured
+                from rain_climatology import RainClimatology
+                _climatology = RainClimatology.open(path)
+    return _climatology
+
+
+def get_rain_probability(**kwargs) -> str:
+    location = kwargs.get("location", "Unknown Location")
+
+    climatology = get_climatology()
+    if climatology is None:
+        probability = 0.06
+        return f"{probability}"
+
+    place = resolve_location(location)
+    probability = climatology.probability(place.latitude, place.longitude, parse_time(kwargs.get("time")))
+    return f"{probability:.2f}"
+
+
+def get_rain_probabilities(calls):
+    """
+    Batch variant of `get_rain_probability`: one output (or exception) per
+    argument dict, with every lookup done in one vectorized pass.
+    """
+    climatology = get_climatology()
+    if climatology is None:
+        return [get_rain_probability(**kwargs) for kwargs in calls]
+
+    outputs = [None] * len(calls)
+    pending = []  # (index, place, when)
+    for index, kwargs in enumerate(calls):
+        try:
+            when = parse_time(kwargs.get("time"))
+            place = resolve_location(kwargs.get("location", "Unknown Location"))
+            pending.append((index, place, math.nan if when is None else when))
+        except ValueError as e:
+            outputs[index] = e
+
+    if pending:
+        probabilities = climatology.probabilities(
+            [place.latitude for _, place, _ in pending],
+            [place.longitude for _, place, _ in pending],
+            [when for _, _, when in pending],
+        )
+        for (index, _, _), probability in zip(pending, probabilities.tolist()):
+            outputs[index] = f"{probability:.2f}"
+    return outputs
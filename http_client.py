@@ -0,0 +1,300 @@
+import logging
+import os
+import threading
+import time
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# One pool serves every session and worker thread in the process. Each default
+# can be overridden with the environment variable beside it, read when the
+# pool or a client is built (so after the entry point has loaded .env)
+DEFAULT_MAX_CONNECTIONS = 100      # OPENAI_MAX_CONNECTIONS
+DEFAULT_MAX_KEEPALIVE = 20         # OPENAI_MAX_KEEPALIVE
+DEFAULT_KEEPALIVE_EXPIRY = 60.0    # OPENAI_KEEPALIVE_EXPIRY, seconds an idle connection is kept
+DEFAULT_CONNECT_TIMEOUT = 5.0      # OPENAI_CONNECT_TIMEOUT
+# Plain requests (including run polling) should answer quickly; a stream may
+# legitimately go quiet while the model thinks or tools run on the server
+DEFAULT_READ_TIMEOUT = 30.0        # OPENAI_READ_TIMEOUT
+DEFAULT_STREAM_READ_TIMEOUT = 120.0  # OPENAI_STREAM_READ_TIMEOUT
+# OPENAI_HTTP2: "1" forces HTTP/2 and "0" disables it; by default it is used when the h2 package is installed
+DEFAULT_HTTP2 = "auto"
+
+
+def _setting(name, default):
+    return type(default)(os.getenv(name, default))
+
+
+def http2_enabled(setting=None):
+    setting = (setting or _setting("OPENAI_HTTP2", DEFAULT_HTTP2)).lower()
+    if setting in ("0", "false", "no"):
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        if setting in ("1", "true", "yes"):
+            raise RuntimeError("OPENAI_HTTP2 is on but the h2 package is not installed (pip install httpx[http2]).")
+        return False
+    return True
+
+
+def request_timeout():
+    """
+    Returns the timeout for ordinary requests and polling.
+    """
+    connect = _setting("OPENAI_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT)
+    return httpx.Timeout(_setting("OPENAI_READ_TIMEOUT", DEFAULT_READ_TIMEOUT), connect=connect, pool=connect)
+
+
+def stream_timeout():
+    """
+    Returns the timeout for streamed runs, where the read timeout bounds the gap between events.
+    """
+    connect = _setting("OPENAI_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT)
+    return httpx.Timeout(_setting("OPENAI_STREAM_READ_TIMEOUT", DEFAULT_STREAM_READ_TIMEOUT), connect=connect,
+                         pool=connect)
+
+
+class PoolStats:
+    """
+    Counts requests against the connections and TLS handshakes they needed.
+
+    Fed by httpcore's trace hook, so a request that reuses a kept-alive
+    connection shows up as a request without a connect.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self.connect_seconds = 0.0
+        self.tls_seconds = 0.0
+
+    def _on_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def _on_trace(self, name, started):
+        # `started` maps each phase to its start time for this request
+        phase, _, step = name.rpartition(".")
+        if phase == "connection.connect_tcp":
+            if step == "started":
+                started[phase] = time.perf_counter()
+            elif step == "complete":
+                with self._lock:
+                    self.connections_opened += 1
+                    self.connect_seconds += time.perf_counter() - started.pop(phase, time.perf_counter())
+        elif phase == "connection.start_tls":
+            if step == "started":
+                started[phase] = time.perf_counter()
+            elif step == "complete":
+                with self._lock:
+                    self.tls_handshakes += 1
+                    self.tls_seconds += time.perf_counter() - started.pop(phase, time.perf_counter())
+
+    def sync_trace(self, previous=None):
+        started = {}
+
+        def trace(name, info):
+            self._on_trace(name, started)
+            if previous is not None:
+                previous(name, info)
+        return trace
+
+    def async_trace(self, previous=None):
+        started = {}
+
+        async def trace(name, info):
+            self._on_trace(name, started)
+            if previous is not None:
+                await previous(name, info)
+        return trace
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "reused": max(0, self.requests - self.connections_opened),
+                "tls_handshakes": self.tls_handshakes,
+                "connect_ms": round(self.connect_seconds * 1000, 1),
+                "tls_ms": round(self.tls_seconds * 1000, 1),
+            }
+
+
+def _pool_usage(pool):
+    # httpcore's pool lists its connections; idle ones are kept alive for reuse
+    connections = list(getattr(pool, "connections", []))
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return {"connections": len(connections), "idle": idle, "active": len(connections) - idle}
+
+
+class PooledTransport(httpx.HTTPTransport):
+    """
+    HTTPTransport shared by every client, which records PoolStats.
+
+    Clients built by `new_http_client` close their own wrapper but never
+    the shared pool; call `close_pool` once at exit.
+    """
+
+    def __init__(self, stats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    def handle_request(self, request):
+        self.stats._on_request()
+        request.extensions = {**request.extensions,
+                              "trace": self.stats.sync_trace(request.extensions.get("trace"))}
+        return super().handle_request(request)
+
+    def close(self):
+        pass
+
+    def shutdown(self):
+        super().close()
+
+    def usage(self):
+        return _pool_usage(self._pool)
+
+
+class AsyncPooledTransport(httpx.AsyncHTTPTransport):
+    """
+    Async counterpart of PooledTransport, for AsyncOpenAI clients.
+    """
+
+    def __init__(self, stats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    async def handle_async_request(self, request):
+        self.stats._on_request()
+        request.extensions = {**request.extensions,
+                              "trace": self.stats.async_trace(request.extensions.get("trace"))}
+        return await super().handle_async_request(request)
+
+    async def aclose(self):
+        pass
+
+    async def shutdown(self):
+        await super().aclose()
+
+    def usage(self):
+        return _pool_usage(self._pool)
+
+
+stats = PoolStats()
+_transport = None
+_async_transport = None
+_lock = threading.Lock()
+
+
+def _limits():
+    return httpx.Limits(max_connections=_setting("OPENAI_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS),
+                        max_keepalive_connections=_setting("OPENAI_MAX_KEEPALIVE", DEFAULT_MAX_KEEPALIVE),
+                        keepalive_expiry=_setting("OPENAI_KEEPALIVE_EXPIRY", DEFAULT_KEEPALIVE_EXPIRY))
+
+
+def get_transport():
+    """
+    Returns the process-wide PooledTransport, creating it on first use.
+    """
+    global _transport
+    if _transport is None:
+        with _lock:
+            if _transport is None:
+                _transport = PooledTransport(stats, limits=_limits(), http2=http2_enabled())
+    return _transport
+
+
+def get_async_transport():
+    """
+    Returns the process-wide AsyncPooledTransport, creating it on first use.
+    """
+    global _async_transport
+    if _async_transport is None:
+        with _lock:
+            if _async_transport is None:
+                _async_transport = AsyncPooledTransport(stats, limits=_limits(), http2=http2_enabled())
+    return _async_transport
+
+
+def new_http_client(event_hooks=None):
+    """
+    Returns an httpx.Client on the shared pool. Each caller may add its own event hooks.
+    """
+    return httpx.Client(transport=get_transport(), timeout=request_timeout(), event_hooks=event_hooks)
+
+
+def new_async_http_client(event_hooks=None):
+    return httpx.AsyncClient(transport=get_async_transport(), timeout=request_timeout(), event_hooks=event_hooks)
+
+
+def new_client(event_hooks=None, **kwargs):
+    """
+    Returns an OpenAI client on the shared pool. Keyword arguments go to OpenAI.
+    """
+    from openai import OpenAI
+    return OpenAI(http_client=new_http_client(event_hooks), timeout=request_timeout(), **kwargs)
+
+
+def new_async_client(event_hooks=None, **kwargs):
+    """
+    Returns an AsyncOpenAI client on the shared pool. Keyword arguments go to AsyncOpenAI.
+    """
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(http_client=new_async_http_client(event_hooks), timeout=request_timeout(), **kwargs)
+
+
+def warm_up(url, connections=1):
+    """
+    Opens `connections` pooled connections to `url` in the background, so
+    the first turn does not pay for the TCP and TLS handshakes.
+    """
+    client = new_http_client()
+
+    def connect():
+        try:
+            client.head(url)
+        except httpx.HTTPError as e:
+            logger.debug(f"Warming a connection to {url} failed: {e}")
+
+    for _ in range(connections):
+        threading.Thread(target=connect, name="http-warm-up", daemon=True).start()
+
+
+def pool_stats():
+    """
+    Returns request and handshake counters plus how much of each pool is in use.
+    """
+    result = stats.snapshot()
+    result["max_connections"] = _setting("OPENAI_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS)
+    result["max_keepalive"] = _setting("OPENAI_MAX_KEEPALIVE", DEFAULT_MAX_KEEPALIVE)
+    if _transport is not None:
+        result["pool"] = _transport.usage()
+    if _async_transport is not None:
+        result["async_pool"] = _async_transport.usage()
+    return result
+
+
+def close_pool():
+    """
+    Closes the shared connections; the next client built gets a fresh pool.
+    """
+    global _transport
+    with _lock:
+        transport, _transport = _transport, None
+    if transport is not None:
+        transport.shutdown()
+
+
+async def aclose_pool():
+    """
+    Async counterpart of `close_pool`, for the pool of AsyncOpenAI clients.
+    """
+    global _async_transport
+    with _lock:
+        transport, _async_transport = _async_transport, None
+    if transport is not None:
+        await transport.shutdown()
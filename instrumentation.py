@@ -0,0 +1,227 @@
+from collections import deque
+import contextlib
+import cProfile
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SAMPLES = 10000  # most recent samples kept per histogram
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """
+    Keeps the most recent samples of one measurement and reports percentiles.
+    """
+
+    def __init__(self, max_samples=DEFAULT_MAX_SAMPLES):
+        self._samples = deque(maxlen=max_samples)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self._samples.append(value)
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, q, ordered=None):
+        ordered = ordered if ordered is not None else sorted(self._samples)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    def summary(self):
+        ordered = sorted(self._samples)
+        result = {"count": self.count, "sum": self.sum}
+        for q in QUANTILES:
+            result[f"p{int(q * 100)}"] = self.percentile(q, ordered)
+        return result
+
+
+class Turn:
+    """
+    The spans and marks recorded during one user turn.
+    """
+
+    def __init__(self, number):
+        self.number = number
+        self.started = time.perf_counter()
+        self.spans = []
+        self.marks = {}
+        self._lock = threading.Lock()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "turn": self.number,
+                "duration": self.elapsed(),
+                "spans": list(self.spans),
+                "marks": dict(self.marks),
+            }
+
+
+class Tracer:
+    """
+    Times the phases of the chat pipeline and aggregates them into histograms.
+
+    `span(name)` times a block (message post, run start, each tool call,
+    submit, render ...). `mark(name)` records when a one-off event happened
+    relative to the start of the turn (requires_action received, first text
+    delta, run complete); only the first mark of each name per turn counts.
+    Both feed one histogram per name, exportable as JSON or Prometheus text.
+
+    The current turn is tracked per thread. Work handed to other threads
+    (such as tool calls) should pass `turn=` explicitly.
+    """
+
+    def __init__(self, max_samples=DEFAULT_MAX_SAMPLES):
+        self.max_samples = max_samples
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._turns = itertools.count(1)
+
+    def _observe(self, name, value):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(self.max_samples)
+            histogram.observe(value)
+
+    def current_turn(self):
+        return getattr(self._local, "turn", None)
+
+    @contextlib.contextmanager
+    def turn(self):
+        """
+        Marks the start and end of a user turn on the current thread.
+        """
+        turn = Turn(next(self._turns))
+        previous, self._local.turn = self.current_turn(), turn
+        try:
+            yield turn
+        finally:
+            self._local.turn = previous
+            self._observe("turn", turn.elapsed())
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(json.dumps(turn.to_dict()))
+
+    @contextlib.contextmanager
+    def span(self, name, turn=None, **attributes):
+        """
+        Times the enclosed block as phase `name`.
+        """
+        turn = turn or self.current_turn()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - started
+            self._observe(name, duration)
+            if turn is not None:
+                record = {"name": name, "start": started - turn.started, "duration": duration}
+                record.update(attributes)
+                with turn._lock:
+                    turn.spans.append(record)
+
+    def mark(self, name, turn=None):
+        """
+        Records when event `name` happened, as seconds since the turn started.
+        """
+        turn = turn or self.current_turn()
+        if turn is None:
+            return
+        with turn._lock:
+            if name in turn.marks:
+                return
+            offset = turn.marks[name] = turn.elapsed()
+        self._observe(name, offset)
+
+    def snapshot(self):
+        """
+        Returns {name: {"count", "sum", "p50", "p95", "p99"}} for every histogram.
+        """
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {name: histogram.summary() for name, histogram in sorted(histograms.items())}
+
+    def export_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def export_prometheus(self, metric="weather_chat_phase_seconds"):
+        """
+        Renders every histogram as a Prometheus summary labelled by phase.
+        """
+        lines = [
+            f"# HELP {metric} Duration of chat pipeline phases, or offset within the turn for events.",
+            f"# TYPE {metric} summary",
+        ]
+        for name, summary in self.snapshot().items():
+            for q in QUANTILES:
+                value = summary[f"p{int(q * 100)}"]
+                if value is not None:
+                    lines.append(f'{metric}{{phase="{name}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'{metric}_sum{{phase="{name}"}} {summary["sum"]:.6f}')
+            lines.append(f'{metric}_count{{phase="{name}"}} {summary["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """
+        Writes the metrics to `path`: Prometheus text for `.prom`/`.txt`, JSON otherwise.
+        """
+        text = self.export_prometheus() if path.endswith((".prom", ".txt")) else self.export_json()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+# Shared by the chat loops, the event handler and the tool executor
+tracer = Tracer()
+
+# Set WEATHER_PROFILE_DIR to dump a cProfile of every turn into that directory
+PROFILE_DIR = os.getenv("WEATHER_PROFILE_DIR")
+# Set WEATHER_METRICS_PATH to write the histograms there when the chat ends
+METRICS_PATH = os.getenv("WEATHER_METRICS_PATH")
+
+
+@contextlib.contextmanager
+def profile_turn(turn=None, directory=None):
+    """
+    Runs the enclosed turn under cProfile when profiling is switched on.
+
+    Stats are dumped to `<directory>/turn-<n>.prof`; inspect them with
+    `python -m pstats`. Does nothing when no directory is configured.
+    """
+    directory = directory or PROFILE_DIR
+    if not directory:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(directory, exist_ok=True)
+        number = turn.number if turn is not None else int(time.time() * 1000)
+        path = os.path.join(directory, f"turn-{number:04d}.prof")
+        profiler.dump_stats(path)
+        logger.info(f"Wrote profile to {path}")
+
+
+def write_metrics(path=None):
+    """
+    Writes the shared tracer's histograms if a metrics path is configured.
+    """
+    path = path or METRICS_PATH
+    if path:
+        tracer.write(path)
+        logger.info(f"Wrote metrics to {path}")
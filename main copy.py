@@ -1,11 +1,12 @@
-from typing import override
 from dotenv import load_dotenv
-from openai import AssistantEventHandler, OpenAI
+from openai import OpenAI
 
 import os
 import sys
 
-import get_current_temperature
+from assistant_cache import get_cached_assistant
+from text_normalizer import normalize
+from weather_tools import INSTRUCTIONS, MODEL, registry
 
 # Load environment variables from .env file
 load_dotenv()
@@ -15,56 +16,21 @@ def initialize_client():
     return OpenAI(api_key=api_key)
 
 def get_assistant(client, assistan_id= None):
+    """
+    Returns the weather assistant, creating or updating it only when its
+    definition changed since the last launch (see assistant_cache.py).
 
-    if assistan_id is None:
-        assistant = client.beta.assistants.create(
-        instructions="You are a weather bot. Use the provided functions to answer questions.",
-        model="gpt-4o",
-        tools=[
-            {
-            "type": "function",
-            "function": {
-                "name": "get_current_temperature",
-                "description": "Get the current temperature for a specific location",
-                "parameters": {
-                "type": "object",
-                "properties": {
-                    "location": {
-                    "type": "string",
-                    "description": "The city and state, e.g., San Francisco, CA"
-                    },
-                    "unit": {
-                    "type": "string",
-                    "enum": ["Celsius", "Fahrenheit"],
-                    "description": "The temperature unit to use. Infer this from the user's location."
-                    }
-                },
-                "required": ["location", "unit"]
-                }
-            }
-            },
-            {
-            "type": "function",
-            "function": {
-                "name": "get_rain_probability",
-                "description": "Get the probability of rain for a specific location",
-                "parameters": {
-                "type": "object",
-                "properties": {
-                    "location": {
-                    "type": "string",
-                    "description": "The city and state, e.g., San Francisco, CA"
-                    }
-                },
-                "required": ["location"]
-                }
-            }
-            }
-        ]
-        )
-    else:
-        assistant = client.beta.assistants.retrieve(assistan_id)
-    return assistant
+    Args:
+        client: The initialized API client.
+        assistan_id: Optional ID of an existing assistant to reuse.
+    """
+    return get_cached_assistant(
+        client,
+        model=MODEL,
+        instructions=INSTRUCTIONS,
+        tools=registry.tools_payload(),
+        assistant_id=assistan_id,
+    )
     #print("Welcome to the ChatGPT Interactive Assistant!")
 
 def display_message(message):
@@ -77,55 +43,11 @@ def display_message(message):
     role = message.role.capitalize()
     content_blocks = message.content
 
-    # Concatenate all text from content blocks
-    content_text = ""
-    for block in content_blocks:
-        if block.type == 'text':
-            content_text += block.text.value + "\n"
-        # You can handle other block types (e.g., images, attachments) here if needed
-
-    # Remove trailing newline
-    content_text = content_text.strip()
-    content_text = content_text.replace('\\(', '(').replace('\\)', ')')
+    # Join the text from all content blocks
+    # You can handle other block types (e.g., images, attachments) here if needed
+    content_text = normalize("\n".join(block.text.value for block in content_blocks if block.type == 'text'))
     print(f"{role}: {content_text}\n")
 
-class EventHandler(AssistantEventHandler):
-    @override
-    def on_event(self, event):
-      # Retrieve events that are denoted with 'requires_action'
-      # since these will have our tool_calls
-      if event.event == 'thread.run.requires_action':
-        run_id = event.data.id  # Retrieve the run ID from the event data
-        self.handle_requires_action(event.data, run_id)
- 
-    def handle_requires_action(self, data, run_id):
-      tool_outputs = []
-        
-      for tool in data.required_action.submit_tool_outputs.tool_calls:
-        print(tool.function)
-        if tool.function.name == "get_current_temperature":
-            tool_outputs.append({
-                "tool_call_id": tool.id,
-                "output": get_current_temperature()  # Call the dummy function here
-            })
-        elif tool.function.name == "get_rain_probability":
-          tool_outputs.append({"tool_call_id": tool.id, "output": "0.06"})
-        
-      # Submit all tool_outputs at the same time
-      self.submit_tool_outputs(tool_outputs, run_id)
- 
-    def submit_tool_outputs(self, tool_outputs, run_id):
-      # Use the submit_tool_outputs_stream helper
-      with client.beta.threads.runs.submit_tool_outputs_stream(
-        thread_id=self.current_run.thread_id,
-        run_id=self.current_run.id,
-        tool_outputs=tool_outputs,
-        event_handler=EventHandler(),
-      ) as stream:
-        for text in stream.text_deltas:
-          print(text, end="", flush=True)
-        print()
-
 def main(client, assistant):
     """
     Main function to run the interactive ChatGPT assistant.
@@ -1,89 +1,61 @@
+if __name__ == "__main__":
+    # Project modules read their settings from the environment when they are
+    # imported, so the .env file has to be loaded before any of them
+    from dotenv import load_dotenv
+    load_dotenv()
 
-import json
-from dotenv import load_dotenv
-from openai import AssistantEventHandler, OpenAI
+from assistant_cache import get_cached_assistant
+from conversation_pool import ConversationPool
+from conversation_store import DEFAULT_STORE_PATH, ConversationStore, pending_exchanges
+from instrumentation import profile_turn, tracer, write_metrics
+from message_cursor import MessageCursor
+from request_scheduler import scheduled
+from run_poller import AdaptivePoller
+from text_normalizer import normalize
+from weather_tools import INSTRUCTIONS, MODEL, new_answer_cache, new_executor, registry
 
 import os
 import sys
-
-import re
+import time
 import logging
-import json
+from collections import namedtuple
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-# Load environment variables from .env file
-load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
+def load_environment():
+    """
+    Loads variables from the .env file. Running this module as a script
+    already did so before the project imports; this covers callers that
+    import the module and build a client.
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
 
 def initialize_client():
-    return OpenAI(api_key=api_key)
-
-import random
-def get_current_temperature(**kwargs) -> str:
-    location = kwargs.get("location", "Unknown Location")
-    unit = kwargs.get("unit", "Celsius")  # Default to Celsius if not provided
-
-    if unit not in ["Celsius", "Fahrenheit"]:
-        raise ValueError("Invalid unit. Must be 'Celsius' or 'Fahrenheit'.")
-
-    temperature = random.randint(30, 50)
-    return f"{temperature} {unit}"
+    # Imported here: the SDK (pydantic, httpx) is most of the startup cost
+    from http_client import new_client
+    load_environment()
+    # Every call shares the process-wide connection pool (see http_client.py)
+    # and is paced by the shared RequestScheduler (see request_scheduler.py)
+    return scheduled(new_client(api_key=os.getenv("OPENAI_API_KEY")))
 
 def get_assistant(client, assistan_id= None):
+    """
+    Returns the weather assistant, creating or updating it only when its
+    definition changed since the last launch (see assistant_cache.py).
 
-    if assistan_id is None:
-        assistant = client.beta.assistants.create(
-        instructions="You are a weather bot. Use the provided functions to answer questions.",
-        model="gpt-4o",
-        tools=[
-            {
-            "type": "function",
-            "function": {
-                "name": "get_current_temperature",
-                "description": "Get the current temperature for a specific location",
-                "parameters": {
-                "type": "object",
-                "properties": {
-                    "location": {
-                    "type": "string",
-                    "description": "The city and state, e.g., San Francisco, CA"
-                    },
-                    "unit": {
-                    "type": "string",
-                    "enum": ["Celsius", "Fahrenheit"],
-                    "description": "The temperature unit to use. Infer this from the user's location."
-                    }
-                },
-                "required": ["location", "unit"]
-                }
-            }
-            },
-            {
-            "type": "function",
-            "function": {
-                "name": "get_rain_probability",
-                "description": "Get the probability of rain for a specific location",
-                "parameters": {
-                "type": "object",
-                "properties": {
-                    "location": {
-                    "type": "string",
-                    "description": "The city and state, e.g., San Francisco, CA"
-                    }
-                },
-                "required": ["location"]
-                }
-            }
-            }
-        ]
-        )
-    else:
-        assistant = client.beta.assistants.retrieve(assistan_id)
-    return assistant
+    Args:
+        client: The initialized API client.
+        assistan_id: Optional ID of an existing assistant to reuse.
+    """
+    return get_cached_assistant(
+        client,
+        model=MODEL,
+        instructions=INSTRUCTIONS,
+        tools=registry.tools_payload(),
+        assistant_id=assistan_id,
+    )
     #print("Welcome to the ChatGPT Interactive Assistant!")
 
 def display_message(message):
@@ -96,40 +68,174 @@ def display_message(message):
     role = message.role.capitalize()
     content_blocks = message.content
 
-    # Concatenate all text from content blocks
-    content_text = ""
-    for block in content_blocks:
-        if block.type == 'text':
-            content_text += block.text.value + "\n"
-        # You can handle other block types (e.g., images, attachments) here if needed
-
-    # Remove trailing newline
-    content_text = content_text.strip()
-    content_text = content_text.replace('\\(', '(').replace('\\)', ')')
+    # Join the text from all content blocks
+    # You can handle other block types (e.g., images, attachments) here if needed
+    content_text = normalize("\n".join(block.text.value for block in content_blocks if block.type == 'text'))
     print(f"{role}: {content_text}\n")
 
+def message_text(message):
+    """
+    Returns the text content of a Message object.
+    """
+    if message is None:
+        return None
+    return "\n".join(block.text.value for block in message.content if block.type == 'text').strip()
 
+def post_exchanges(client, thread_id, exchanges):
+    """
+    Adds question/answer pairs that were answered from the AnswerCache to
+    the thread, so the model sees them in later turns. Posting messages does
+    not start a run, so this costs no model tokens.
+    """
+    for question, answer in exchanges:
+        client.beta.threads.messages.create(thread_id=thread_id, role="user", content=question)
+        client.beta.threads.messages.create(thread_id=thread_id, role="assistant", content=answer)
+    exchanges.clear()
+
+
+
+# Outcome of one user turn: the final run, the reply message (None if the run
+# did not complete), the tool calls made along the way and the PollStats of
+# every wait
+TurnResult = namedtuple("TurnResult", ["run", "reply", "tool_calls", "poll_stats"])
 
-def main(client, assistant):
+# Shared so that run-duration history carries over between turns
+default_poller = AdaptivePoller()
+
+def run_turn(client, assistant, thread_id, user_input, executor, instructions=None, cursor=None,
+             poller=None):
     """
-    Main function to run the interactive ChatGPT assistant.
-    
+    Posts a user message and polls the run until it no longer needs tool outputs.
+
     Args:
         client: The initialized API client.
         assistant: The assistant instance to interact with.
+        thread_id: ID of the conversation thread.
+        user_input: The user's message.
+        executor: ToolExecutor used to run tool calls.
+        instructions: Optional instructions overriding the assistant's for this run.
+        cursor: Optional MessageCursor for the thread, kept across turns.
+        poller: Optional AdaptivePoller; defaults to the shared one.
+
+    Returns:
+        A TurnResult.
+    """
+    if cursor is None:
+        cursor = MessageCursor(client, thread_id)
+    if poller is None:
+        poller = default_poller
+
+    # Create a user message in the thread
+    with tracer.span("message_post"):
+        message = client.beta.threads.messages.create(
+            thread_id=thread_id,
+            role="user",
+            content=user_input
+        )
+    cursor.advance(message.id)
+
+    # Initiate a run to get the assistant's response
+    run_options = {"instructions": instructions} if instructions is not None else {}
+    started = time.monotonic()
+    with tracer.span("run_start"):
+        run = client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=assistant.id,
+            **run_options
+        )
+    with tracer.span("run_wait"):
+        run, stats = poller.wait(client, thread_id, run, key=(assistant.id, "run"), started=started)
+    poll_stats = [stats]
+
+    # Answer every round of tool calls, submitting each round's outputs at once
+    tool_calls = []
+    while run.status == 'requires_action':
+        tracer.mark("requires_action")
+        calls = run.required_action.submit_tool_outputs.tool_calls
+        with tracer.span("tool_calls", count=len(calls)):
+            tool_outputs = executor.run(calls)
+        for tool, tool_output in zip(calls, tool_outputs):
+            tool_calls.append({
+                "name": tool.function.name,
+                "arguments": tool.function.arguments,
+                "output": tool_output["output"],
+            })
+        started = time.monotonic()
+        with tracer.span("submit"):
+            run = client.beta.threads.runs.submit_tool_outputs(
+                thread_id=thread_id,
+                run_id=run.id,
+                tool_outputs=tool_outputs
+            )
+        with tracer.span("run_wait"):
+            run, stats = poller.wait(client, thread_id, run, key=(assistant.id, "tool_outputs"), started=started)
+        poll_stats.append(stats)
+
+    reply = None
+    if run.status == 'completed':
+        tracer.mark("run_complete")
+        # Only fetch what this run added since our own message
+        with tracer.span("message_fetch"):
+            messages = cursor.fetch_new(run_id=run.id)
+        if messages:
+            reply = messages[-1]  # Listed oldest first, so the last one is the latest
+    return TurnResult(run, reply, tool_calls, poll_stats)
+
+def main(client, assistant, executor=None, thread_pool=None, answer_cache=None, store=None, resume=None,
+         connect=None):
     """
+    Main function to run the interactive ChatGPT assistant.
+    
+    Args:
+        client: The initialized API client, or None to have `connect` build it.
+        assistant: The assistant instance to interact with, or None with `connect`.
+        executor: Optional ToolExecutor used to run tool calls concurrently.
+        thread_pool: Optional ConversationPool to take the conversation thread from.
+        answer_cache: Optional AnswerCache answering repeat questions without a run.
+        store: Optional ConversationStore recording the conversation.
+        resume: Optional ID (or unique prefix) of a stored session to continue; needs `store`.
+        connect: Optional function returning (client, assistant), called before the
+            first turn that needs the API, so a resumed conversation starts offline.
+    """
+    if executor is None:
+        executor = new_executor()
+
     print("Welcome to the ChatGPT Interactive Assistant!")
     print("Type 'exit' or 'quit' to end the conversation.\n")
 
-    # Initialize the conversation with an empty message list
-    messages = []
-    
-    try:
-        # Create a new thread for the conversation
-        thread = client.beta.threads.create()
-    except Exception as e:
-        print(f"Error creating thread: {e}")
-        sys.exit(1)  # Exit the program if thread creation fails
+    history = []
+    if resume is not None:
+        # Everything needed comes from the local store, without an API call
+        try:
+            session = store.get_session(resume)
+        except KeyError as e:
+            print(f"Cannot resume: {e.args[0]}")
+            sys.exit(1)
+        session_id, thread_id = session.id, session.thread_id
+        history = store.messages(session_id)
+        for message in history:
+            print(f"{message.role.capitalize()}: {normalize(message.content or '')}\n")
+    else:
+        try:
+            # Create a new thread for the conversation, or take a pre-created one
+            if thread_pool is not None:
+                thread = thread_pool.acquire()
+            else:
+                thread = client.beta.threads.create()
+        except Exception as e:
+            print(f"Error creating thread: {e}")
+            sys.exit(1)  # Exit the program if thread creation fails
+        thread_id = thread.id
+        session_id = store.new_session(thread_id, assistant.id) if store is not None else None
+    if session_id is not None:
+        print(f"Session {session_id} (continue it later with --resume {session_id[:8]})\n")
+
+    # Tracks the newest message seen so each turn only fetches new ones
+    known_ids = [message.message_id for message in history if message.message_id]
+    cursor = MessageCursor(client, thread_id, last_message_id=known_ids[-1] if known_ids else None)
+    # Questions asked so far, and cached exchanges not yet posted to the thread
+    asked = [message.content for message in history if message.role == "user"]
+    unsynced = pending_exchanges(history)
 
     while True:
         try:
@@ -144,73 +250,60 @@ def main(client, assistant):
                 print("Please enter a message or type 'exit' to quit.")
                 continue
 
-            # Create a user message in the thread
-            message = client.beta.threads.messages.create(
-                thread_id=thread.id,
-                role="user",
-                content=user_input
-            )  
-
-            # Initiate a run to get the assistant's response
-            run = client.beta.threads.runs.create_and_poll(
-                thread_id=thread.id,
-                assistant_id=assistant.id,
-                instructions=user_input
-            )
+            if answer_cache is not None:
+                cached = answer_cache.get(user_input, asked)
+                if cached is not None:
+                    print(f"Assistant: {normalize(cached)}\n")
+                    if store is not None:
+                        store.record_message(session_id, len(asked), "user", user_input, cached=True)
+                        store.record_message(session_id, len(asked), "assistant", cached, cached=True)
+                    asked.append(user_input)
+                    unsynced.append((user_input, cached))
+                    continue
+
+            if client is None:
+                client, assistant = connect()
+                cursor.client = client
 
-            if run.status == 'completed': 
-                # Retrieve all messages in the thread
-                messages = client.beta.threads.messages.list(
-                    thread_id=thread.id
+            with tracer.turn() as turn, profile_turn(turn):
+                if unsynced:
+                    with tracer.span("message_post"):
+                        post_exchanges(client, thread_id, unsynced)
+
+                # Post the message, run the assistant and answer its tool calls
+                result = run_turn(
+                    client,
+                    assistant,
+                    thread_id,
+                    user_input,
+                    executor,
+                    instructions=user_input,
+                    cursor=cursor
                 )
-            # Define the list to store tool outputs
-            tool_outputs = []
-            
-            # Loop through each tool in the required action section
-            for tool in run.required_action.submit_tool_outputs.tool_calls:
-                if tool.function.name == "get_current_temperature":
-                    arguments = json.loads(tool.function.arguments)
-                    logger.debug(f"Tool Call ID: {tool.id} | Arguments: {arguments}")
-                    try:
-                        temperature_output = get_current_temperature(**arguments)
-                    except ValueError as ve:
-                        temperature_output = f"Error: {ve}"
-
-                    tool_outputs.append({
-                        "tool_call_id": tool.id,
-                        "output": temperature_output
-                    })
-                elif tool.function.name == "get_rain_probability":
-                    tool_outputs.append({
-                    "tool_call_id": tool.id,
-                    "output": "0.06"
-                    })
-                else:
-                    print(f"Assistant is processing your request. Current status: {run.status}")
-
-            # Submit all tool outputs at once after collecting them in a list
-            if tool_outputs:
-                try:
-                    run = client.beta.threads.runs.submit_tool_outputs_and_poll(
-                    thread_id=thread.id,
-                    run_id=run.id,
-                    tool_outputs=tool_outputs
-                    )
-                    print("Tool outputs submitted successfully.")
-                except Exception as e:
-                    print("Failed to submit tool outputs:", e)
-                else:
-                    print("No tool outputs to submit.")
-                
-            if run.status == 'completed':
-                messages = client.beta.threads.messages.list(
-                    thread_id=thread.id
+
+                logger.debug(
+                    f"Polls: {sum(stats.polls for stats in result.poll_stats)} | "
+                    f"Max added latency vs streaming: {sum(stats.max_added_latency for stats in result.poll_stats):.2f}s"
                 )
-            if messages.data:
-                last_message = messages.data[0]  # Assuming the first item is the latest
-                display_message(last_message)
-            else:
-                print(run.status)
+                if result.tool_calls:
+                    print("Tool outputs submitted successfully.")
+                with tracer.span("render"):
+                    if result.reply is not None:
+                        display_message(result.reply)
+                    else:
+                        print(f"Assistant is processing your request. Current status: {result.run.status}")
+
+            if store is not None:
+                # Queued for the store's writer thread; nothing here waits on the disk
+                turn_number = len(asked)
+                store.record_message(session_id, turn_number, "user", user_input, run_id=result.run.id)
+                store.record_tool_calls(session_id, turn_number, result.tool_calls)
+                if result.reply is not None:
+                    store.record_message(session_id, turn_number, "assistant", message_text(result.reply),
+                                         message_id=result.reply.id, run_id=result.run.id)
+            if answer_cache is not None and result.reply is not None:
+                answer_cache.put(user_input, message_text(result.reply), result.tool_calls, asked)
+            asked.append(user_input)
 
         except KeyboardInterrupt:
             print("\nDetected keyboard interrupt. Exiting the chat. Goodbye!")
@@ -219,16 +312,77 @@ def main(client, assistant):
             print(f"An error occurred: {e}")
             print("Please try again or type 'exit' to quit.")
 
+    executor.shutdown()
+    if answer_cache is not None:
+        logger.debug(f"Answer cache: {answer_cache.stats()}")
+    if hasattr(client, "scheduler"):
+        logger.debug(f"Request scheduler: {client.scheduler.stats()}")
+    write_metrics()
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Chat with the weather assistant.")
+    parser.add_argument("--resume", metavar="SESSION",
+                        help="Continue a stored conversation (ID or unique prefix), restored from the local store")
+    parser.add_argument("--sessions", action="store_true", help="List recent stored conversations and exit")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH, help="SQLite file recording conversations")
+    return parser.parse_args(argv)
+
+def list_sessions(store, limit=20):
+    for session in store.list_sessions(limit=limit):
+        questions = [message.content for message in store.messages(session.id) if message.role == "user"]
+        updated = time.strftime("%Y-%m-%d %H:%M", time.localtime(session.updated_at))
+        first = questions[0][:50] if questions else ""
+        print(f"{session.id[:8]}  {updated}  {len(questions):3d} turns  {first}")
+
 # Example initialization (you need to replace these with your actual initialization code)
 if __name__ == "__main__":
-    try:
-        assistant_id = 'asst_qAFskEUFjndMGiSXOBKZg7AN'
+    # Configure logging
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    from http_client import close_pool, pool_stats, warm_up
+    store = ConversationStore(args.store)
+    if args.sessions:
+        list_sessions(store)
+        store.close()
+        sys.exit(0)
+
+    assistant_id = 'asst_qAFskEUFjndMGiSXOBKZg7AN'
+
+    def connect():
         # Initialize your API client here
         client = initialize_client()  # Replace with actual client initialization
-        assistant = get_assistant(client,assistant_id)  # Replace with actual assistant retrieval
+        # Open the connection while the assistant is looked up, not in the first turn
+        warm_up(str(client.base_url))
+        return client, get_assistant(client, assistant_id)  # Replace with actual assistant retrieval
+
+    client = assistant = thread_pool = None
+    try:
+        # Only when ANSWER_CACHE_PATH is set
+        answer_cache = new_answer_cache()
+        # A resumed conversation is replayed from the store; the API is only
+        # needed once a question cannot be answered locally
+        if args.resume is None:
+            client, assistant = connect()
+            # Number of empty threads to keep pre-created (0 disables the pool)
+            thread_pool_size = int(os.getenv("THREAD_POOL_SIZE", "0"))
+            if thread_pool_size > 0:
+                # Warming threads must never hold up a user's request
+                thread_pool = ConversationPool(client, low_water=thread_pool_size,
+                                               background_client=client.with_lane("background")).start()
     except Exception as init_e:
         print(f"Failed to initialize client or assistant: {init_e}")
         sys.exit(1)
 
-    main(client, assistant)
+    try:
+        main(client, assistant, thread_pool=thread_pool, answer_cache=answer_cache, store=store,
+             resume=args.resume, connect=connect)
+        logger.debug(f"HTTP pool: {pool_stats()}")
+    finally:
+        if thread_pool is not None:
+            thread_pool.close()
+        if answer_cache is not None:
+            answer_cache.close()
+        store.close()
+        close_pool()
 
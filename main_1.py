@@ -1,102 +1,43 @@
-from dotenv import load_dotenv
-from typing_extensions import override
-from openai import AssistantEventHandler, OpenAI
-import os
-
-# Load environment variables from .env file
-load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
-
-client = OpenAI(api_key=api_key)
-
-
-
-assistant = client.beta.assistants.create(
-  instructions="You are a weather bot. Use the provided functions to answer questions.",
-  model="gpt-4o",
-  tools=[
-    {
-      "type": "function",
-      "function": {
-        "name": "get_current_temperature",
-        "description": "Get the current temperature for a specific location",
-        "parameters": {
-          "type": "object",
-          "properties": {
-            "location": {
-              "type": "string",
-              "description": "The city and state, e.g., San Francisco, CA"
-            },
-            "unit": {
-              "type": "string",
-              "enum": ["Celsius", "Fahrenheit"],
-              "description": "The temperature unit to use. Infer this from the user's location."
-            }
-          },
-          "required": ["location", "unit"]
-        }
-      }
-    },
-    {
-      "type": "function",
-      "function": {
-        "name": "get_rain_probability",
-        "description": "Get the probability of rain for a specific location",
-        "parameters": {
-          "type": "object",
-          "properties": {
-            "location": {
-              "type": "string",
-              "description": "The city and state, e.g., San Francisco, CA"
-            }
-          },
-          "required": ["location"]
-        }
-      }
-    }
-  ]
-)
-
-
-class EventHandler(AssistantEventHandler):
-    @override
-    def on_event(self, event):
-      # Retrieve events that are denoted with 'requires_action'
-      # since these will have our tool_calls
-      if event.event == 'thread.run.requires_action':
-        run_id = event.data.id  # Retrieve the run ID from the event data
-        self.handle_requires_action(event.data, run_id)
- 
-    def handle_requires_action(self, data, run_id):
-      tool_outputs = []
-        
-      for tool in data.required_action.submit_tool_outputs.tool_calls:
-        if tool.function.name == "get_current_temperature":
-          tool_outputs.append({"tool_call_id": tool.id, "output": "57"})
-        elif tool.function.name == "get_rain_probability":
-          tool_outputs.append({"tool_call_id": tool.id, "output": "0.06"})
-        
-      # Submit all tool_outputs at the same time
-      self.submit_tool_outputs(tool_outputs, run_id)
- 
-    def submit_tool_outputs(self, tool_outputs, run_id):
-      # Use the submit_tool_outputs_stream helper
-      with client.beta.threads.runs.submit_tool_outputs_stream(
-        thread_id=self.current_run.thread_id,
-        run_id=self.current_run.id,
-        tool_outputs=tool_outputs,
-        event_handler=EventHandler(),
-      ) as stream:
-        for text in stream.text_deltas:
-          print(text, end="", flush=True)
-        print()
- 
-
-
-
-
+if __name__ == "__main__":
+    # Project modules read their settings from the environment when they are
+    # imported, so the .env file has to be loaded before any of them
+    from dotenv import load_dotenv
+    load_dotenv()
+
+from assistant_cache import get_cached_assistant
+from main_stream import EventHandler, initialize_client, run_stream
+from weather_tools import INSTRUCTIONS, MODEL, registry
+
+_client = None
+_assistant = None
+
+
+def get_client():
+    # Built on first use, so importing this module makes no network calls
+    global _client
+    if _client is None:
+        _client = initialize_client()
+    return _client
+
+
+def get_assistant():
+    # Reuses the cached assistant instead of creating a new one on every launch
+    global _assistant
+    if _assistant is None:
+        _assistant = get_cached_assistant(
+          get_client(),
+          model=MODEL,
+          instructions=INSTRUCTIONS,
+          tools=registry.tools_payload()
+        )
+    return _assistant
+
+def main(thread_pool=None):
+    client = get_client()
+    assistant = get_assistant()
+    # The thread has to exist before the first message can be posted to it
+    thread = thread_pool.acquire() if thread_pool is not None else client.beta.threads.create()
 
-def main():
     # Initial user message
     message = client.beta.threads.messages.create(
     thread_id=thread.id,
@@ -104,13 +45,8 @@ def main():
     content="What's the weather in San Francisco today and the likelihood it'll rain?",
     )
 
-    thread = client.beta.threads.create() 
-    with client.beta.threads.runs.stream(
-    thread_id=thread.id,
-    assistant_id=assistant.id,
-    event_handler=EventHandler()
-    ) as stream:
-        stream.until_done()
+    # Streams the answer, submitting tool outputs for as many rounds as the run needs
+    run_stream(client, thread.id, assistant.id, EventHandler(client))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
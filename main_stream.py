@@ -1,92 +1,62 @@
+if __name__ == "__main__":
+    # Project modules read their settings from the environment when they are
+    # imported, so the .env file has to be loaded before any of them
+    from dotenv import load_dotenv
+    load_dotenv()
 
-import json
-from dotenv import load_dotenv
-from openai import AssistantEventHandler, OpenAI
-from typing_extensions import override
+from assistant_cache import get_cached_assistant
+from conversation_pool import ConversationPool
+from instrumentation import profile_turn, tracer, write_metrics
+from output_sink import StreamSink
+from request_scheduler import scheduled
+from text_normalizer import TextNormalizer, normalize
+from weather_tools import INSTRUCTIONS, MODEL, new_executor, registry
 
 import os
 import sys
-
-import re
 import logging
-import json
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-# Load environment variables from .env file
-load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
+def load_environment():
+    """
+    Loads variables from the .env file. Running this module as a script
+    already did so before the project imports; this covers callers that
+    import the module and build a client.
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
 
 def initialize_client():
-    return OpenAI(api_key=api_key)
-
-import random
-def get_current_temperature(**kwargs) -> str:
-    location = kwargs.get("location", "Unknown Location")
-    unit = kwargs.get("unit", "Celsius")  # Default to Celsius if not provided
-
-    if unit not in ["Celsius", "Fahrenheit"]:
-        raise ValueError("Invalid unit. Must be 'Celsius' or 'Fahrenheit'.")
-
-    temperature = random.randint(30, 50)
-    return f"{temperature} {unit}"
+    # Imported here: the SDK (pydantic, httpx) is most of the startup cost
+    from http_client import new_client
+    load_environment()
+    # Every call shares the process-wide connection pool (see http_client.py)
+    # and is paced by the shared RequestScheduler (see request_scheduler.py)
+    return scheduled(new_client(api_key=os.getenv("OPENAI_API_KEY")))
 
 def get_assistant(client, assistan_id= None):
+    """
+    Returns the weather assistant, creating or updating it only when its
+    definition changed since the last launch (see assistant_cache.py).
 
-    if assistan_id is None:
-        assistant = client.beta.assistants.create(
-        instructions="You are a weather bot. Use the provided functions to answer questions.",
-        model="gpt-4o",
-        tools=[
-            {
-            "type": "function",
-            "function": {
-                "name": "get_current_temperature",
-                "description": "Get the current temperature for a specific location",
-                "parameters": {
-                "type": "object",
-                "properties": {
-                    "location": {
-                    "type": "string",
-                    "description": "The city and state, e.g., San Francisco, CA"
-                    },
-                    "unit": {
-                    "type": "string",
-                    "enum": ["Celsius", "Fahrenheit"],
-                    "description": "The temperature unit to use. Infer this from the user's location."
-                    }
-                },
-                "required": ["location", "unit"]
-                }
-            }
-            },
-            {
-            "type": "function",
-            "function": {
-                "name": "get_rain_probability",
-                "description": "Get the probability of rain for a specific location",
-                "parameters": {
-                "type": "object",
-                "properties": {
-                    "location": {
-                    "type": "string",
-                    "description": "The city and state, e.g., San Francisco, CA"
-                    }
-                },
-                "required": ["location"]
-                }
-            }
-            }
-        ]
-        )
-    else:
-        assistant = client.beta.assistants.retrieve(assistan_id)
-    return assistant
+    Args:
+        client: The initialized API client.
+        assistan_id: Optional ID of an existing assistant to reuse.
+    """
+    return get_cached_assistant(
+        client,
+        model=MODEL,
+        instructions=INSTRUCTIONS,
+        tools=registry.tools_payload(),
+        assistant_id=assistan_id,
+    )
     #print("Welcome to the ChatGPT Interactive Assistant!")
 
+# Shared by every EventHandler so tool calls reuse the same worker threads
+tool_executor = new_executor()
+
 def get_user_input(prompt="You: "):
     """
     Prompts the user for input and returns the entered string.
@@ -112,71 +82,161 @@ def display_message(message):
     role = message.role.capitalize()
     content_blocks = message.content
 
-    # Concatenate all text from content blocks
-    content_text = ""
-    for block in content_blocks:
-        if block.type == 'text':
-            content_text += block.text.value + "\n"
-        # You can handle other block types (e.g., images, attachments) here if needed
-
-    # Remove trailing newline
-    content_text = content_text.strip()
-    content_text = content_text.replace('\\(', '(').replace('\\)', ')')
+    # Join the text from all content blocks
+    # You can handle other block types (e.g., images, attachments) here if needed
+    content_text = normalize("\n".join(block.text.value for block in content_blocks if block.type == 'text'))
     print(f"{role}: {content_text}\n")
 
-class EventHandler(AssistantEventHandler):
-    @override
+# Upper bound on requires_action rounds in one turn, so a looping run cannot spin forever
+DEFAULT_MAX_TOOL_ROUNDS = 10
+
+class EventHandler:
+    """
+    Reacts to the events of a streamed run.
+
+    One handler serves every round of tool calls in a turn and can be reused
+    across turns; `run_stream` drives the streams and feeds it their events.
+    Tool outputs are collected here and submitted by `run_stream`, so extra
+    rounds never nest another stream inside this one. Reply text is cleaned
+    by a TextNormalizer as it arrives and goes to an OutputSink, which
+    batches deltas instead of flushing stdout per token.
+
+    Args:
+        client: The initialized API client.
+        executor: ToolExecutor used to run tool calls.
+        sink: OutputSink receiving the reply text (defaults to buffered stdout).
+    """
+
+    def __init__(self, client, executor=None, sink=None):
+      self.client = client
+      self.executor = executor or tool_executor
+      self.sink = sink or StreamSink()
+      self.normalizer = TextNormalizer()
+      self.reset()
+
+    def reset(self):
+      self.current_run = None
+      self.pending_tool_outputs = None  # (run_id, tool_outputs) waiting to be submitted
+      self.normalizer.reset()
+
     def on_event(self, event):
+      if event.event.startswith('thread.run.') and not event.event.startswith('thread.run.step'):
+        self.current_run = event.data
+
+      if event.event == 'thread.run.created':
+        tracer.mark("run_start")
+      elif event.event == 'thread.message.delta':
+        for block in event.data.delta.content or []:
+          if block.type == 'text' and block.text and block.text.value:
+            self.on_text_delta(block.text.value)
       # Retrieve events that are denoted with 'requires_action'
       # since these will have our tool_calls
-      if event.event == 'thread.run.requires_action':
+      elif event.event == 'thread.run.requires_action':
+        tracer.mark("requires_action")
         run_id = event.data.id  # Retrieve the run ID from the event data
         self.handle_requires_action(event.data, run_id)
+      elif event.event == 'thread.run.completed':
+        tracer.mark("run_complete")
+
+    def on_text_delta(self, text):
+      tracer.mark("first_text_delta")
+      self.sink.write(self.normalizer.feed(text))
+
+    def on_run_done(self):
+      self.sink.write(self.normalizer.finish() + "\n")
+      self.sink.flush()
  
     def handle_requires_action(self, data, run_id):
-      tool_outputs = []
-        
-      for tool in data.required_action.submit_tool_outputs.tool_calls:
-        arguments = json.loads(tool.function.arguments)
-        if tool.function.name == "get_current_temperature":
-          tool_outputs.append({"tool_call_id": tool.id, "output": get_current_temperature(**arguments)})
-        elif tool.function.name == "get_rain_probability":
-          tool_outputs.append({"tool_call_id": tool.id, "output": "0.06"})
-        
+      # Show any text streamed so far before the tools run
+      self.sink.flush()
+      # Run the tool calls concurrently; failures come back as "Error: ..." outputs
+      tool_calls = data.required_action.submit_tool_outputs.tool_calls
+      with tracer.span("tool_calls", count=len(tool_calls)):
+        tool_outputs = self.executor.run(tool_calls)
+
       # Submit all tool_outputs at the same time
       self.submit_tool_outputs(tool_outputs, run_id)
  
     def submit_tool_outputs(self, tool_outputs, run_id):
-      # Use the submit_tool_outputs_stream helper
-      with client.beta.threads.runs.submit_tool_outputs_stream(
-        thread_id=self.current_run.thread_id,
-        run_id=self.current_run.id,
-        tool_outputs=tool_outputs,
-        event_handler=EventHandler(),
-      ) as stream:
-        for text in stream.text_deltas:
-          print(text, end="", flush=True)
-        print('output')
-        print()
-
-def main(client, assistant):
+      # Picked up by run_stream once the current stream has ended
+      self.pending_tool_outputs = (run_id, tool_outputs)
+
+def run_stream(client, thread_id, assistant_id, handler, max_rounds=DEFAULT_MAX_TOOL_ROUNDS):
+    """
+    Streams a run to completion, answering its tool calls in a flat loop.
+
+    Each `requires_action` round closes the current stream and opens one
+    `submit_tool_outputs_stream`, so the call stack and the number of open
+    streams stay the same however many rounds the run needs.
+
+    Args:
+        client: The initialized API client.
+        thread_id: ID of the conversation thread.
+        assistant_id: ID of the assistant to run.
+        handler: The EventHandler receiving every event.
+        max_rounds: Maximum number of tool-call rounds before the run is cancelled.
+
+    Returns:
+        The final Run object.
+    """
+    # Streams get a longer read timeout than polling; the connection comes from the shared pool
+    from http_client import stream_timeout
+    timeout = stream_timeout()
+    handler.reset()
+    stream_manager = client.beta.threads.runs.stream(
+        thread_id=thread_id,
+        assistant_id=assistant_id,
+        timeout=timeout,
+    )
+    rounds = 0
+    while True:
+        with stream_manager as stream:
+            for event in stream:
+                handler.on_event(event)
+
+        if handler.pending_tool_outputs is None:
+            handler.on_run_done()
+            return handler.current_run
+
+        run_id, tool_outputs = handler.pending_tool_outputs
+        handler.pending_tool_outputs = None
+        if rounds >= max_rounds:
+            client.beta.threads.runs.cancel(run_id, thread_id=thread_id)
+            raise RuntimeError(f"Run {run_id} needed more than {max_rounds} rounds of tool calls.")
+        rounds += 1
+
+        with tracer.span("submit"):
+            stream_manager = client.beta.threads.runs.submit_tool_outputs_stream(
+                thread_id=thread_id,
+                run_id=run_id,
+                tool_outputs=tool_outputs,
+                timeout=timeout,
+            )
+
+def main(client, assistant, thread_pool=None):
     """
     Main function to run the interactive ChatGPT assistant.
     
     Args:
         client: The initialized API client.
         assistant: The assistant instance to interact with.
+        thread_pool: Optional ConversationPool to take the conversation thread from.
     """
     print("Welcome to the ChatGPT Interactive Assistant!")
     print("Type 'exit' or 'quit' to end the conversation.\n")
 
     try:
-        # Create a new thread for the conversation
-        thread = client.beta.threads.create()
+        # Create a new thread for the conversation, or take a pre-created one
+        if thread_pool is not None:
+            thread = thread_pool.acquire()
+        else:
+            thread = client.beta.threads.create()
     except Exception as e:
         print(f"Error creating thread: {e}")
         sys.exit(1)  # Exit the program if thread creation fails
 
+    # One handler for the whole conversation
+    handler = EventHandler(client)
 
     while True:
         user_input = input("You: ").strip()
@@ -189,38 +249,59 @@ def main(client, assistant):
             continue
 
         try:
-            # Create a message in the thread
-            message = client.beta.threads.messages.create(
-                thread_id=thread.id,
-                role="user",
-                content=user_input,
-            )
+            with tracer.turn() as turn, profile_turn(turn):
+                # Create a message in the thread
+                with tracer.span("message_post"):
+                    message = client.beta.threads.messages.create(
+                        thread_id=thread.id,
+                        role="user",
+                        content=user_input,
+                    )
+
+                # Handle the stream, including any rounds of tool calls
+                run_stream(client, thread.id, assistant.id, handler)
 
-            # Handle the stream
-            with client.beta.threads.runs.stream(
-                thread_id=thread.id,
-                assistant_id=assistant.id,
-                event_handler=EventHandler()
-            ) as stream:
-                print('until_done')
-                stream.until_done()
-                continue
-                
         except Exception as e:
+            handler.sink.flush()
             print(f"An error occurred: {e}")
             # Optionally, you can decide whether to break the loop or continue
             continue
 
+    handler.sink.close()
+    logger.debug(f"Output sink: {handler.sink.stats()}")
+    if hasattr(client, "scheduler"):
+        logger.debug(f"Request scheduler: {client.scheduler.stats()}")
+    write_metrics()
+
 # Example initialization (you need to replace these with your actual initialization code)
 if __name__ == "__main__":
+    # Configure logging
+    logging.basicConfig(level=logging.INFO)
+    from http_client import close_pool, pool_stats, warm_up
     try:
         assistant_id = 'asst_qAFskEUFjndMGiSXOBKZg7AN'
         # Initialize your API client here
         client = initialize_client()  # Replace with actual client initialization
+        # Open the connection while the assistant is looked up, not in the first turn
+        warm_up(str(client.base_url))
+        # Number of empty threads to keep pre-created (0 disables the pool)
+        thread_pool_size = int(os.getenv("THREAD_POOL_SIZE", "0"))
+        # Warm threads in the background while the assistant is being looked up
+        thread_pool = None
+        if thread_pool_size > 0:
+            # Warming threads must never hold up a user's request
+            thread_pool = ConversationPool(client, low_water=thread_pool_size,
+                                           background_client=client.with_lane("background")).start()
         assistant = get_assistant(client,assistant_id)  # Replace with actual assistant retrieval
     except Exception as init_e:
         print(f"Failed to initialize client or assistant: {init_e}")
         sys.exit(1)
 
-    main(client, assistant)
+    try:
+        main(client, assistant, thread_pool=thread_pool)
+        logger.debug(f"HTTP pool: {pool_stats()}")
+    finally:
+        if thread_pool is not None:
+            thread_pool.close()
+        close_pool()
 
@@ -0,0 +1,55 @@
+DEFAULT_PAGE_SIZE = 20
+
+
+class MessageCursor:
+    """
+    Remembers the newest message already seen in a thread.
+
+    Instead of listing the whole thread after every run, `fetch_new` asks only
+    for messages after the cursor (and, when given, created by one run), so
+    the payload per turn stays the same size however long the conversation
+    gets.
+
+    Args:
+        client: The initialized API client.
+        thread_id: ID of the conversation thread.
+        page_size: Number of messages requested per page.
+        last_message_id: Optional ID of the newest message already seen.
+    """
+
+    def __init__(self, client, thread_id, page_size=DEFAULT_PAGE_SIZE, last_message_id=None):
+        self.client = client
+        self.thread_id = thread_id
+        self.page_size = page_size
+        self.last_message_id = last_message_id
+
+    def advance(self, message_id):
+        """
+        Moves the cursor past a message we already know about (e.g. one we just posted).
+        """
+        self.last_message_id = message_id
+
+    def fetch_new(self, run_id=None):
+        """
+        Returns the messages created since the cursor, oldest first, and moves the cursor.
+
+        Args:
+            run_id: Only return messages created by this run.
+        """
+        new_messages = []
+        while True:
+            params = {"thread_id": self.thread_id, "order": "asc", "limit": self.page_size}
+            if run_id is not None:
+                params["run_id"] = run_id
+            if self.last_message_id is not None:
+                params["after"] = self.last_message_id
+
+            page = self.client.beta.threads.messages.list(**params)
+            if not page.data:
+                break
+            new_messages.extend(page.data)
+            self.last_message_id = page.data[-1].id
+            # A short page is the last one, whether or not the SDK reports `has_more`
+            if len(page.data) < self.page_size or getattr(page, "has_more", None) is False:
+                break
+        return new_messages
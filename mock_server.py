@@ -0,0 +1,515 @@
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import itertools
+import json
+import logging
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPLY = "The current temperature in San Francisco is 18 Celsius with a 6% chance of rain."
+
+
+class MockScript:
+    """
+    What the mock assistant does on every run.
+
+    Args:
+        tool_rounds: List of tool-call rounds. Each round is a list of
+            `{"name": ..., "arguments": {...}}` dicts the run asks for before
+            it produces the reply. An empty list means no tool calls.
+        reply: Text of the final assistant message.
+        think_time: Seconds a run stays in progress before each status change.
+        token_delay: Seconds between streamed text deltas.
+        chunk_words: Number of words per text delta.
+    """
+
+    def __init__(self, tool_rounds=None, reply=DEFAULT_REPLY, think_time=0.05, token_delay=0.005,
+                 chunk_words=1):
+        self.tool_rounds = tool_rounds if tool_rounds is not None else []
+        self.reply = reply
+        self.think_time = think_time
+        self.token_delay = token_delay
+        self.chunk_words = chunk_words
+
+    def reply_chunks(self):
+        words = self.reply.split(" ")
+        for i in range(0, len(words), self.chunk_words):
+            chunk = " ".join(words[i:i + self.chunk_words])
+            yield chunk if i == 0 else " " + chunk
+
+
+class MockState:
+    """
+    In-memory store of everything the mock API created.
+    """
+
+    def __init__(self, script):
+        self.script = script
+        # Re-entrant because message creation happens while a run is being advanced
+        self.lock = threading.RLock()
+        self.assistants = {}
+        self.threads = {}
+        self.messages = {}  # thread_id -> list of messages, oldest first
+        self.runs = {}  # run_id -> run dict
+        self._ids = itertools.count(1)
+        self.requests = 0
+
+    def new_id(self, prefix):
+        return f"{prefix}_mock{next(self._ids):08d}"
+
+
+def _now():
+    return int(time.time())
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    """
+    Implements the subset of the Assistants API used by this project.
+    """
+
+    protocol_version = "HTTP/1.1"
+    server_version = "MockAssistants/1.0"
+    # Headers and body go out in separate writes; without this, Nagle's
+    # algorithm adds ~40ms to every keep-alive response
+    disable_nagle_algorithm = True
+
+    # Routing ---------------------------------------------------------------
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        if parts and parts[0] == "v1":
+            parts = parts[1:]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+        with self.state.lock:
+            self.state.requests += 1
+
+        try:
+            route = self._route(method, parts)
+            if route is None:
+                return self._send_error(404, f"No route for {method} {url.path}")
+            route(parts, query, body)
+        except KeyError as e:
+            self._send_error(404, f"No such object: {e}")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _route(self, method, parts):
+        n = len(parts)
+        if n >= 1 and parts[0] == "assistants":
+            if method == "POST" and n == 1:
+                return self.create_assistant
+            if method == "GET" and n == 2:
+                return self.retrieve_assistant
+            if method == "POST" and n == 2:
+                return self.update_assistant
+        if n >= 1 and parts[0] == "threads":
+            if method == "POST" and n == 1:
+                return self.create_thread
+            if method == "GET" and n == 2:
+                return self.retrieve_thread
+            if method == "DELETE" and n == 2:
+                return self.delete_thread
+            if n == 3 and parts[2] == "messages":
+                return self.create_message if method == "POST" else self.list_messages
+            if n == 3 and parts[2] == "runs" and method == "POST":
+                return self.create_run
+            if n == 4 and parts[2] == "runs" and method == "GET":
+                return self.retrieve_run
+            if n == 5 and parts[2] == "runs" and parts[4] == "submit_tool_outputs" and method == "POST":
+                return self.submit_tool_outputs
+            if n == 5 and parts[2] == "runs" and parts[4] == "cancel" and method == "POST":
+                return self.cancel_run
+        return None
+
+    # Responses -------------------------------------------------------------
+
+    def _send_json(self, payload, status=200):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status, message):
+        self._send_json({"error": {"message": message, "type": "invalid_request_error"}}, status)
+
+    def _start_sse(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        # No Content-Length, so the end of the stream is marked by closing the connection
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+    def _send_event(self, event, data):
+        payload = data if isinstance(data, str) else json.dumps(data)
+        self.wfile.write(f"event: {event}\ndata: {payload}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    # Assistants ------------------------------------------------------------
+
+    def create_assistant(self, parts, query, body):
+        assistant = {
+            "id": self.state.new_id("asst"),
+            "object": "assistant",
+            "created_at": _now(),
+            "name": body.get("name"),
+            "description": body.get("description"),
+            "model": body.get("model"),
+            "instructions": body.get("instructions"),
+            "tools": body.get("tools", []),
+            "metadata": body.get("metadata") or {},
+            "temperature": 1.0,
+            "top_p": 1.0,
+            "response_format": "auto",
+        }
+        with self.state.lock:
+            self.state.assistants[assistant["id"]] = assistant
+        self._send_json(assistant)
+
+    def retrieve_assistant(self, parts, query, body):
+        self._send_json(self.state.assistants[parts[1]])
+
+    def update_assistant(self, parts, query, body):
+        with self.state.lock:
+            assistant = self.state.assistants[parts[1]]
+            assistant.update({k: v for k, v in body.items() if k in assistant})
+        self._send_json(assistant)
+
+    # Threads and messages --------------------------------------------------
+
+    def create_thread(self, parts, query, body):
+        thread = {
+            "id": self.state.new_id("thread"),
+            "object": "thread",
+            "created_at": _now(),
+            "metadata": body.get("metadata") or {},
+            "tool_resources": None,
+        }
+        with self.state.lock:
+            self.state.threads[thread["id"]] = thread
+            self.state.messages[thread["id"]] = []
+        self._send_json(thread)
+
+    def retrieve_thread(self, parts, query, body):
+        self._send_json(self.state.threads[parts[1]])
+
+    def delete_thread(self, parts, query, body):
+        with self.state.lock:
+            del self.state.threads[parts[1]]
+            self.state.messages.pop(parts[1], None)
+        self._send_json({"id": parts[1], "object": "thread.deleted", "deleted": True})
+
+    def _new_message(self, thread_id, role, text, run=None, status="completed"):
+        message = {
+            "id": self.state.new_id("msg"),
+            "object": "thread.message",
+            "created_at": _now(),
+            "thread_id": thread_id,
+            "role": role,
+            "content": [{"type": "text", "text": {"value": text, "annotations": []}}] if text else [],
+            "assistant_id": run["assistant_id"] if run else None,
+            "run_id": run["id"] if run else None,
+            "attachments": [],
+            "metadata": {},
+            "status": status,
+            "incomplete_details": None,
+            "completed_at": _now() if status == "completed" else None,
+            "incomplete_at": None,
+        }
+        with self.state.lock:
+            self.state.messages[thread_id].append(message)
+        return message
+
+    def create_message(self, parts, query, body):
+        content = body.get("content", "")
+        if isinstance(content, list):
+            content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+        self._send_json(self._new_message(parts[1], body.get("role", "user"), content))
+
+    def list_messages(self, parts, query, body):
+        with self.state.lock:
+            messages = list(self.state.messages[parts[1]])
+        if query.get("order", "desc") == "desc":
+            messages.reverse()
+        if query.get("after"):
+            # The cursor may be a message the run_id filter would drop, so apply it first
+            ids = [m["id"] for m in messages]
+            messages = messages[ids.index(query["after"]) + 1:] if query["after"] in ids else []
+        if query.get("run_id"):
+            messages = [m for m in messages if m["run_id"] == query["run_id"]]
+        limit = int(query.get("limit", 20))
+        page = messages[:limit]
+        self._send_json({
+            "object": "list",
+            "data": page,
+            "first_id": page[0]["id"] if page else None,
+            "last_id": page[-1]["id"] if page else None,
+            "has_more": len(messages) > limit,
+        })
+
+    # Runs ------------------------------------------------------------------
+
+    def _new_run(self, thread_id, body):
+        assistant = self.state.assistants.get(body.get("assistant_id"), {})
+        run = {
+            "id": self.state.new_id("run"),
+            "object": "thread.run",
+            "created_at": _now(),
+            "assistant_id": body.get("assistant_id"),
+            "thread_id": thread_id,
+            "status": "queued",
+            "required_action": None,
+            "last_error": None,
+            "expires_at": None,
+            "started_at": None,
+            "cancelled_at": None,
+            "failed_at": None,
+            "completed_at": None,
+            "incomplete_details": None,
+            "model": assistant.get("model", "gpt-4o"),
+            "instructions": body.get("instructions") or assistant.get("instructions", ""),
+            "tools": assistant.get("tools", []),
+            "metadata": {},
+            "usage": None,
+            "temperature": 1.0,
+            "top_p": 1.0,
+            "max_prompt_tokens": None,
+            "max_completion_tokens": None,
+            "truncation_strategy": {"type": "auto", "last_messages": None},
+            "tool_choice": "auto",
+            "parallel_tool_calls": True,
+            "response_format": "auto",
+            # Private bookkeeping, stripped before sending
+            "_round": 0,
+            "_resumed_at": time.monotonic(),
+        }
+        with self.state.lock:
+            self.state.runs[run["id"]] = run
+        return run
+
+    @staticmethod
+    def _public(run):
+        return {k: v for k, v in run.items() if not k.startswith("_")}
+
+    def _required_action(self, run):
+        calls = []
+        for call in self.state.script.tool_rounds[run["_round"]]:
+            calls.append({
+                "id": self.state.new_id("call"),
+                "type": "function",
+                "function": {"name": call["name"], "arguments": json.dumps(call.get("arguments", {}))},
+            })
+        return {"type": "submit_tool_outputs", "submit_tool_outputs": {"tool_calls": calls}}
+
+    def _usage(self):
+        completion_tokens = len(self.state.script.reply.split())
+        return {"prompt_tokens": 50, "completion_tokens": completion_tokens,
+                "total_tokens": 50 + completion_tokens}
+
+    def _advance(self, run):
+        # Moves a polled run forward once its think time has passed
+        if run["status"] not in ("queued", "in_progress"):
+            return
+        if time.monotonic() - run["_resumed_at"] < self.state.script.think_time:
+            run["status"] = "in_progress"
+            run["started_at"] = run["started_at"] or _now()
+            return
+        if run["_round"] < len(self.state.script.tool_rounds):
+            run["status"] = "requires_action"
+            run["required_action"] = self._required_action(run)
+        else:
+            self._new_message(run["thread_id"], "assistant", self.state.script.reply, run)
+            run["status"] = "completed"
+            run["completed_at"] = _now()
+            run["usage"] = self._usage()
+
+    def create_run(self, parts, query, body):
+        run = self._new_run(parts[1], body)
+        if body.get("stream"):
+            self._stream_run(run)
+        else:
+            self._send_json(self._public(run))
+
+    def retrieve_run(self, parts, query, body):
+        with self.state.lock:
+            run = self.state.runs[parts[3]]
+            self._advance(run)
+            payload = self._public(run)
+        self._send_json(payload)
+
+    def submit_tool_outputs(self, parts, query, body):
+        with self.state.lock:
+            run = self.state.runs[parts[3]]
+        if run["status"] != "requires_action":
+            return self._send_error(400, f"Run {run['id']} is not waiting for tool outputs")
+        expected = {c["id"] for c in run["required_action"]["submit_tool_outputs"]["tool_calls"]}
+        submitted = {o.get("tool_call_id") for o in body.get("tool_outputs", [])}
+        if expected != submitted:
+            return self._send_error(400, "Tool outputs do not match the requested tool calls")
+        run["_round"] += 1
+        run["_resumed_at"] = time.monotonic()
+        run["status"] = "queued"
+        run["required_action"] = None
+        if body.get("stream"):
+            self._stream_run(run, resumed=True)
+        else:
+            self._send_json(self._public(run))
+
+    def cancel_run(self, parts, query, body):
+        with self.state.lock:
+            run = self.state.runs[parts[3]]
+            if run["status"] in ("completed", "failed", "cancelled", "expired"):
+                return self._send_error(400, f"Cannot cancel run with status '{run['status']}'")
+            run["status"] = "cancelled"
+            run["cancelled_at"] = _now()
+            run["required_action"] = None
+            payload = self._public(run)
+        self._send_json(payload)
+
+    def _stream_run(self, run, resumed=False):
+        script = self.state.script
+        self._start_sse()
+        if not resumed:
+            self._send_event("thread.run.created", self._public(run))
+            self._send_event("thread.run.queued", self._public(run))
+        time.sleep(script.think_time)
+        run["status"] = "in_progress"
+        run["started_at"] = run["started_at"] or _now()
+        self._send_event("thread.run.in_progress", self._public(run))
+
+        if run["_round"] < len(script.tool_rounds):
+            run["status"] = "requires_action"
+            run["required_action"] = self._required_action(run)
+            self._send_event("thread.run.requires_action", self._public(run))
+            self._send_event("done", "[DONE]")
+            return
+
+        message = self._new_message(run["thread_id"], "assistant", "", run, status="in_progress")
+        self._send_event("thread.message.created", message)
+        self._send_event("thread.message.in_progress", message)
+        for index, chunk in enumerate(script.reply_chunks()):
+            if index and script.token_delay:
+                time.sleep(script.token_delay)
+            self._send_event("thread.message.delta", {
+                "id": message["id"],
+                "object": "thread.message.delta",
+                "delta": {"content": [{"index": 0, "type": "text", "text": {"value": chunk, "annotations": []}}]},
+            })
+        message.update({
+            "status": "completed",
+            "completed_at": _now(),
+            "content": [{"type": "text", "text": {"value": script.reply, "annotations": []}}],
+        })
+        self._send_event("thread.message.completed", message)
+        run["status"] = "completed"
+        run["completed_at"] = _now()
+        run["usage"] = self._usage()
+        self._send_event("thread.run.completed", self._public(run))
+        self._send_event("done", "[DONE]")
+
+
+class MockServer:
+    """
+    Runs the mock Assistants API on a local port in a background thread.
+
+    Point a client at it with `OpenAI(base_url=server.base_url, api_key="mock")`.
+
+    Args:
+        script: The MockScript every run follows.
+        host: Interface to bind.
+        port: Port to bind; 0 picks a free one.
+    """
+
+    def __init__(self, script=None, host="127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), MockRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = MockState(script or MockScript())
+        self._thread = None
+
+    @property
+    def state(self):
+        return self.httpd.state
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the Assistants API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--think-time", type=float, default=0.05)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--tool-rounds", type=int, default=1,
+                        help="Rounds of get_current_temperature/get_rain_probability calls per run")
+    return parser.parse_args(argv)
+
+
+def weather_tool_rounds(rounds, locations=("San Francisco, CA",)):
+    """
+    Builds tool-call rounds asking for temperature and rain in each location.
+    """
+    calls = []
+    for location in locations:
+        calls.append({"name": "get_current_temperature", "arguments": {"location": location, "unit": "Celsius"}})
+        calls.append({"name": "get_rain_probability", "arguments": {"location": location}})
+    return [list(calls) for _ in range(rounds)]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    script = MockScript(
+        tool_rounds=weather_tool_rounds(args.tool_rounds),
+        think_time=args.think_time,
+        token_delay=args.token_delay,
+    )
+    server = MockServer(script, args.host, args.port)
+    print(f"Mock Assistants API listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down.")
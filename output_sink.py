@@ -0,0 +1,251 @@
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Flush once this many bytes are buffered...
+DEFAULT_MAX_BYTES = int(os.getenv("OUTPUT_SINK_MAX_BYTES", "4096"))
+# ...or once the oldest buffered text is this many seconds old
+DEFAULT_MAX_DELAY = float(os.getenv("OUTPUT_SINK_MAX_DELAY", "0.05"))
+
+
+class OutputSink:
+    """
+    Coalesces text deltas and writes them out in batches.
+
+    A streamed reply arrives as many tiny deltas; writing and flushing each
+    one costs a syscall per token. Deltas are buffered instead and handed to
+    `emit` together once `max_bytes` have accumulated or the oldest pending
+    delta is `max_delay` seconds old, whichever comes first. A background
+    thread enforces the delay even when the stream goes quiet, so no text
+    waits longer than `max_delay` (a `max_delay` of 0 writes through).
+
+    Args:
+        emit: Callable receiving each coalesced chunk of text.
+        max_bytes: Buffered size (UTF-8 bytes) that triggers a flush.
+        max_delay: Upper bound, in seconds, on how long text stays buffered.
+    """
+
+    def __init__(self, emit, max_bytes=DEFAULT_MAX_BYTES, max_delay=DEFAULT_MAX_DELAY, clock=time.monotonic):
+        self.emit = emit
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.clock = clock
+        self._pending = []
+        self._pending_bytes = 0
+        self._deadline = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flusher = None
+        self.writes = 0
+        self.bytes = 0
+        self.flushes = 0
+
+    def write(self, text):
+        if not text:
+            return
+        size = len(text.encode("utf-8"))
+        with self._lock:
+            if self._closed:
+                raise ValueError("Write to a closed output sink.")
+            self._pending.append(text)
+            self._pending_bytes += size
+            self.writes += 1
+            if self._pending_bytes >= self.max_bytes or self.max_delay <= 0:
+                self._flush_locked()
+            elif self._deadline is None:
+                self._deadline = self.clock() + self.max_delay
+                self._start_flusher()
+                self._wakeup.notify()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._flush_locked()
+            self._closed = True
+            self._wakeup.notify()
+        if self._flusher is not None:
+            self._flusher.join()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "writes": self.writes,
+                "bytes": self.bytes,
+                "flushes": self.flushes,
+                "writes_per_flush": self.writes / self.flushes if self.flushes else 0.0,
+            }
+
+    def _flush_locked(self):
+        self._deadline = None
+        if not self._pending:
+            return
+        chunk = "".join(self._pending)
+        self.bytes += self._pending_bytes
+        self.flushes += 1
+        self._pending = []
+        self._pending_bytes = 0
+        self.emit(chunk)
+
+    def _start_flusher(self):
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_when_due, name="output-sink", daemon=True)
+            self._flusher.start()
+
+    def _flush_when_due(self):
+        with self._lock:
+            while not self._closed:
+                if self._deadline is None:
+                    self._wakeup.wait()
+                    continue
+                remaining = self._deadline - self.clock()
+                if remaining > 0:
+                    self._wakeup.wait(remaining)
+                    continue
+                try:
+                    self._flush_locked()
+                except Exception as e:
+                    logger.warning(f"Failed to flush output: {e}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class StreamSink(OutputSink):
+    """
+    Writes to a text stream, by default whatever `sys.stdout` is at flush time.
+    """
+
+    def __init__(self, stream=None, **kwargs):
+        super().__init__(self._emit, **kwargs)
+        self.stream = stream
+
+    def _emit(self, chunk):
+        stream = self.stream or sys.stdout
+        stream.write(chunk)
+        stream.flush()
+
+
+class FileSink(StreamSink):
+    """
+    Appends to a file, which is closed together with the sink.
+    """
+
+    def __init__(self, path, mode="a", encoding="utf-8", **kwargs):
+        super().__init__(open(path, mode, encoding=encoding), **kwargs)
+        self.path = path
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self.stream.close()
+
+
+class AsyncQueueSink:
+    """
+    Async counterpart of OutputSink that feeds a session's asyncio.Queue.
+
+    Coalesced chunks are put on `queue`; a full queue makes `write` wait,
+    which keeps the backpressure of the unbuffered path. The delay bound is
+    enforced with a timer on the event loop.
+
+    Args:
+        queue: asyncio.Queue receiving each coalesced chunk.
+        max_bytes: Buffered size (UTF-8 bytes) that triggers a flush.
+        max_delay: Upper bound, in seconds, on how long text stays buffered.
+    """
+
+    def __init__(self, queue, max_bytes=DEFAULT_MAX_BYTES, max_delay=DEFAULT_MAX_DELAY, clock=time.monotonic):
+        self.queue = queue
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.clock = clock
+        self._pending = []
+        self._pending_bytes = 0
+        self._deadline = None
+        self._timer = None
+        self._flush_task = None  # a flush started by the timer, kept so it is not garbage-collected
+        # Imported here so that the blocking sinks do not pay for asyncio at startup
+        import asyncio
+        self._lock = asyncio.Lock()
+        self.writes = 0
+        self.bytes = 0
+        self.flushes = 0
+
+    async def write(self, text):
+        if not text:
+            return
+        self._pending.append(text)
+        self._pending_bytes += len(text.encode("utf-8"))
+        self.writes += 1
+        if self._pending_bytes >= self.max_bytes or self.max_delay <= 0:
+            await self.flush()
+        elif self._deadline is None:
+            self._deadline = self.clock() + self.max_delay
+            import asyncio
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._flush_when_due)
+
+    async def flush(self):
+        async with self._lock:
+            self._cancel_timer()
+            if not self._pending:
+                return
+            chunk = "".join(self._pending)
+            self.bytes += self._pending_bytes
+            self.flushes += 1
+            self._pending = []
+            self._pending_bytes = 0
+            await self.queue.put(chunk)
+
+    async def aclose(self):
+        await self.flush()
+
+    def discard(self):
+        """
+        Drops any buffered text and stops the delay timer, e.g. when the reader went away.
+        """
+        self._cancel_timer()
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self._pending = []
+        self._pending_bytes = 0
+
+    def stats(self):
+        return {
+            "writes": self.writes,
+            "bytes": self.bytes,
+            "flushes": self.flushes,
+            "writes_per_flush": self.writes / self.flushes if self.flushes else 0.0,
+        }
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._deadline = None
+
+    def _flush_when_due(self):
+        self._timer = None
+        import asyncio
+        self._flush_task = asyncio.ensure_future(self.flush())
+        self._flush_task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task):
+        if self._flush_task is task:
+            self._flush_task = None
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Timed flush of the output sink failed", exc_info=task.exception())
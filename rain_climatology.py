@@ -0,0 +1,260 @@
+import argparse
+import calendar
+from datetime import datetime, timezone
+import math
+import os
+import struct
+import time
+
+import numpy as np
+
+from weather_grid import TemperatureGrid, write_grid
+
+# File layout: a fixed little-endian header, zero padding up to DATA_OFFSET,
+# then uint8 probabilities (0-255 for 0.0-1.0) with shape (day of year, lat, lon)
+MAGIC = b"RCLM"
+VERSION = 2  # 2: fixed leap-year slots, so version 1 tables must be rebuilt
+_HEADER = struct.Struct("<4sIIII4dd")  # magic, version, days, nlat, nlon, lat0, dlat, lon0, dlon, threshold
+DATA_OFFSET = 128
+DAYS = 366  # day-of-year slots on a leap-year calendar, so 29 February gets its own entry
+SCALE = 255
+
+# Slot of the 1st of each month; 1 March is slot 60 in every year
+_MONTH_SLOTS = (0, 31, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335)
+_FEBRUARY_28 = 58
+
+DEFAULT_THRESHOLD = 0.1  # mm of precipitation that makes a day count as wet
+DEFAULT_WINDOW = 7       # days on each side pooled into every day's estimate
+DEFAULT_CHUNK_DAYS = 365  # days of history processed per vectorized step
+
+
+def day_of_year(when):
+    """
+    Returns the day-of-year slot of Unix time `when` (UTC), the fraction of
+    that day elapsed and the slot of the following day.
+
+    Slots follow a leap-year calendar, so a date has the same slot in every
+    year and slot 59 (29 February) is skipped in other years.
+    """
+    moment = datetime.fromtimestamp(when, tz=timezone.utc)
+    seconds = moment.hour * 3600 + moment.minute * 60 + moment.second
+    slot = _MONTH_SLOTS[moment.month - 1] + moment.day - 1
+    if slot == DAYS - 1:
+        following = 0
+    elif slot == _FEBRUARY_28 and not calendar.isleap(moment.year):
+        following = _FEBRUARY_28 + 2
+    else:
+        following = slot + 1
+    return slot, seconds / 86400.0, following
+
+
+def build_tables(precipitation, t0, dt=86400.0, threshold=DEFAULT_THRESHOLD, window=DEFAULT_WINDOW,
+                 chunk_days=DEFAULT_CHUNK_DAYS):
+    """
+    Computes the chance of a wet day for every grid cell and day of year.
+
+    Wet days are counted per day of year one chunk of history at a time.
+    Chunks never cross New Year, so within a chunk every day maps to a
+    different slot and the counts are one vectorized fancy-indexed add.
+    Counts are then pooled over a circular window of +/- `window` days with
+    a cumulative sum, so the cost is linear in the size of the dataset and
+    independent of the window.
+
+    Args:
+        precipitation: Array of daily precipitation in mm, shape (days, nlat, nlon).
+        t0: Unix time of the first day.
+        dt: Seconds between entries (one day).
+        threshold: Precipitation at or above which a day counts as wet.
+        window: Days on each side pooled into every estimate.
+        chunk_days: Maximum days processed per step, which bounds memory use.
+
+    Returns:
+        A uint8 array of shape (366, nlat, nlon), 255 meaning certain rain.
+    """
+    ndays, nlat, nlon = precipitation.shape
+    doys = np.array([day_of_year(t0 + n * dt)[0] for n in range(ndays)], dtype=np.intp)
+    total = np.bincount(doys, minlength=DAYS).astype(np.uint64)
+    wet = np.zeros((DAYS, nlat, nlon), dtype=np.uint32)
+
+    # Chunk boundaries: every New Year, and every chunk_days within a year
+    boundaries = [0] + [n for n in range(1, ndays) if doys[n] <= doys[n - 1]] + [ndays]
+    for year_start, year_end in zip(boundaries, boundaries[1:]):
+        for start in range(year_start, year_end, chunk_days):
+            end = min(start + chunk_days, year_end)
+            wet[doys[start:end]] += np.asarray(precipitation[start:end]) >= threshold
+
+    # Pool neighbouring days (wrapping around the year) with a running sum
+    padded = np.concatenate([wet[-window:], wet, wet[:window]]) if window else wet
+    cumulative = np.concatenate([np.zeros((1, nlat, nlon), dtype=np.uint64),
+                                 np.cumsum(padded, axis=0, dtype=np.uint64)])
+    pooled_wet = cumulative[2 * window + 1:] - cumulative[:-(2 * window + 1)]
+    padded_total = np.concatenate([total[-window:], total, total[:window]]) if window else total
+    cumulative_total = np.concatenate([np.zeros(1, dtype=np.uint64), np.cumsum(padded_total, dtype=np.uint64)])
+    pooled_total = cumulative_total[2 * window + 1:] - cumulative_total[:-(2 * window + 1)]
+
+    probability = pooled_wet / np.maximum(pooled_total, 1)[:, None, None]
+    return np.rint(probability * SCALE).astype(np.uint8)
+
+
+def write_tables(path, tables, lat0, dlat, lon0, dlon, threshold=DEFAULT_THRESHOLD):
+    tables = np.asarray(tables, dtype=np.uint8)
+    days, nlat, nlon = tables.shape
+    header = _HEADER.pack(MAGIC, VERSION, days, nlat, nlon, lat0, dlat, lon0, dlon, threshold)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header.ljust(DATA_OFFSET, b"\0"))
+        tables.tofile(f)
+    os.replace(tmp_path, path)
+
+
+class RainClimatology:
+    """
+    Per-cell, per-day-of-year rain probabilities loaded from a table file.
+
+    The tables are memory-mapped uint8 values, a quarter of the size of
+    float32. A query is bilinear in space and linear between the two nearest
+    days of the year, so it reads at most eight values whatever the size of
+    the history the tables were built from.
+    """
+
+    def __init__(self, tables, lat0, dlat, lon0, dlon, threshold=DEFAULT_THRESHOLD):
+        self.tables = tables
+        self.days, self.nlat, self.nlon = tables.shape
+        # Interpolation is shared with the temperature grid, with days of the year as time steps
+        self.grid = TemperatureGrid(tables, lat0, dlat, lon0, dlon, 0.0, 1.0)
+        self.threshold = threshold
+
+    @classmethod
+    def open(cls, path):
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError(f"{path} is too short to be a rain table.")
+        magic, version, days, nlat, nlon, lat0, dlat, lon0, dlon, threshold = _HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a rain table.")
+        if version != VERSION:
+            raise ValueError(f"Unsupported rain table version {version} in {path}.")
+        tables = np.memmap(path, dtype=np.uint8, mode="r", offset=DATA_OFFSET, shape=(days, nlat, nlon))
+        return cls(tables, lat0, dlat, lon0, dlon, threshold)
+
+    def probabilities(self, latitudes, longitudes, when=None):
+        """
+        Returns the chance of rain (0.0-1.0) at many points.
+
+        Args:
+            latitudes: Sequence of degrees north.
+            longitudes: Sequence of degrees east, same length.
+            when: Unix time for every point, a sequence of times (NaN meaning
+                now), or None for now.
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        now = time.time()
+        if when is None:
+            when = np.full(latitudes.shape, now)
+        else:
+            when = np.broadcast_to(np.asarray(when, dtype=np.float64), latitudes.shape)
+            when = np.where(np.isnan(when), now, when)
+        positions = [day_of_year(t) for t in when.tolist()]
+        day = np.array([d for d, _, _ in positions], dtype=np.float64)
+        fraction = np.array([f for _, f, _ in positions])
+        following = np.array([n for _, _, n in positions], dtype=np.float64)
+
+        today = self.grid.lookup_many(latitudes, longitudes, day)
+        tomorrow = self.grid.lookup_many(latitudes, longitudes, following)
+        return (today * (1 - fraction) + tomorrow * fraction) / SCALE
+
+    def probability(self, latitude, longitude, when=None):
+        """
+        Returns the chance of rain (0.0-1.0) at one point.
+        """
+        day, fraction, following = day_of_year(time.time() if when is None else when)
+        today = self.grid.lookup(latitude, longitude, day)
+        tomorrow = self.grid.lookup(latitude, longitude, following)
+        return (today * (1 - fraction) + tomorrow * fraction) / SCALE
+
+
+def write_synthetic_precipitation(path, years=3, resolution=2.0, start=None, seed=0):
+    """
+    Writes a plausible daily precipitation history for tests and benchmarks.
+
+    Days are wetter near the equator, and mid-latitudes get a rainy season
+    in their own hemisphere's winter. The file uses the weather_grid.py
+    layout with one step per day, in mm.
+
+    Returns:
+        The path written.
+    """
+    start = datetime(2000, 1, 1, tzinfo=timezone.utc).timestamp() if start is None else start
+    days = int(round(years * 365.25))
+    lats = np.arange(-90.0, 90.0 + resolution / 2, resolution)
+    lons = np.arange(-180.0, 180.0, resolution)
+    rng = np.random.default_rng(seed)
+    tropics = 0.15 + 0.45 * np.exp(-(lats / 15.0) ** 2)
+    hemisphere = np.sign(lats) * np.clip(np.abs(lats) / 60.0, 0, 1)
+    local = rng.uniform(0.7, 1.3, (lats.size, lons.size))
+
+    data = np.empty((days, lats.size, lons.size), dtype=np.float32)
+    for n in range(days):
+        season = math.cos(2 * math.pi * day_of_year(start + n * 86400.0)[0] / 365.25)
+        chance = np.clip((tropics + 0.15 * hemisphere * season)[:, None] * local, 0.0, 1.0)
+        wet = rng.random(chance.shape) < chance
+        data[n] = np.where(wet, rng.exponential(5.0, chance.shape), 0.0)
+    write_grid(path, data, lats[0], resolution, lons[0], resolution, start, 86400.0)
+    return path
+
+
+def build_from_history(source, path, threshold=DEFAULT_THRESHOLD, window=DEFAULT_WINDOW):
+    """
+    Builds a table file from a daily precipitation history in the weather_grid.py layout.
+
+    Returns:
+        The opened RainClimatology.
+    """
+    history = TemperatureGrid.open(source)
+    tables = build_tables(history.data, history.t0, history.dt or 86400.0, threshold, window)
+    write_tables(path, tables, history.lat0, history.dlat, history.lon0, history.dlon, threshold)
+    return RainClimatology.open(path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query rain probability tables.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    synthetic = commands.add_parser("synthetic", help="Write a synthetic daily precipitation history")
+    synthetic.add_argument("path")
+    synthetic.add_argument("--years", type=float, default=3)
+    synthetic.add_argument("--resolution", type=float, default=2.0)
+    synthetic.add_argument("--seed", type=int, default=0)
+
+    build = commands.add_parser("build", help="Build tables from a daily precipitation history")
+    build.add_argument("source")
+    build.add_argument("path")
+    build.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="mm that make a day wet")
+    build.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="Days pooled on each side")
+
+    lookup = commands.add_parser("lookup", help="Print the chance of rain at a point")
+    lookup.add_argument("path")
+    lookup.add_argument("latitude", type=float)
+    lookup.add_argument("longitude", type=float)
+    lookup.add_argument("--date", help="ISO 8601 date; defaults to now")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "synthetic":
+        write_synthetic_precipitation(args.path, args.years, args.resolution, seed=args.seed)
+        print(f"Wrote {args.years:g} years of daily precipitation to {args.path}")
+    elif args.command == "build":
+        started = time.perf_counter()
+        climatology = build_from_history(args.source, args.path, args.threshold, args.window)
+        print(f"Built {climatology.days} x {climatology.nlat} x {climatology.nlon} tables in "
+              f"{time.perf_counter() - started:.1f}s ({os.path.getsize(args.path) / 1e6:.1f} MB)")
+    else:
+        climatology = RainClimatology.open(args.path)
+        when = None
+        if args.date:
+            moment = datetime.fromisoformat(args.date)
+            when = (moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)).timestamp()
+        print(f"{climatology.probability(args.latitude, args.longitude, when):.2f}")
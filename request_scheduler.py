@@ -0,0 +1,366 @@
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Highest priority first: a waiting interactive call always goes before batch
+# work, and batch work before background jobs such as warming the thread pool
+LANES = ("interactive", "batch", "background")
+
+# Account limits, used unless OPENAI_RPM_LIMIT / OPENAI_TPM_LIMIT are set to your
+# organization's numbers for the model in use
+DEFAULT_RPM = 500
+DEFAULT_TPM = 30000
+DEFAULT_RUN_TOKENS = 1000  # estimated tokens charged for a call that starts or resumes a run
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 0.5  # seconds before the first retry, doubled on every attempt
+DEFAULT_MAX_DELAY = 30.0
+
+# Status codes worth retrying: rate limits, lock conflicts and server errors
+RETRY_STATUSES = frozenset({409, 429, 500, 502, 503, 504})
+
+# Methods that start or continue a run, and so spend most of the token budget
+_RUN_METHODS = frozenset({
+    "create", "create_and_poll", "create_and_stream", "stream",
+    "submit_tool_outputs", "submit_tool_outputs_and_poll", "submit_tool_outputs_stream",
+})
+
+
+class TokenBucket:
+    """
+    Refills at `rate` units per second up to `capacity`.
+
+    Not thread-safe; RequestScheduler only touches it under its lock.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.level = capacity
+        self._updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def time_until(self, amount):
+        """
+        Returns the seconds until `amount` units are available (0 if they already are).
+        """
+        self._refill()
+        # A request bigger than the bucket only has to wait for a full bucket
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount):
+        self._refill()
+        self.level -= amount
+
+
+def retry_after(error):
+    """
+    Returns the delay an error response asks for in its Retry-After headers, or None.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            import email.utils
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestScheduler:
+    """
+    Admits API calls within the account's rate limits, by priority lane.
+
+    Two token buckets model the requests-per-minute and tokens-per-minute
+    limits. Callers queue in their lane and the oldest call of the highest
+    priority lane is admitted first, as soon as both buckets allow it.
+    Failed calls that are worth retrying (429, 5xx, connection errors) are
+    retried with jittered exponential backoff; a Retry-After header sets the
+    delay instead and pauses every lane, since the limit is account-wide.
+
+    Args:
+        rpm: Requests per minute allowed; defaults to OPENAI_RPM_LIMIT, read when the scheduler is built.
+        tpm: Tokens per minute allowed; defaults to OPENAI_TPM_LIMIT.
+        max_retries: Retries per call before the error is raised.
+        base_delay: Seconds before the first retry.
+        max_delay: Upper bound on any backoff delay.
+        clock: Function returning the current time in seconds.
+        sleep: Function used to wait between retries.
+        rng: Function returning a random float in [0, 1), for jitter.
+    """
+
+    def __init__(self, rpm=None, tpm=None, max_retries=DEFAULT_MAX_RETRIES,
+                 base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY, clock=time.monotonic,
+                 sleep=time.sleep, rng=random.random):
+        # Read here rather than at import, so that a .env loaded by the entry point applies
+        if rpm is None:
+            rpm = int(os.getenv("OPENAI_RPM_LIMIT", DEFAULT_RPM))
+        if tpm is None:
+            tpm = int(os.getenv("OPENAI_TPM_LIMIT", DEFAULT_TPM))
+        self.requests = TokenBucket(rpm / 60.0, rpm, clock)
+        self.tokens = TokenBucket(tpm / 60.0, tpm, clock)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = rng
+        self._cond = threading.Condition()
+        self._waiting = []  # heap of (lane rank, sequence number)
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self._counters = {lane: {"queued": 0, "in_flight": 0, "admitted": 0, "retries": 0, "throttled": 0,
+                                 "failed": 0, "wait_seconds": 0.0} for lane in LANES}
+
+    def acquire(self, lane="interactive", tokens=0):
+        """
+        Blocks until a call in `lane` costing `tokens` may be sent.
+        """
+        if lane not in self._counters:
+            raise ValueError(f"Unknown lane '{lane}'. Must be one of: {', '.join(LANES)}.")
+        counters = self._counters[lane]
+        ticket = (LANES.index(lane), next(self._sequence))
+        started = self.clock()
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            counters["queued"] += 1
+            try:
+                while True:
+                    delay = None  # not at the head: wait to be notified
+                    if self._waiting[0] == ticket:
+                        delay = max(self._paused_until - self.clock(), self.requests.time_until(1),
+                                    self.tokens.time_until(tokens))
+                        if delay <= 0:
+                            self.requests.take(1)
+                            self.tokens.take(tokens)
+                            break
+                    self._cond.wait(delay)
+            finally:
+                if self._waiting[0] == ticket:
+                    heapq.heappop(self._waiting)
+                else:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                counters["queued"] -= 1
+                self._cond.notify_all()
+            counters["admitted"] += 1
+            counters["in_flight"] += 1
+            counters["wait_seconds"] += self.clock() - started
+
+    def _release(self, lane):
+        with self._cond:
+            self._counters[lane]["in_flight"] -= 1
+
+    def backoff(self, error, attempt):
+        """
+        Returns the seconds to wait before retrying after `error`, or None if it should not be retried.
+        """
+        # The SDK is loaded by then, since the error came from it
+        from openai import APIConnectionError, APIStatusError
+        if isinstance(error, APIStatusError):
+            if error.status_code not in RETRY_STATUSES:
+                return None
+        elif not isinstance(error, APIConnectionError):
+            return None
+        requested = retry_after(error)
+        if requested is not None:
+            # Honour the server, plus a little jitter so waiting callers do not retry in lockstep
+            return min(self.max_delay, requested) * (1 + 0.1 * self.rng())
+        return min(self.max_delay, self.base_delay * 2 ** attempt) * (0.5 + 0.5 * self.rng())
+
+    def call(self, fn, *args, lane="interactive", tokens=0, **kwargs):
+        """
+        Runs fn(*args, **kwargs) once admitted, retrying rate-limit and server errors.
+        """
+        attempt = 0
+        while True:
+            self.acquire(lane, tokens)
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                delay = self.backoff(e, attempt)
+                if delay is None or attempt >= self.max_retries:
+                    with self._cond:
+                        self._counters[lane]["failed"] += 1
+                    raise
+                with self._cond:
+                    self._counters[lane]["retries"] += 1
+                    if getattr(e, "status_code", None) == 429:
+                        self._counters[lane]["throttled"] += 1
+                        if retry_after(e) is not None:
+                            # The whole account is limited, so hold back every lane
+                            self._paused_until = max(self._paused_until, self.clock() + delay)
+                logger.info(f"Retrying {lane} request in {delay:.2f}s after: {e}")
+                attempt += 1
+            finally:
+                self._release(lane)
+            self.sleep(delay)
+
+    def stats(self):
+        """
+        Returns per-lane queue depth and counters, and the bucket levels.
+        """
+        with self._cond:
+            lanes = {lane: dict(counters) for lane, counters in self._counters.items()}
+            self.requests.time_until(0)  # refill before reading the levels
+            self.tokens.time_until(0)
+            return {
+                "lanes": lanes,
+                "requests_available": round(self.requests.level, 2),
+                "tokens_available": round(self.tokens.level, 2),
+                "paused_for": round(max(0.0, self._paused_until - self.clock()), 3),
+            }
+
+    def export_prometheus(self, metric="weather_chat_scheduler"):
+        """
+        Renders the lane counters as Prometheus gauges and counters.
+        """
+        stats = self.stats()
+        lines = []
+        for name in ("queued", "in_flight", "admitted", "retries", "throttled", "failed", "wait_seconds"):
+            kind = "gauge" if name in ("queued", "in_flight") else "counter"
+            lines.append(f"# TYPE {metric}_{name} {kind}")
+            for lane, counters in stats["lanes"].items():
+                lines.append(f'{metric}_{name}{{lane="{lane}"}} {counters[name]}')
+        return "\n".join(lines) + "\n"
+
+
+def estimate_tokens(path, kwargs, run_tokens=DEFAULT_RUN_TOKENS):
+    """
+    Guesses the tokens an API call will spend, for the tokens-per-minute bucket.
+    """
+    if "runs" in path and path[-1] in _RUN_METHODS:
+        return run_tokens
+    if path[-2:] == ("messages", "create"):
+        return len(str(kwargs.get("content", ""))) // 4
+    return 0
+
+
+class _ScheduledStream:
+    # Context manager standing in for a stream manager; the request is only
+    # sent on __enter__, so that is what goes through the scheduler
+    def __init__(self, scheduler, lane, tokens, open_manager, manager):
+        self._scheduler = scheduler
+        self._lane = lane
+        self._tokens = tokens
+        self._open_manager = open_manager
+        self._manager = manager
+
+    def _enter(self):
+        if self._manager is None:
+            # A manager that failed to enter cannot be reused
+            self._manager = self._open_manager()
+        try:
+            return self._manager.__enter__()
+        except Exception:
+            self._manager = None
+            raise
+
+    def __enter__(self):
+        return self._scheduler.call(self._enter, lane=self._lane, tokens=self._tokens)
+
+    def __exit__(self, *exc):
+        return self._manager.__exit__(*exc)
+
+
+class ScheduledClient:
+    """
+    Wraps an OpenAI client so that every API call goes through a RequestScheduler.
+
+    Resources are wrapped as they are accessed, so `client.beta.threads.
+    messages.create(...)` reads as usual. Stream managers are admitted
+    when the stream is opened. Use `with_lane` to get a view of the same
+    client for batch or background work.
+
+    Args:
+        client: The OpenAI client (or one of its resources).
+        scheduler: The RequestScheduler; defaults to the shared one (see `get_default_scheduler`).
+        lane: The lane calls are queued in.
+    """
+
+    def __init__(self, client, scheduler=None, lane="interactive", _path=()):
+        if lane not in LANES:
+            raise ValueError(f"Unknown lane '{lane}'. Must be one of: {', '.join(LANES)}.")
+        self._target = client
+        self._scheduler = scheduler or get_default_scheduler()
+        self._lane = lane
+        self._path = _path
+
+    @property
+    def scheduler(self):
+        return self._scheduler
+
+    def with_lane(self, lane):
+        return ScheduledClient(self._target, self._scheduler, lane, self._path)
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        path = self._path + (name,)
+        if getattr(value, "_client", None) is not None and not callable(value):
+            # An API resource such as `beta` or `threads`
+            return ScheduledClient(value, self._scheduler, self._lane, path)
+        if callable(value) and not name.startswith("_") and self._path:
+            return self._method(value, path)
+        return value
+
+    def _method(self, method, path):
+        scheduler, lane = self._scheduler, self._lane
+
+        def scheduled_method(*args, **kwargs):
+            tokens = estimate_tokens(path, kwargs)
+            if path[-1].endswith("stream"):
+                # The request is sent when the stream is entered
+                return _ScheduledStream(scheduler, lane, tokens, lambda: method(*args, **kwargs),
+                                        method(*args, **kwargs))
+            return scheduler.call(method, *args, lane=lane, tokens=tokens, **kwargs)
+        return scheduled_method
+
+
+# Shared by every client in the process, since the limits are per account
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def get_default_scheduler():
+    """
+    Returns the process-wide RequestScheduler, creating it on first use.
+
+    It is built lazily so that its limits come from the environment as it
+    is once the entry point has loaded its .env file.
+    """
+    global _default_scheduler
+    if _default_scheduler is None:
+        with _default_lock:
+            if _default_scheduler is None:
+                _default_scheduler = RequestScheduler()
+    return _default_scheduler
+
+
+def scheduled(client, scheduler=None, lane="interactive"):
+    """
+    Returns `client` wrapped in a ScheduledClient.
+
+    The SDK's own retries are switched off, so that every retry is paced by
+    the scheduler instead of being sent straight away.
+    """
+    return ScheduledClient(client.with_options(max_retries=0), scheduler, lane)
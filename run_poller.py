@@ -0,0 +1,135 @@
+from collections import defaultdict, deque, namedtuple
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INITIAL_INTERVAL = 0.1  # seconds before the first poll without history
+DEFAULT_MAX_INTERVAL = 2.0
+DEFAULT_BACKOFF = 1.6
+DEFAULT_JITTER = 0.2  # +/- fraction applied to every interval
+DEFAULT_HISTORY_SIZE = 50
+
+# Statuses at which polling stops; `requires_action` hands control back to us
+STOP_STATUSES = frozenset({"requires_action", "completed", "failed", "cancelled", "expired", "incomplete"})
+
+# polls: retrieve calls made. elapsed: seconds from start until the run stopped.
+# max_added_latency: the last interval slept, i.e. the most the result could
+# have waited compared with a stream that reports it the moment it happens.
+PollStats = namedtuple("PollStats", ["polls", "elapsed", "max_added_latency"])
+
+
+class AdaptivePoller:
+    """
+    Polls a run until it stops, with exponential backoff and jitter.
+
+    Polling starts quickly so short runs are noticed early, then backs off so
+    long runs do not burn requests and rate-limit budget. The durations of
+    past runs are kept per key (e.g. assistant and phase); once there is
+    history, the first poll is scheduled just before the run is expected to
+    finish instead of at a fixed interval.
+
+    Args:
+        initial_interval: Seconds before the first poll when there is no history.
+        max_interval: Upper bound on any single wait.
+        backoff: Factor each interval grows by.
+        jitter: Fraction by which every interval is randomly stretched or shrunk.
+        history_size: Number of past durations kept per key.
+    """
+
+    def __init__(self, initial_interval=DEFAULT_INITIAL_INTERVAL, max_interval=DEFAULT_MAX_INTERVAL,
+                 backoff=DEFAULT_BACKOFF, jitter=DEFAULT_JITTER, history_size=DEFAULT_HISTORY_SIZE,
+                 clock=time.monotonic, sleep=time.sleep, rng=random.random):
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = rng
+        self._history = defaultdict(lambda: deque(maxlen=history_size))
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.polls = 0
+        self.added_latency = 0.0
+
+    def expected_duration(self, key):
+        """
+        Returns a low estimate (25th percentile) of how long runs for `key` take,
+        or None without history.
+        """
+        with self._lock:
+            durations = sorted(self._history.get(key, ()))
+        if not durations:
+            return None
+        return durations[len(durations) // 4]
+
+    def record(self, key, duration):
+        with self._lock:
+            self._history[key].append(duration)
+
+    def intervals(self, key=None):
+        """
+        Yields the waits before each poll, forever.
+        """
+        expected = self.expected_duration(key) if key is not None else None
+        interval = self.initial_interval
+        if expected is not None and expected > interval:
+            # Skip the polls that would almost certainly find the run still going
+            yield self._jittered(min(expected, self.max_interval * 4))
+        while True:
+            yield self._jittered(interval)
+            interval = min(interval * self.backoff, self.max_interval)
+
+    def _jittered(self, interval):
+        return max(0.0, interval * (1 + self.jitter * (2 * self.rng() - 1)))
+
+    def wait(self, client, thread_id, run, key=None, started=None):
+        """
+        Polls `run` until it reaches a status in STOP_STATUSES.
+
+        Args:
+            client: The initialized API client.
+            thread_id: ID of the conversation thread.
+            run: The run object returned when the run was created or resumed.
+            key: History key; runs with the same key share duration statistics.
+            started: Clock time the run was created or resumed (defaults to now).
+
+        Returns:
+            (run, PollStats)
+        """
+        if started is None:
+            started = self.clock()
+        polls = 0
+        last_interval = 0.0
+        intervals = self.intervals(key)
+        while run.status not in STOP_STATUSES:
+            last_interval = next(intervals)
+            self.sleep(last_interval)
+            run = client.beta.threads.runs.retrieve(run.id, thread_id=thread_id)
+            polls += 1
+
+        elapsed = self.clock() - started
+        if key is not None and polls:
+            self.record(key, elapsed)
+        stats = PollStats(polls, elapsed, last_interval)
+        with self._lock:
+            self.runs += 1
+            self.polls += polls
+            self.added_latency += last_interval
+        logger.debug(f"Run {run.id} reached {run.status} after {polls} polls in {elapsed:.2f}s")
+        return run, stats
+
+    def stats(self):
+        """
+        Returns totals across every run polled so far.
+        """
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "polls": self.polls,
+                "polls_per_run": self.polls / self.runs if self.runs else 0.0,
+                "max_added_latency_s": self.added_latency,
+            }
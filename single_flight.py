@@ -0,0 +1,147 @@
+import threading
+
+DEFAULT_WAIT_TIMEOUT = 30.0  # seconds a follower waits for the leader's call
+
+
+class _Call:
+    # One in-flight call and the outcome its followers wait for
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Lets concurrent callers with the same key share one in-flight call.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is running wait and receive the same result, or the same
+    exception. Once the call returns the key is forgotten, so later callers
+    start a fresh call; keeping results around is the cache's job.
+
+    Works for threads, including tool calls that asyncio code hands to a
+    thread pool with `asyncio.to_thread`.
+
+    Args:
+        wait_timeout: Seconds a follower waits before giving up with a
+            TimeoutError, so one stuck leader cannot hang every caller.
+            None waits forever.
+    """
+
+    def __init__(self, wait_timeout=DEFAULT_WAIT_TIMEOUT):
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = 0
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Returns fn(*args, **kwargs), sharing the call with concurrent callers using the same key.
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not call.done.wait(self.wait_timeout):
+                raise TimeoutError(f"Gave up after {self.wait_timeout}s waiting for the in-flight call for {key!r}.")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def do_many(self, keys, fn):
+        """
+        Batch form of `do`.
+
+        `fn` is called once with the keys nobody else is fetching and must
+        return one result per key (an exception instance for a key that
+        failed). Keys already in flight, or repeated in `keys`, wait for
+        that call instead. Leaders finish their own fetch before waiting on
+        anyone else, so overlapping batches cannot deadlock.
+
+        Returns:
+            One result or exception instance per key, in order.
+        """
+        keys = list(keys)
+        calls = {}
+        leading = []
+        with self._lock:
+            for key in keys:
+                self.calls += 1
+                if key in calls:
+                    self.coalesced += 1
+                    continue
+                call = self._calls.get(key)
+                if call is None:
+                    call = self._calls[key] = _Call()
+                    leading.append(key)
+                    self.leaders += 1
+                else:
+                    self.coalesced += 1
+                calls[key] = call
+
+        if leading:
+            try:
+                results = list(fn(leading))
+                if len(results) > len(leading):
+                    raise ValueError(f"Batch returned {len(results)} results for {len(leading)} keys.")
+                # A short batch fails the keys it left out instead of answering them with None
+                results += [LookupError(f"Batch returned no result for {key!r}.") for key in leading[len(results):]]
+                for key, result in zip(leading, results):
+                    if isinstance(result, Exception):
+                        calls[key].error = result
+                    else:
+                        calls[key].result = result
+            except BaseException as e:
+                for key in leading:
+                    calls[key].error = e
+                raise
+            finally:
+                with self._lock:
+                    for key in leading:
+                        del self._calls[key]
+                for key in leading:
+                    calls[key].done.set()
+
+        results = []
+        for key in keys:
+            call = calls[key]
+            if not call.done.wait(self.wait_timeout):
+                results.append(TimeoutError(
+                    f"Gave up after {self.wait_timeout}s waiting for the in-flight call for {key!r}."))
+                continue
+            results.append(call.error if call.error is not None else call.result)
+        return results
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "backend_calls": self.leaders,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
@@ -0,0 +1,140 @@
+import json
+
+import pytest
+
+from answer_cache import AnswerCache, failed_output, normalize_question, question_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeTools:
+    """
+    Replays tool calls from a table of outputs that tests can change.
+    """
+
+    def __init__(self, outputs):
+        self.outputs = dict(outputs)
+        self.calls = []
+
+    def __call__(self, name, arguments):
+        self.calls.append((name, arguments))
+        output = self.outputs[(name, arguments)]
+        if isinstance(output, Exception):
+            raise output
+        return output
+
+
+BOSTON = '{"location":"Boston, MA","unit":"Fahrenheit"}'
+TOOL_CALLS = [{"name": "get_current_temperature", "arguments": BOSTON, "output": "54 Fahrenheit"}]
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def tools():
+    return FakeTools({("get_current_temperature", BOSTON): "54 Fahrenheit"})
+
+
+@pytest.fixture
+def cache(tools, clock):
+    return AnswerCache(tools, path=None, ttl=60, clock=clock)
+
+
+def test_normalized_questions_share_an_answer(cache):
+    cache.put("Weather in Boston?", "It is 54 F.", TOOL_CALLS)
+    assert cache.get("  weather in   BOSTON") == "It is 54 F."
+    assert normalize_question("Weather in Boston?") == "weather in boston"
+
+
+def test_context_is_part_of_the_key(cache):
+    cache.put("And tomorrow?", "Sunny.", context=["Weather in Boston?"])
+    assert cache.get("And tomorrow?") is None
+    assert cache.get("and tomorrow", context=["weather in boston"]) == "Sunny."
+    assert question_key("a", ["b"]) != question_key("b", ["a"])
+
+
+def test_answers_expire(cache, clock):
+    cache.put("Weather in Boston?", "It is 54 F.", TOOL_CALLS)
+    clock.now += 61
+    assert cache.get("Weather in Boston?") is None
+
+
+def test_replays_tool_calls_before_answering(cache, tools):
+    cache.put("Weather in Boston?", "It is 54 F.", TOOL_CALLS)
+    assert cache.get("Weather in Boston?") == "It is 54 F."
+    assert tools.calls == [("get_current_temperature", BOSTON)]
+
+
+def test_changed_tool_output_drops_the_answer(cache, tools):
+    cache.put("Weather in Boston?", "It is 54 F.", TOOL_CALLS)
+    tools.outputs[("get_current_temperature", BOSTON)] = "61 Fahrenheit"
+    assert cache.get("Weather in Boston?") is None
+    # The stale entry is gone even once the output matches again
+    tools.outputs[("get_current_temperature", BOSTON)] = "54 Fahrenheit"
+    assert cache.get("Weather in Boston?") is None
+    assert cache.stats()["stale"] == 1
+
+
+def test_failed_replay_drops_the_answer(cache, tools):
+    cache.put("Weather in Boston?", "It is 54 F.", TOOL_CALLS)
+    tools.outputs[("get_current_temperature", BOSTON)] = RuntimeError("backend down")
+    assert cache.get("Weather in Boston?") is None
+
+
+@pytest.mark.parametrize("output", [
+    "Error: Unknown location 'Atlantis'",
+    '[{"location":"Boston, MA","temperature":"54 Fahrenheit"},{"location":"Atlantis","error":"Unknown location"}]',
+])
+def test_failed_tool_calls_are_not_cached(cache, output):
+    cache.put("Weather in Boston and Atlantis?", "Boston is 54 F.",
+              [{"name": "get_current_temperatures", "arguments": "{}", "output": output}])
+    assert cache.stats()["stores"] == 0
+    assert cache.get("Weather in Boston and Atlantis?") is None
+
+
+def test_successful_batch_output_is_cached(clock):
+    output = json.dumps([{"location": "Boston, MA", "temperature": "54 Fahrenheit"}])
+    tools = FakeTools({("get_current_temperatures", "{}"): output})
+    cache = AnswerCache(tools, path=None, ttl=60, clock=clock)
+    cache.put("Weather in Boston?", "It is 54 F.",
+              [{"name": "get_current_temperatures", "arguments": "{}", "output": output}])
+    assert cache.get("Weather in Boston?") == "It is 54 F."
+
+
+@pytest.mark.parametrize("output, failed", [
+    ("Error: timed out", True),
+    ('[{"location":"x","error":"Unknown location"}]', True),
+    ('[{"location":"x","probability":"0.20"}]', False),
+    ("[not json", False),
+    ("0.20", False),
+])
+def test_failed_output(output, failed):
+    assert failed_output(output) is failed
+
+
+def test_empty_answers_are_not_cached(cache):
+    cache.put("Weather in Boston?", "", TOOL_CALLS)
+    assert cache.stats()["stores"] == 0
+
+
+def test_disk_tier_survives_a_restart(tmp_path, tools, clock):
+    path = str(tmp_path / "answers.sqlite")
+    first = AnswerCache(tools, path=path, ttl=60, clock=clock)
+    first.put("Weather in Boston?", "It is 54 F.", TOOL_CALLS)
+    first.close()
+
+    second = AnswerCache(tools, path=path, ttl=60, clock=clock)
+    try:
+        assert second.get("Weather in Boston?") == "It is 54 F."
+        assert second.stats()["disk_hits"] == 1
+    finally:
+        second.close()
@@ -0,0 +1,57 @@
+import itertools
+import time
+from types import SimpleNamespace
+
+from conversation_pool import ConversationPool
+
+
+class FakeThreads:
+    def __init__(self, lane):
+        self.lane = lane
+        self.ids = itertools.count()
+        self.created = []
+        self.deleted = []
+
+    def create(self):
+        thread = SimpleNamespace(id=f"{self.lane}_{next(self.ids)}")
+        self.created.append(thread.id)
+        return thread
+
+    def delete(self, thread_id):
+        self.deleted.append(thread_id)
+
+
+def fake_client(lane):
+    threads = FakeThreads(lane)
+    return SimpleNamespace(beta=SimpleNamespace(threads=threads)), threads
+
+
+def test_empty_pool_creates_on_the_callers_client():
+    client, interactive = fake_client("interactive")
+    background, warming = fake_client("background")
+    pool = ConversationPool(client, low_water=2, background_client=background)
+    # Not started, so nothing is warm
+    assert pool.acquire().id == "interactive_0"
+    assert warming.created == []
+    assert pool.stats()["misses"] == 1
+
+
+def test_warming_and_deletes_use_the_background_client():
+    client, interactive = fake_client("interactive")
+    background, warming = fake_client("background")
+    pool = ConversationPool(client, low_water=2, background_client=background)
+    pool.start()
+    try:
+        deadline = time.monotonic() + 5
+        while pool.stats()["ready"] < 2 and time.monotonic() < deadline:
+            time.sleep(0.005)
+        assert pool.acquire().id.startswith("background_")
+    finally:
+        pool.close()
+    assert interactive.created == []
+    assert warming.deleted and all(thread_id.startswith("background_") for thread_id in warming.deleted)
+
+
+def test_background_client_defaults_to_client():
+    client, _ = fake_client("interactive")
+    assert ConversationPool(client).background_client is client
@@ -0,0 +1,95 @@
+import pytest
+
+from conversation_store import ConversationStore, StoredMessage, pending_exchanges
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        self.now += 1.0
+        return self.now
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "conversations.sqlite")
+
+
+def record_turn(store, session_id, turn, question, answer, cached=False):
+    store.record_message(session_id, turn, "user", question, cached=cached)
+    store.record_message(session_id, turn, "assistant", answer, cached=cached)
+
+
+def test_flush_makes_queued_writes_visible(path):
+    with ConversationStore(path, flush_interval=60.0, clock=FakeClock()) as store:
+        session_id = store.new_session("thread_1", "asst_1")
+        record_turn(store, session_id, 0, "Weather in Boston?", "12 Fahrenheit.")
+        store.record_tool_calls(session_id, 0, [
+            {"name": "get_current_temperature", "arguments": {"location": "Boston"}, "output": "12"},
+        ])
+        # The writer is still waiting for more writes to share the commit
+        assert store.flush(timeout=5)
+        assert [m.content for m in store.messages(session_id)] == ["Weather in Boston?", "12 Fahrenheit."]
+        assert store.tool_calls(session_id)[0].arguments == '{"location": "Boston"}'
+        assert store.stats()["commits"] == 1
+
+
+def test_close_commits_pending_writes_and_resume_reads_them(path):
+    store = ConversationStore(path, flush_interval=60.0, clock=FakeClock())
+    session_id = store.new_session("thread_1", "asst_1")
+    record_turn(store, session_id, 0, "Rain in Paris?", "60%.")
+    store.close()
+    with pytest.raises(RuntimeError):
+        store.record_message(session_id, 1, "user", "Too late")
+
+    with ConversationStore(path) as reopened:
+        session = reopened.get_session(session_id[:8])
+        assert (session.id, session.thread_id, session.assistant_id) == (session_id, "thread_1", "asst_1")
+        assert [m.role for m in reopened.messages(session_id)] == ["user", "assistant"]
+        assert reopened.list_sessions()[0].id == session_id
+
+
+def test_bad_write_only_loses_itself(path):
+    with ConversationStore(path, flush_interval=60.0) as store:
+        session_id = store.new_session("thread_1")
+        store.record_message(session_id, 0, "user", "First")
+        # role is NOT NULL, so this statement fails inside the batch
+        store.record_message(session_id, 0, None, "Broken")
+        store.record_message(session_id, 0, "assistant", "Second")
+        assert store.flush(timeout=5)
+        assert [m.content for m in store.messages(session_id)] == ["First", "Second"]
+
+
+def test_get_session_rejects_unknown_and_ambiguous_prefixes(path):
+    with ConversationStore(path) as store:
+        store.new_session("thread_1", session_id="abc1")
+        store.new_session("thread_2", session_id="abc2")
+        store.flush(timeout=5)
+        assert store.get_session("abc1").thread_id == "thread_1"
+        with pytest.raises(KeyError):
+            store.get_session("abc")
+        with pytest.raises(KeyError):
+            store.get_session("xyz")
+
+
+def test_pending_exchanges_after_the_last_run(path):
+    with ConversationStore(path, clock=FakeClock()) as store:
+        session_id = store.new_session("thread_1")
+        record_turn(store, session_id, 0, "Weather in Boston?", "12 Fahrenheit.", cached=True)
+        record_turn(store, session_id, 1, "Rain in Paris?", "60%.")
+        record_turn(store, session_id, 2, "Weather in Boston?", "12 Fahrenheit.", cached=True)
+        record_turn(store, session_id, 3, "Weather in Oslo?", "2 Celsius.", cached=True)
+        store.flush(timeout=5)
+        history = store.messages(session_id)
+    assert pending_exchanges(history) == [("Weather in Boston?", "12 Fahrenheit."),
+                                          ("Weather in Oslo?", "2 Celsius.")]
+
+
+def test_no_pending_exchanges_when_the_last_turn_ran():
+    messages = [StoredMessage(0, "user", "Q", None, None, 1, 0.0),
+                StoredMessage(0, "assistant", "A", None, None, 1, 0.0),
+                StoredMessage(1, "user", "Q2", None, "run_1", 0, 0.0),
+                StoredMessage(1, "assistant", "A2", "msg_1", "run_1", 0, 0.0)]
+    assert pending_exchanges(messages) == []
@@ -0,0 +1,135 @@
+import pytest
+
+from gazetteer import (Gazetteer, Place, UnknownLocationError, build_index, edit_distance, place_keys, read_csv,
+                       temperature_unit)
+
+PLACES = [
+    Place("Paris", "11", "FR", 48.8566, 2.3522, 2138551),
+    Place("Paris", "TX", "US", 33.6609, -95.5555, 24171),
+    Place("Paris", "KY", "US", 38.2098, -84.2530, 9846),
+    Place("Springfield", "MO", "US", 37.2090, -93.2923, 169176),
+    Place("Springfield", "MA", "US", 42.1015, -72.5898, 155929),
+    Place("Springfield", "IL", "US", 39.7817, -89.6501, 114394),
+    Place("Springfield", "OH", "US", 39.9242, -83.8088, 58662),
+    Place("Spring", "TX", "US", 30.0799, -95.4172, 62559),
+    Place("Tokyo", "40", "JP", 35.6762, 139.6503, 8336599),
+]
+
+
+@pytest.fixture(scope="module")
+def gazetteer(tmp_path_factory):
+    path = tmp_path_factory.mktemp("gazetteer") / "places.gzix"
+    assert build_index(PLACES, str(path)) == len(PLACES)
+    gazetteer = Gazetteer(str(path))
+    yield gazetteer
+    gazetteer.close()
+
+
+def test_place_keys():
+    assert place_keys("Paris", "TX", "US")[:4] == ["paris", "paris, tx", "paris, us", "paris, usa"]
+    assert "paris, tx, us" in place_keys("Paris", "TX", "US")
+
+
+def test_index_round_trips_places(gazetteer):
+    assert gazetteer.n_places == len(PLACES)
+    # Records are stored most populous first
+    assert gazetteer.place(0).name == "Tokyo"
+    stored = sorted((gazetteer.place(i) for i in range(gazetteer.n_places)), key=lambda p: (p.name, p.admin1))
+    expected = sorted(PLACES, key=lambda p: (p.name, p.admin1))
+    for place, original in zip(stored, expected):
+        assert place[:3] == original[:3]
+        assert place.population == original.population
+        assert place.latitude == pytest.approx(original.latitude, abs=1e-4)
+
+
+def test_build_reads_csv(tmp_path):
+    source = tmp_path / "places.csv"
+    source.write_text("name,admin1,country,latitude,longitude,population\n"
+                      "Oslo,12,NO,59.91,10.75,580000\n", encoding="utf-8")
+    path = tmp_path / "places.gzix"
+    assert build_index(read_csv(str(source)), str(path)) == 1
+    assert Gazetteer(str(path)).lookup("Oslo, Norway").country == "NO"
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "not-an-index"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        Gazetteer(str(path))
+
+
+@pytest.mark.parametrize("location, admin1, country", [
+    ("Paris", "11", "FR"),
+    ("  PARIS,tx ", "TX", "US"),
+    ("paris, us", "TX", "US"),
+    ("Paris, France", "11", "FR"),
+    ("Springfield", "MO", "US"),
+    ("Springfield, IL, US", "IL", "US"),
+])
+def test_lookup_exact_keys(gazetteer, location, admin1, country):
+    place = gazetteer.lookup(location)
+    assert (place.admin1, place.country) == (admin1, country)
+
+
+def test_lookup_misses(gazetteer):
+    assert gazetteer.lookup("Paris, Texas") is None
+    assert gazetteer.lookup("Atlantis") is None
+
+
+def test_prefix_returns_most_populous_first(gazetteer):
+    places = gazetteer.prefix("spring")
+    assert [(p.name, p.admin1) for p in places] == [
+        ("Springfield", "MO"), ("Springfield", "MA"), ("Springfield", "IL"), ("Spring", "TX"), ("Springfield", "OH"),
+    ]
+    assert len(gazetteer.prefix("spring", limit=2)) == 2
+    assert [p.admin1 for p in gazetteer.prefix("springfield, o")] == ["OH"]
+    assert gazetteer.prefix("zz") == []
+
+
+@pytest.mark.parametrize("location, name", [("Sprngfield", "Springfield"), ("Tokio", "Tokyo"), ("Pari", "Paris")])
+def test_fuzzy_finds_misspellings(gazetteer, location, name):
+    assert gazetteer.fuzzy(location).name == name
+
+
+def test_fuzzy_gives_up_beyond_max_distance(gazetteer):
+    assert gazetteer.fuzzy("Sprngfeld", max_distance=1) is None
+    assert gazetteer.fuzzy("") is None
+
+
+def test_edit_distance():
+    assert edit_distance("kitten", "sitting", 5) == 3
+    assert edit_distance("kitten", "sitting", 2) == 3  # limit + 1
+
+
+@pytest.mark.parametrize("location, admin1, country", [
+    ("Paris, Texas", "TX", "US"),
+    ("Springfield, Ohio", "OH", "US"),
+    ("Paris, Kentucky, United States", "KY", "US"),
+    ("Springfield, IL, United States of America", "IL", "US"),
+    ("Paris, 11", "11", "FR"),
+    ("Tokyo, Japan", "40", "JP"),
+    ("Pariss, Texas", "TX", "US"),
+])
+def test_resolve_honours_every_qualifier(gazetteer, location, admin1, country):
+    place = gazetteer.resolve(location)
+    assert (place.admin1, place.country) == (admin1, country)
+
+
+def test_resolve_infers_the_unit_of_the_right_country(gazetteer):
+    assert temperature_unit(gazetteer.resolve("Paris, Texas").country) == "Fahrenheit"
+    assert temperature_unit(gazetteer.resolve("Paris").country) == "Celsius"
+
+
+@pytest.mark.parametrize("location", [
+    "Paris, Ohio", "Paris, Germany", "Springfield, Texas", "Paris, Texas, France", "Tokyo, Springfield", "Atlantis",
+    " , ",
+])
+def test_resolve_refuses_places_in_another_region(gazetteer, location):
+    with pytest.raises(LookupError):
+        gazetteer.resolve(location)
+
+
+def test_unknown_location_is_still_a_value_error(gazetteer):
+    with pytest.raises(ValueError):
+        gazetteer.resolve("Paris, Ohio")
+    assert issubclass(UnknownLocationError, LookupError)
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+import http_client
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keeps connections alive between requests
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool(monkeypatch):
+    monkeypatch.setenv("OPENAI_HTTP2", "0")
+    http_client.close_pool()
+    asyncio.run(http_client.aclose_pool())
+    yield
+    http_client.close_pool()
+    asyncio.run(http_client.aclose_pool())
+
+
+def test_clients_share_one_transport(url):
+    first = http_client.new_http_client()
+    second = http_client.new_http_client()
+    assert first._transport is second._transport is http_client.get_transport()
+
+    before = http_client.pool_stats()
+    for client in (first, second, first):
+        assert client.get(url).text == "ok"
+    # Closing a client leaves the shared pool open for the others
+    first.close()
+    assert second.get(url).text == "ok"
+    stats = http_client.pool_stats()
+    assert stats["requests"] - before["requests"] == 4
+    assert stats["connections_opened"] - before["connections_opened"] == 1
+    assert stats["pool"]["connections"] == 1
+
+
+def test_openai_clients_use_the_shared_transport():
+    client = http_client.new_client(api_key="test", base_url="http://127.0.0.1:9/v1")
+    assert client._client._transport is http_client.get_transport()
+    async_client = http_client.new_async_client(api_key="test", base_url="http://127.0.0.1:9/v1")
+    assert async_client._client._transport is http_client.get_async_transport()
+
+
+def test_close_pool_resets_the_transport(url):
+    transport = http_client.get_transport()
+    client = http_client.new_http_client()
+    client.get(url)
+    http_client.close_pool()
+    assert http_client.pool_stats().get("pool") is None
+    assert http_client.get_transport() is not transport
+    assert http_client.new_http_client().get(url).text == "ok"
+    # Closing twice is harmless
+    http_client.close_pool()
+    http_client.close_pool()
+
+
+def test_aclose_pool_resets_the_async_transport(url):
+    async def main():
+        transport = http_client.get_async_transport()
+        async with http_client.new_async_http_client() as client:
+            assert (await client.get(url)).text == "ok"
+        await http_client.aclose_pool()
+        assert http_client.get_async_transport() is not transport
+    asyncio.run(main())
+
+
+def test_settings_are_read_when_the_pool_is_built(monkeypatch):
+    monkeypatch.setenv("OPENAI_MAX_CONNECTIONS", "7")
+    monkeypatch.setenv("OPENAI_READ_TIMEOUT", "3")
+    monkeypatch.setenv("OPENAI_STREAM_READ_TIMEOUT", "9")
+    assert http_client.get_transport()._pool._max_connections == 7
+    assert http_client.request_timeout().read == 3.0
+    assert http_client.stream_timeout().read == 9.0
+    assert http_client.pool_stats()["max_connections"] == 7
+
+
+@pytest.mark.parametrize("setting, enabled", [("0", False), ("false", False)])
+def test_http2_can_be_turned_off(setting, enabled):
+    assert http_client.http2_enabled(setting) is enabled
+
+
+def test_forcing_http2_without_h2_fails(monkeypatch):
+    try:
+        import h2  # noqa: F401
+        pytest.skip("h2 is installed")
+    except ImportError:
+        pass
+    with pytest.raises(RuntimeError):
+        http_client.http2_enabled("1")
+    assert http_client.http2_enabled("auto") is False
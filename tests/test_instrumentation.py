@@ -0,0 +1,116 @@
+import json
+import threading
+
+import pytest
+
+import instrumentation
+from instrumentation import Histogram, Tracer
+
+
+def test_histogram_percentiles():
+    histogram = Histogram()
+    assert histogram.summary() == {"count": 0, "sum": 0.0, "p50": None, "p95": None, "p99": None}
+    for value in range(1, 101):
+        histogram.observe(value)
+    summary = histogram.summary()
+    assert summary["count"] == 100
+    assert summary["sum"] == 5050
+    assert (summary["p50"], summary["p95"], summary["p99"]) == (51, 95, 99)
+
+
+def test_histogram_keeps_the_most_recent_samples():
+    histogram = Histogram(max_samples=3)
+    for value in (100, 1, 2, 3):
+        histogram.observe(value)
+    assert histogram.percentile(1.0) == 3
+    # Totals still cover every sample
+    assert histogram.count == 4
+    assert histogram.sum == 106
+
+
+def test_spans_are_recorded_on_the_current_turn():
+    tracer = Tracer()
+    with tracer.turn() as turn:
+        assert tracer.current_turn() is turn
+        with tracer.span("submit", tool="get_weather"):
+            pass
+        tracer.mark("first_delta")
+        tracer.mark("first_delta")
+    assert tracer.current_turn() is None
+
+    record = turn.to_dict()
+    assert [span["name"] for span in record["spans"]] == ["submit"]
+    assert record["spans"][0]["tool"] == "get_weather"
+    assert list(record["marks"]) == ["first_delta"]
+    snapshot = tracer.snapshot()
+    assert sorted(snapshot) == ["first_delta", "submit", "turn"]
+    assert snapshot["first_delta"]["count"] == 1
+
+
+def test_span_is_recorded_when_the_block_fails():
+    tracer = Tracer()
+    with pytest.raises(RuntimeError):
+        with tracer.span("run"):
+            raise RuntimeError("boom")
+    assert tracer.snapshot()["run"]["count"] == 1
+
+
+def test_marks_outside_a_turn_are_ignored():
+    tracer = Tracer()
+    tracer.mark("first_delta")
+    assert tracer.snapshot() == {}
+
+
+def test_work_on_other_threads_can_pass_the_turn():
+    tracer = Tracer()
+    with tracer.turn() as turn:
+        def call_tool():
+            assert tracer.current_turn() is None
+            with tracer.span("tool", turn=turn):
+                pass
+
+        threads = [threading.Thread(target=call_tool) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert len(turn.spans) == 4
+    assert tracer.snapshot()["tool"]["count"] == 4
+
+
+def test_nested_turns_restore_the_outer_one():
+    tracer = Tracer()
+    with tracer.turn() as outer:
+        with tracer.turn() as inner:
+            assert inner.number == outer.number + 1
+        assert tracer.current_turn() is outer
+
+
+def test_exports(tmp_path):
+    tracer = Tracer()
+    with tracer.span("render"):
+        pass
+    assert json.loads(tracer.export_json())["render"]["count"] == 1
+
+    text = tracer.export_prometheus()
+    assert "# TYPE weather_chat_phase_seconds summary" in text
+    assert 'weather_chat_phase_seconds{phase="render",quantile="0.5"}' in text
+    assert 'weather_chat_phase_seconds_count{phase="render"} 1' in text
+
+    prom, other = tmp_path / "metrics.prom", tmp_path / "metrics.json"
+    tracer.write(str(prom))
+    tracer.write(str(other))
+    assert prom.read_text(encoding="utf-8") == text
+    assert json.loads(other.read_text(encoding="utf-8"))["render"]["count"] == 1
+
+
+def test_profile_turn(tmp_path, monkeypatch):
+    monkeypatch.setattr(instrumentation, "PROFILE_DIR", None)
+    with instrumentation.profile_turn():
+        pass
+    assert list(tmp_path.iterdir()) == []
+
+    with Tracer().turn() as turn:
+        with instrumentation.profile_turn(turn, directory=str(tmp_path)):
+            sum(range(1000))
+    assert [path.name for path in tmp_path.iterdir()] == [f"turn-{turn.number:04d}.prof"]
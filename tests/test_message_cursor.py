@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+
+from message_cursor import MessageCursor
+
+
+class FakeMessages:
+    """
+    Stands in for client.beta.threads.messages, listing one thread in creation order.
+    """
+
+    def __init__(self, messages, report_has_more=True):
+        self.messages = messages
+        self.report_has_more = report_has_more
+        self.calls = []
+
+    def list(self, thread_id, order, limit, after=None, run_id=None):
+        self.calls.append({"after": after, "run_id": run_id, "limit": limit})
+        assert order == "asc"
+        messages = self.messages
+        if after is not None:
+            # The cursor is a position in the thread, whichever run is asked for
+            ids = [m.id for m in messages]
+            messages = messages[ids.index(after) + 1:]
+        messages = [m for m in messages if run_id is None or m.run_id == run_id]
+        data = messages[:limit]
+        page = SimpleNamespace(data=data)
+        if self.report_has_more:
+            page.has_more = len(messages) > limit
+        return page
+
+
+def make_client(messages, **kwargs):
+    api = FakeMessages(messages, **kwargs)
+    return SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(messages=api))), api
+
+
+def message(index, run_id=None):
+    return SimpleNamespace(id=f"msg_{index}", run_id=run_id)
+
+
+def test_returns_only_messages_after_the_cursor():
+    messages = [message(i) for i in range(5)]
+    client, api = make_client(messages)
+    cursor = MessageCursor(client, "thread_1", last_message_id="msg_1")
+    assert [m.id for m in cursor.fetch_new()] == ["msg_2", "msg_3", "msg_4"]
+    assert cursor.last_message_id == "msg_4"
+    assert api.calls[0]["after"] == "msg_1"
+
+
+def test_pages_through_long_results():
+    messages = [message(i) for i in range(7)]
+    client, api = make_client(messages)
+    cursor = MessageCursor(client, "thread_1", page_size=3)
+    assert [m.id for m in cursor.fetch_new()] == [m.id for m in messages]
+    assert [call["after"] for call in api.calls] == [None, "msg_2", "msg_5"]
+
+
+def test_full_last_page_without_has_more_asks_once_more():
+    messages = [message(i) for i in range(4)]
+    client, api = make_client(messages, report_has_more=False)
+    cursor = MessageCursor(client, "thread_1", page_size=2)
+    assert len(cursor.fetch_new()) == 4
+    assert len(api.calls) == 3
+
+
+def test_nothing_new_keeps_the_cursor():
+    messages = [message(i) for i in range(2)]
+    client, _ = make_client(messages)
+    cursor = MessageCursor(client, "thread_1", last_message_id="msg_1")
+    assert cursor.fetch_new() == []
+    assert cursor.last_message_id == "msg_1"
+
+
+def test_filters_by_run_and_advances():
+    messages = [message(0), message(1, run_id="run_a"), message(2, run_id="run_b"), message(3, run_id="run_b")]
+    client, api = make_client(messages)
+    cursor = MessageCursor(client, "thread_1")
+    cursor.advance("msg_0")
+    assert [m.id for m in cursor.fetch_new(run_id="run_b")] == ["msg_2", "msg_3"]
+    assert api.calls[0]["run_id"] == "run_b"
+    assert cursor.fetch_new() == []
@@ -0,0 +1,142 @@
+import asyncio
+import io
+import logging
+import threading
+
+import pytest
+
+from output_sink import AsyncQueueSink, FileSink, OutputSink, StreamSink
+
+
+def test_writes_are_coalesced_until_max_bytes():
+    chunks = []
+    sink = OutputSink(chunks.append, max_bytes=10, max_delay=60)
+    for delta in ("Hel", "lo, ", "wor", "ld!"):
+        sink.write(delta)
+    assert chunks == ["Hello, wor"]
+    sink.write("")
+    sink.write("\n")
+    assert chunks == ["Hello, wor"]
+    sink.close()
+    assert chunks == ["Hello, wor", "ld!\n"]
+    assert sink.stats() == {"writes": 5, "bytes": 14, "flushes": 2, "writes_per_flush": 2.5}
+
+
+def test_max_bytes_counts_utf8_bytes():
+    chunks = []
+    sink = OutputSink(chunks.append, max_bytes=4, max_delay=60)
+    sink.write("°C")  # three bytes
+    assert chunks == []
+    sink.write("!")
+    assert chunks == ["°C!"]
+    sink.close()
+
+
+def test_zero_delay_writes_through():
+    chunks = []
+    sink = OutputSink(chunks.append, max_delay=0)
+    sink.write("a")
+    sink.write("b")
+    assert chunks == ["a", "b"]
+    assert sink._flusher is None
+
+
+def test_pending_text_is_flushed_after_max_delay():
+    flushed = threading.Event()
+    chunks = []
+
+    def emit(chunk):
+        chunks.append(chunk)
+        flushed.set()
+
+    with OutputSink(emit, max_bytes=1000, max_delay=0.01) as sink:
+        sink.write("quiet ")
+        sink.write("stream")
+        assert flushed.wait(5)
+        assert chunks == ["quiet stream"]
+
+
+def test_write_after_close_fails():
+    sink = OutputSink(lambda chunk: None)
+    sink.close()
+    sink.close()
+    with pytest.raises(ValueError):
+        sink.write("late")
+
+
+def test_stream_and_file_sinks(tmp_path):
+    stream = io.StringIO()
+    with StreamSink(stream, max_bytes=1000, max_delay=60) as sink:
+        sink.write("to ")
+        sink.write("stream")
+        assert stream.getvalue() == ""
+    assert stream.getvalue() == "to stream"
+
+    path = tmp_path / "reply.txt"
+    sink = FileSink(str(path), max_bytes=1000, max_delay=60)
+    sink.write("to file")
+    sink.close()
+    assert sink.stream.closed
+    assert path.read_text(encoding="utf-8") == "to file"
+
+
+def test_async_sink_coalesces_onto_the_queue():
+    async def main():
+        queue = asyncio.Queue()
+        sink = AsyncQueueSink(queue, max_bytes=6, max_delay=60)
+        await sink.write("abc")
+        assert queue.empty()
+        await sink.write("def")
+        assert queue.get_nowait() == "abcdef"
+        await sink.write("g")
+        await sink.aclose()
+        assert queue.get_nowait() == "g"
+        assert sink._timer is None
+        return sink.stats()
+
+    assert asyncio.run(main())["flushes"] == 2
+
+
+def test_async_sink_flushes_after_max_delay():
+    async def main():
+        queue = asyncio.Queue()
+        sink = AsyncQueueSink(queue, max_bytes=1000, max_delay=0.01)
+        await sink.write("slow ")
+        await sink.write("model")
+        return await asyncio.wait_for(queue.get(), 5)
+
+    assert asyncio.run(main()) == "slow model"
+
+
+def test_async_sink_discard_drops_pending_text():
+    async def main():
+        queue = asyncio.Queue()
+        sink = AsyncQueueSink(queue, max_bytes=1000, max_delay=0.01)
+        await sink.write("nobody is listening")
+        sink.discard()
+        await asyncio.sleep(0.05)
+        await sink.aclose()
+        return queue
+
+    assert asyncio.run(main()).empty()
+
+
+def test_async_sink_logs_a_failed_timed_flush(caplog):
+    class BrokenQueue:
+        async def put(self, item):
+            raise RuntimeError("queue is gone")
+
+    async def main():
+        sink = AsyncQueueSink(BrokenQueue(), max_bytes=1000, max_delay=0.01)
+        await sink.write("lost")
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if sink.flushes and sink._flush_task is None:
+                break
+        return sink
+
+    with caplog.at_level(logging.ERROR, logger="output_sink"):
+        sink = asyncio.run(main())
+    assert sink._flush_task is None
+    assert "Timed flush of the output sink failed" in caplog.text
+    assert "queue is gone" in caplog.text
@@ -0,0 +1,101 @@
+from datetime import date, datetime, timezone
+
+import numpy as np
+import pytest
+
+from rain_climatology import (DAYS, SCALE, RainClimatology, build_tables, day_of_year, write_tables)
+
+DAY = 86400.0
+
+
+def timestamp(year, month, day, hour=0):
+    return datetime(year, month, day, hour, tzinfo=timezone.utc).timestamp()
+
+
+def leap_slot(moment):
+    # 2000 is a leap year, so this numbers every date of any year on the leap-year calendar
+    return date(2000, moment.month, moment.day).timetuple().tm_yday - 1
+
+
+def brute_force_tables(precipitation, t0, threshold, window):
+    ndays, nlat, nlon = precipitation.shape
+    slots = [leap_slot(datetime.fromtimestamp(t0 + n * DAY, tz=timezone.utc)) for n in range(ndays)]
+    tables = np.zeros((DAYS, nlat, nlon), dtype=np.uint8)
+    for slot in range(DAYS):
+        wet = np.zeros((nlat, nlon))
+        total = 0
+        for n, other in enumerate(slots):
+            distance = abs(other - slot)
+            if min(distance, DAYS - distance) <= window:
+                wet += precipitation[n] >= threshold
+                total += 1
+        tables[slot] = np.rint(wet / max(total, 1) * SCALE)
+    return tables
+
+
+@pytest.mark.parametrize("moment, slot, following", [
+    ((2023, 1, 1), 0, 1),
+    ((2023, 2, 28), 58, 60),
+    ((2024, 2, 28), 58, 59),
+    ((2024, 2, 29), 59, 60),
+    ((2023, 3, 1), 60, 61),
+    ((2024, 3, 1), 60, 61),
+    ((2023, 12, 31), 365, 0),
+    ((2024, 12, 31), 365, 0),
+])
+def test_day_of_year_slots(moment, slot, following):
+    assert day_of_year(timestamp(*moment, hour=6)) == (slot, 0.25, following)
+
+
+@pytest.mark.parametrize("window", [0, 3])
+@pytest.mark.parametrize("chunk_days", [365, 40])
+def test_tables_match_brute_force_count(window, chunk_days):
+    # Three years of history spanning a leap day, starting mid-year
+    t0 = timestamp(2023, 7, 15)
+    ndays = 3 * 365 + 1
+    precipitation = np.random.default_rng(2).exponential(2.0, (ndays, 2, 3)).astype(np.float32)
+    tables = build_tables(precipitation, t0, DAY, threshold=1.5, window=window, chunk_days=chunk_days)
+    np.testing.assert_array_equal(tables, brute_force_tables(precipitation, t0, 1.5, window))
+
+
+def test_leap_day_only_counts_leap_days():
+    t0 = timestamp(2023, 1, 1)
+    ndays = 2 * 365 + 1  # 2023 and 2024
+    precipitation = np.zeros((ndays, 1, 1), dtype=np.float32)
+    precipitation[(datetime(2024, 2, 29) - datetime(2023, 1, 1)).days] = 10.0
+    tables = build_tables(precipitation, t0, DAY, threshold=1.0, window=0)
+    assert tables[59, 0, 0] == SCALE
+    assert tables[58, 0, 0] == 0 and tables[60, 0, 0] == 0
+
+
+@pytest.fixture
+def climatology(tmp_path):
+    rng = np.random.default_rng(4)
+    tables = rng.integers(0, SCALE + 1, (DAYS, 4, 5), dtype=np.uint8)
+    path = tmp_path / "rain.rclm"
+    write_tables(str(path), tables, 30.0, 5.0, -100.0, 10.0)
+    return RainClimatology.open(str(path))
+
+
+def test_probability_interpolates_between_days(climatology):
+    tables = climatology.tables
+    when = timestamp(2023, 2, 28, hour=18)
+    expected = (int(tables[58, 1, 2]) * 0.25 + int(tables[60, 1, 2]) * 0.75) / SCALE
+    assert climatology.probability(35.0, -80.0, when) == pytest.approx(expected)
+
+
+def test_probability_wraps_at_new_year(climatology):
+    tables = climatology.tables
+    when = timestamp(2023, 12, 31, hour=12)
+    expected = (int(tables[365, 2, 1]) + int(tables[0, 2, 1])) / 2 / SCALE
+    assert climatology.probability(40.0, -90.0, when) == pytest.approx(expected)
+
+
+def test_probabilities_match_probability(climatology):
+    rng = np.random.default_rng(6)
+    latitudes = rng.uniform(25.0, 55.0, 40)
+    longitudes = rng.uniform(-110.0, -50.0, 40)
+    times = rng.uniform(timestamp(2023, 1, 1), timestamp(2025, 1, 1), 40)
+    many = climatology.probabilities(latitudes, longitudes, times)
+    expected = [climatology.probability(lat, lon, when) for lat, lon, when in zip(latitudes, longitudes, times)]
+    np.testing.assert_allclose(many, expected, rtol=1e-6, atol=1e-6)
@@ -0,0 +1,138 @@
+from email.utils import formatdate
+import time
+
+import httpx
+import openai
+import pytest
+
+from request_scheduler import RequestScheduler, retry_after
+
+REQUEST = httpx.Request("POST", "https://api.openai.test/v1/threads/runs")
+
+
+def status_error(status, headers=None):
+    response = httpx.Response(status, headers=headers, request=REQUEST)
+    error_class = openai.RateLimitError if status == 429 else openai.APIStatusError
+    return error_class(f"Error {status}", response=response, body=None)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def scheduler(clock):
+    # rng=1.0 takes the jitter out: full backoff and 10% on top of Retry-After
+    return RequestScheduler(rpm=6000, tpm=10 ** 6, max_retries=3, base_delay=0.5, max_delay=4.0,
+                            clock=clock, sleep=clock.sleep, rng=lambda: 1.0)
+
+
+def failing(*errors, result="ok"):
+    errors = list(errors)
+
+    def fn():
+        if errors:
+            raise errors.pop(0)
+        return result
+    return fn
+
+
+@pytest.mark.parametrize("attempt, delay", [(0, 0.5), (1, 1.0), (2, 2.0), (3, 4.0), (6, 4.0)])
+def test_backoff_doubles_up_to_the_cap(scheduler, attempt, delay):
+    assert scheduler.backoff(status_error(503), attempt) == pytest.approx(delay)
+
+
+def test_backoff_jitter_stays_within_half_to_full(clock):
+    low = RequestScheduler(rpm=60, tpm=60, base_delay=1.0, clock=clock, rng=lambda: 0.0)
+    assert low.backoff(status_error(500), 2) == pytest.approx(2.0)
+
+
+def test_backoff_honours_retry_after(scheduler):
+    assert scheduler.backoff(status_error(429, {"retry-after": "2"}), 0) == pytest.approx(2.2)
+    assert scheduler.backoff(status_error(429, {"retry-after-ms": "1500"}), 0) == pytest.approx(1.65)
+    # Never longer than max_delay
+    assert scheduler.backoff(status_error(429, {"retry-after": "60"}), 0) == pytest.approx(4.4)
+
+
+def test_backoff_skips_errors_not_worth_retrying(scheduler):
+    assert scheduler.backoff(status_error(400), 0) is None
+    assert scheduler.backoff(status_error(404), 0) is None
+    assert scheduler.backoff(ValueError("bad"), 0) is None
+    assert scheduler.backoff(openai.APIConnectionError(request=REQUEST), 0) == pytest.approx(0.5)
+
+
+def test_retry_after_parses_http_dates():
+    when = formatdate(time.time() + 30, usegmt=True)
+    assert retry_after(status_error(429, {"retry-after": when})) == pytest.approx(30, abs=2)
+    assert retry_after(status_error(429, {"retry-after": "soon"})) is None
+    assert retry_after(status_error(429)) is None
+    assert retry_after(ValueError("no response")) is None
+
+
+def test_call_retries_until_it_succeeds(scheduler, clock):
+    fn = failing(status_error(503), status_error(502))
+    assert scheduler.call(fn, lane="batch") == "ok"
+    assert clock.sleeps == pytest.approx([0.5, 1.0])
+    counters = scheduler.stats()["lanes"]["batch"]
+    assert (counters["admitted"], counters["retries"], counters["failed"], counters["in_flight"]) == (3, 2, 0, 0)
+
+
+def test_call_gives_up_after_max_retries(scheduler, clock):
+    fn = failing(*[status_error(500) for _ in range(5)])
+    with pytest.raises(openai.APIStatusError):
+        scheduler.call(fn)
+    assert len(clock.sleeps) == 3
+    assert scheduler.stats()["lanes"]["interactive"]["failed"] == 1
+
+
+def test_call_raises_other_errors_at_once(scheduler, clock):
+    with pytest.raises(openai.APIStatusError):
+        scheduler.call(failing(status_error(400)))
+    assert clock.sleeps == []
+
+
+def test_retry_after_on_429_pauses_every_lane(scheduler, clock):
+    paused = []
+
+    def fn():
+        if not paused:
+            paused.append(True)
+            raise status_error(429, {"retry-after": "3"})
+        # By the time the retry runs, the pause was slept through
+        paused.append(scheduler.stats()["paused_for"])
+        return "ok"
+
+    assert scheduler.call(fn, lane="background") == "ok"
+    assert clock.sleeps == pytest.approx([3.3])
+    assert paused[1] == 0.0
+    counters = scheduler.stats()["lanes"]["background"]
+    assert (counters["throttled"], counters["retries"]) == (1, 1)
+
+
+def test_429_without_retry_after_does_not_pause(scheduler, clock):
+    scheduler.call(failing(status_error(429)))
+    assert clock.sleeps == pytest.approx([0.5])
+    assert scheduler.stats()["paused_for"] == 0.0
+
+
+def test_pause_is_recorded_before_the_sleep(clock):
+    seen = []
+    scheduler = RequestScheduler(rpm=6000, tpm=10 ** 6, clock=clock, rng=lambda: 0.0,
+                                 sleep=lambda seconds: seen.append(scheduler.stats()["paused_for"]) or
+                                 clock.sleep(seconds))
+    scheduler.call(failing(status_error(429, {"retry-after": "2"})))
+    assert seen == [2.0]
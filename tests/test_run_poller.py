@@ -0,0 +1,113 @@
+from types import SimpleNamespace
+
+import pytest
+
+from run_poller import AdaptivePoller, PollStats
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeRuns:
+    """
+    Serves `retrieve` from a list of statuses, one per poll.
+    """
+
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.retrieved = 0
+
+    def retrieve(self, run_id, thread_id):
+        self.retrieved += 1
+        return SimpleNamespace(id=run_id, status=self.statuses.pop(0))
+
+
+def make_client(statuses):
+    runs = FakeRuns(statuses)
+    return SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(runs=runs))), runs
+
+
+def make_poller(**kwargs):
+    clock = FakeClock()
+    kwargs.setdefault("jitter", 0)
+    poller = AdaptivePoller(clock=clock, sleep=clock.sleep, **kwargs)
+    return poller, clock
+
+
+def first(intervals, n):
+    return [next(intervals) for _ in range(n)]
+
+
+def test_interval_grows_up_to_the_maximum():
+    poller, _ = make_poller(initial_interval=0.1, max_interval=1.0, backoff=2)
+    assert first(poller.intervals(), 6) == pytest.approx([0.1, 0.2, 0.4, 0.8, 1.0, 1.0])
+
+
+def test_interval_resets_for_every_run():
+    poller, _ = make_poller(initial_interval=0.1, max_interval=1.0, backoff=2)
+    client, _ = make_client(["in_progress"] * 4 + ["completed"])
+    poller.wait(client, "thread", SimpleNamespace(id="run_1", status="queued"))
+
+    # A new run starts polling fast again instead of at the backed-off interval
+    client, _ = make_client(["completed"])
+    run, stats = poller.wait(client, "thread", SimpleNamespace(id="run_2", status="queued"))
+    assert run.status == "completed"
+    assert stats.max_added_latency == pytest.approx(0.1)
+
+
+def test_jitter_stays_within_bounds():
+    poller, _ = make_poller(initial_interval=1.0, max_interval=1.0, jitter=0.2, rng=lambda: 0.0)
+    assert next(poller.intervals()) == pytest.approx(0.8)
+    poller.rng = lambda: 1.0
+    assert next(poller.intervals()) == pytest.approx(1.2)
+
+
+def test_wait_polls_until_a_stop_status():
+    poller, clock = make_poller(initial_interval=0.1, max_interval=1.0, backoff=2)
+    client, runs = make_client(["in_progress", "in_progress", "requires_action"])
+    run, stats = poller.wait(client, "thread", SimpleNamespace(id="run_1", status="queued"))
+    assert run.status == "requires_action"
+    assert runs.retrieved == 3
+    assert stats == PollStats(3, pytest.approx(0.7), pytest.approx(0.4))
+    assert clock.now == pytest.approx(0.7)
+
+
+def test_finished_run_is_not_polled():
+    poller, _ = make_poller()
+    client, runs = make_client([])
+    run, stats = poller.wait(client, "thread", SimpleNamespace(id="run_1", status="completed"), key="k")
+    assert runs.retrieved == 0
+    assert stats.polls == 0
+    # Nothing was learnt about how long runs take
+    assert poller.expected_duration("k") is None
+
+
+def test_history_schedules_the_first_poll_near_the_expected_end():
+    poller, _ = make_poller(initial_interval=0.1, max_interval=1.0, backoff=2)
+    for duration in (3.0, 2.0, 5.0, 4.0):
+        poller.record("forecast", duration)
+    assert poller.expected_duration("forecast") == 3.0
+    assert first(poller.intervals("forecast"), 3) == pytest.approx([3.0, 0.1, 0.2])
+    # Other keys keep the default schedule
+    assert next(poller.intervals("other")) == pytest.approx(0.1)
+
+
+def test_wait_records_durations_per_key():
+    poller, _ = make_poller(initial_interval=0.5, max_interval=0.5)
+    client, _ = make_client(["in_progress", "completed"])
+    poller.wait(client, "thread", SimpleNamespace(id="run_1", status="queued"), key="k")
+    assert poller.expected_duration("k") == pytest.approx(1.0)
+    assert poller.stats() == {
+        "runs": 1,
+        "polls": 2,
+        "polls_per_run": 2.0,
+        "max_added_latency_s": pytest.approx(0.5),
+    }
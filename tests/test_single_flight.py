@@ -0,0 +1,196 @@
+import threading
+import time
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def start_callers(flight, key, fn, count):
+    # Starts `count` threads calling flight.do(key, fn) and returns them with their outcomes
+    outcomes = []
+
+    def follow():
+        try:
+            outcomes.append(flight.do(key, fn))
+        except Exception as e:
+            outcomes.append(e)
+
+    threads = [threading.Thread(target=follow) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+def wait_for_in_flight(flight):
+    deadline = time.monotonic() + 5
+    while not flight.in_flight() and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def wait_for_coalesced(flight, count):
+    deadline = time.monotonic() + 5
+    while flight.stats()["coalesced"] < count and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def test_do_shares_one_call_between_concurrent_callers():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return "12 Celsius"
+
+    leader, outcomes = start_callers(flight, "boston", fetch, 1)
+    wait_for_in_flight(flight)
+    followers, follower_outcomes = start_callers(flight, "boston", fetch, 4)
+    wait_for_coalesced(flight, 4)
+    release.set()
+    for thread in leader + followers:
+        thread.join(5)
+    assert outcomes + follower_outcomes == ["12 Celsius"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"calls": 5, "backend_calls": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_do_error_reaches_every_waiter():
+    flight = SingleFlight()
+    release = threading.Event()
+    error = RuntimeError("backend down")
+
+    def fetch():
+        release.wait(5)
+        raise error
+
+    leader, outcomes = start_callers(flight, "boston", fetch, 1)
+    wait_for_in_flight(flight)
+    followers, follower_outcomes = start_callers(flight, "boston", fetch, 3)
+    wait_for_coalesced(flight, 3)
+    release.set()
+    for thread in leader + followers:
+        thread.join(5)
+    assert outcomes + follower_outcomes == [error] * 4
+    # The key is forgotten, so the next caller starts a fresh call
+    assert flight.do("boston", lambda: "ok") == "ok"
+
+
+def test_do_runs_different_keys_separately():
+    flight = SingleFlight()
+    assert flight.do("a", str.upper, "a") == "A"
+    assert flight.do("b", str.upper, "b") == "B"
+    assert flight.stats()["backend_calls"] == 2
+
+
+def test_do_follower_gives_up_on_a_stuck_leader():
+    flight = SingleFlight(wait_timeout=0.05)
+    release = threading.Event()
+    leader, _ = start_callers(flight, "a", lambda: release.wait(5), 1)
+    wait_for_in_flight(flight)
+    try:
+        with pytest.raises(TimeoutError):
+            flight.do("a", lambda: "never called")
+    finally:
+        release.set()
+        leader[0].join(5)
+
+
+def test_do_many_fetches_each_key_once():
+    flight = SingleFlight()
+    batches = []
+
+    def fetch(keys):
+        batches.append(list(keys))
+        return [key.upper() for key in keys]
+
+    assert flight.do_many(["a", "b", "a", "c"], fetch) == ["A", "B", "A", "C"]
+    assert batches == [["a", "b", "c"]]
+    assert flight.stats() == {"calls": 4, "backend_calls": 3, "coalesced": 1, "in_flight": 0}
+
+
+def test_do_many_waits_for_keys_already_in_flight():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    batches = []
+
+    def slow(key):
+        started.set()
+        release.wait(5)
+        return "slow " + key
+
+    def fetch(keys):
+        batches.append(list(keys))
+        return ["batch " + key for key in keys]
+
+    leader = threading.Thread(target=flight.do, args=("a", slow, "a"))
+    leader.start()
+    assert started.wait(5)
+    results = []
+    follower = threading.Thread(target=lambda: results.extend(flight.do_many(["a", "b"], fetch)))
+    follower.start()
+    # Let the leader finish only once the follower is waiting on it
+    deadline = time.monotonic() + 5
+    while flight.stats()["coalesced"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    follower.join(5)
+    leader.join(5)
+    assert results == ["slow a", "batch b"]
+    assert batches == [["b"]]
+
+
+def test_do_many_returns_exceptions_per_key():
+    flight = SingleFlight()
+    failure = KeyError("b")
+    results = flight.do_many(["a", "b"], lambda keys: ["A", failure])
+    assert results == ["A", failure]
+    assert flight.in_flight() == 0
+
+
+def test_do_many_fails_keys_missing_from_a_short_batch():
+    flight = SingleFlight()
+    results = flight.do_many(["a", "b", "c"], lambda keys: ["A"])
+    assert results[0] == "A"
+    assert all(isinstance(result, LookupError) for result in results[1:])
+
+
+def test_do_many_rejects_a_long_batch():
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do_many(["a"], lambda keys: ["A", "B"])
+    assert flight.in_flight() == 0
+
+
+def test_do_many_error_reaches_the_batch_and_frees_keys():
+    flight = SingleFlight()
+
+    def fetch(keys):
+        raise RuntimeError("backend down")
+
+    with pytest.raises(RuntimeError):
+        flight.do_many(["a", "b"], fetch)
+    assert flight.do_many(["a"], lambda keys: ["A"]) == ["A"]
+
+
+def test_do_many_gives_up_on_a_stuck_leader():
+    flight = SingleFlight(wait_timeout=0.05)
+    started = threading.Event()
+    release = threading.Event()
+
+    def stuck():
+        started.set()
+        release.wait(5)
+
+    leader = threading.Thread(target=flight.do, args=("a", stuck))
+    leader.start()
+    assert started.wait(5)
+    try:
+        results = flight.do_many(["a", "b"], lambda keys: ["B"])
+    finally:
+        release.set()
+        leader.join(5)
+    assert isinstance(results[0], TimeoutError)
+    assert results[1] == "B"
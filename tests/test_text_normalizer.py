@@ -0,0 +1,67 @@
+import itertools
+import random
+
+import pytest
+
+from text_normalizer import TextNormalizer, normalize
+
+SAMPLES = [
+    "  The temperature is \\(21^\\circ C\\) in **Boston**.  \n",
+    "Display: \\[x = 1\\] and an escaped backslash \\\\( stays.",
+    "***bold*** and * lone stars * and \\\\\\(odd\\\\\\)",
+    "\n\n  Line one  \n\n  line two\t \n",
+    "Ends with a backslash \\",
+    "Ends with a star *",
+    "   ",
+    "",
+]
+
+
+def stream(text, cuts):
+    normalizer = TextNormalizer()
+    bounds = [0, *cuts, len(text)]
+    shown = [normalizer.feed(text[start:end]) for start, end in zip(bounds, bounds[1:])]
+    shown.append(normalizer.finish())
+    assert "".join(shown) == normalizer.text()
+    return normalizer.text()
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("  The temperature is \\(21^\\circ C\\) in **Boston**.  \n", "The temperature is (21^\\circ C) in Boston."),
+    ("Display: \\[x = 1\\]", "Display: [x = 1]"),
+    ("An escaped backslash \\\\( stays.", "An escaped backslash \\\\( stays."),
+    ("   ", ""),
+])
+def test_normalize(text, expected):
+    assert normalize(text) == expected
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_every_two_and_three_way_split_matches(text):
+    expected = normalize(text)
+    for count in (1, 2):
+        for cuts in itertools.combinations(range(1, len(text)), count):
+            assert stream(text, cuts) == expected, cuts
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_one_character_deltas_match(text):
+    assert stream(text, range(1, len(text))) == normalize(text)
+
+
+def test_random_splits_match():
+    rng = random.Random(7)
+    alphabet = "ab *\\()[] \n"
+    for _ in range(500):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randrange(30)))
+        cuts = sorted(rng.sample(range(1, len(text)), rng.randrange(len(text)))) if len(text) > 1 else []
+        assert stream(text, cuts) == normalize(text), (text, cuts)
+
+
+def test_reset_starts_a_new_reply():
+    normalizer = TextNormalizer()
+    normalizer.feed("first **")
+    normalizer.reset()
+    normalizer.feed("  second")
+    normalizer.finish()
+    assert normalizer.text() == "second"
@@ -0,0 +1,73 @@
+import pytest
+
+from tool_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = TTLCache(ttl=10, maxsize=4, clock=clock)
+    cache.set("boston", 21)
+    clock.now += 9.9
+    assert cache.get("boston") == 21
+    clock.now += 0.1
+    assert cache.get("boston", "missing") == "missing"
+    assert len(cache) == 0
+    assert cache.stats()["expirations"] == 1
+
+
+def test_set_restarts_the_ttl(clock):
+    cache = TTLCache(ttl=10, maxsize=4, clock=clock)
+    cache.set("boston", 21)
+    clock.now += 8
+    cache.set("boston", 22)
+    clock.now += 8
+    assert cache.get("boston") == 22
+
+
+def test_evicts_least_recently_used(clock):
+    cache = TTLCache(ttl=10, maxsize=2, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_pop_ignores_expired_entries(clock):
+    cache = TTLCache(ttl=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.pop("a") == 1
+    clock.now += 10
+    assert cache.pop("b", "gone") == "gone"
+    assert len(cache) == 0
+
+
+def test_counts_hits_and_misses(clock):
+    cache = TTLCache(ttl=10, clock=clock)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("b")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_rejects_empty_cache():
+    with pytest.raises(ValueError):
+        TTLCache(maxsize=0)
@@ -0,0 +1,147 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from tool_executor import ToolExecutor
+
+
+def tool_call(call_id, name="get_current_temperature", **arguments):
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+def outputs(results):
+    return {result["tool_call_id"]: result["output"] for result in results}
+
+
+def test_runs_calls_concurrently_and_keeps_order():
+    barrier = threading.Barrier(3, timeout=5)
+
+    def call_tool(tool):
+        # Only returns once all three calls are running at the same time
+        barrier.wait()
+        return tool.function.arguments["value"]
+
+    executor = ToolExecutor(call_tool, max_workers=3)
+    calls = [tool_call(f"call_{n}", value=n) for n in range(3)]
+    try:
+        results = executor.run(calls)
+    finally:
+        executor.shutdown()
+    assert results == [{"tool_call_id": f"call_{n}", "output": str(n)} for n in range(3)]
+
+
+def test_exception_becomes_an_error_output():
+    def call_tool(tool):
+        raise ValueError("Invalid unit.")
+
+    executor = ToolExecutor(call_tool)
+    assert executor.run([tool_call("call_1")]) == [{"tool_call_id": "call_1", "output": "Error: Invalid unit."}]
+    assert executor.run([]) == []
+    executor.shutdown()
+
+
+def test_timeout_becomes_an_error_and_queued_calls_still_complete():
+    release = threading.Event()
+
+    def call_tool(tool):
+        if tool.id == "hung":
+            release.wait(10)
+        return "done"
+
+    executor = ToolExecutor(call_tool, max_workers=1, timeout=0.2)
+    try:
+        started = time.monotonic()
+        results = outputs(executor.run([tool_call("hung"), tool_call("queued"), tool_call("also_queued")]))
+        elapsed = time.monotonic() - started
+        assert results["hung"] == "Error: get_current_temperature timed out after 0.2 seconds"
+        assert results["queued"] == "done" and results["also_queued"] == "done"
+        assert elapsed < 2
+        assert executor.abandoned == 1
+        # The hung worker went with the retired pool; later turns get a fresh one
+        assert outputs(executor.run([tool_call("next")])) == {"next": "done"}
+    finally:
+        release.set()
+        executor.shutdown()
+    deadline = time.monotonic() + 5
+    while executor.abandoned and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert executor.abandoned == 0
+
+
+def test_timeout_runs_from_each_calls_own_start():
+    def call_tool(tool):
+        time.sleep(0.15)
+        return "done"
+
+    # The second call waits 0.15s for the only worker, then runs for 0.15s
+    executor = ToolExecutor(call_tool, max_workers=1, timeout=0.25)
+    try:
+        assert set(outputs(executor.run([tool_call("first"), tool_call("second")])).values()) == {"done"}
+    finally:
+        executor.shutdown()
+    assert executor.abandoned == 0
+
+
+def batch_executor(call_batch):
+    def call_tool(tool):
+        return f"single {tool.id}"
+    return ToolExecutor(call_tool, call_batch=call_batch,
+                        can_batch=lambda name: name == "get_current_temperature")
+
+
+def test_batches_calls_to_the_same_tool():
+    batches = []
+
+    def call_batch(tools):
+        batches.append([tool.id for tool in tools])
+        return [f"batch {tool.id}" for tool in tools]
+
+    executor = batch_executor(call_batch)
+    calls = [tool_call("a"), tool_call("rain", name="get_rain_probability"), tool_call("b")]
+    try:
+        results = executor.run(calls)
+    finally:
+        executor.shutdown()
+    assert [result["tool_call_id"] for result in results] == ["a", "rain", "b"]
+    assert outputs(results) == {"a": "batch a", "rain": "single rain", "b": "batch b"}
+    assert batches == [["a", "b"]]
+
+
+def test_short_batch_fails_only_the_missing_calls():
+    executor = batch_executor(lambda tools: ["12 Celsius"])
+    try:
+        results = outputs(executor.run([tool_call("a"), tool_call("b"), tool_call("c")]))
+    finally:
+        executor.shutdown()
+    assert results == {"a": "12 Celsius",
+                       "b": "Error: no result for get_current_temperature",
+                       "c": "Error: no result for get_current_temperature"}
+
+
+def test_long_batch_fails_every_call():
+    executor = batch_executor(lambda tools: ["1", "2", "3"])
+    try:
+        results = outputs(executor.run([tool_call("a"), tool_call("b")]))
+    finally:
+        executor.shutdown()
+    assert all(output.startswith("Error: ") for output in results.values())
+
+
+@pytest.mark.parametrize("call_batch, expected", [
+    (lambda tools: [ValueError("Unknown location 'Atlantis'"), "12 Celsius"],
+     {"a": "Error: Unknown location 'Atlantis'", "b": "12 Celsius"}),
+    (lambda tools: 1 / 0, {"a": "Error: division by zero", "b": "Error: division by zero"}),
+])
+def test_failed_batch_entries_become_errors(call_batch, expected):
+    executor = batch_executor(call_batch)
+    try:
+        assert outputs(executor.run([tool_call("a"), tool_call("b")])) == expected
+    finally:
+        executor.shutdown()
+
+
+def test_rejects_an_empty_pool():
+    with pytest.raises(ValueError):
+        ToolExecutor(str, max_workers=0)
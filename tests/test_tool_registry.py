@@ -0,0 +1,92 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from tool_registry import ToolArgumentError, ToolRegistry, compile_validator
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "location": {"type": "string"},
+        "unit": {"type": "string", "enum": ["Celsius", "Fahrenheit"]},
+        "days": {"type": "integer"},
+        "hours": {"type": "array", "items": {"type": "number"}},
+    },
+    "required": ["location", "unit"],
+    "additionalProperties": False,
+}
+
+
+@pytest.fixture
+def validate():
+    return compile_validator(SCHEMA)
+
+
+def test_accepts_valid_arguments(validate):
+    validate({"location": "Boston, MA", "unit": "Fahrenheit", "days": 2, "hours": [1, 2.5]})
+
+
+@pytest.mark.parametrize("value, message", [
+    ({"unit": "Celsius"}, "Missing required argument 'location'."),
+    ({"location": "Boston", "unit": "Kelvin"}, "Invalid unit. Must be one of: 'Celsius', 'Fahrenheit'."),
+    ({"location": "Boston", "unit": "Celsius", "wind": 1}, "Unexpected argument 'wind'."),
+    ({"location": 42, "unit": "Celsius"}, "location must be of type string."),
+    ({"location": "Boston", "unit": "Celsius", "days": 1.5}, "days must be of type integer."),
+    ({"location": "Boston", "unit": "Celsius", "hours": [1, "2"]}, "hours item must be of type number."),
+    (["Boston"], "arguments must be of type object."),
+])
+def test_rejects_invalid_arguments(validate, value, message):
+    with pytest.raises(ToolArgumentError) as excinfo:
+        validate(value)
+    assert str(excinfo.value) == message
+
+
+def test_booleans_are_not_numbers(validate):
+    with pytest.raises(ToolArgumentError, match="days must be of type integer"):
+        validate({"location": "Boston", "unit": "Celsius", "days": True})
+
+
+def test_unhashable_value_fails_enum():
+    validate = compile_validator({"enum": ["a", "b"]}, "unit")
+    with pytest.raises(ToolArgumentError, match="Invalid unit"):
+        validate(["a"])
+
+
+def test_error_is_a_value_error(validate):
+    with pytest.raises(ValueError):
+        validate({})
+
+
+def make_registry(batch):
+    registry = ToolRegistry()
+    registry.register("get_current_temperature", lambda **kwargs: "single", description="Temperature",
+                      parameters=SCHEMA, batch=batch)
+    return registry
+
+
+def tool_call(call_id, arguments):
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name="get_current_temperature",
+                                                                arguments=json.dumps(arguments)))
+
+
+def test_handle_tool_calls_runs_one_batch():
+    registry = make_registry(lambda calls: [f"{len(calls)} {call['unit']}" for call in calls])
+    calls = [tool_call("a", {"location": "Boston", "unit": "Celsius"}),
+             tool_call("b", {"location": "Boston"}),
+             tool_call("c", {"location": "Oslo", "unit": "Fahrenheit"})]
+    outputs = registry.handle_tool_calls(calls)
+    assert outputs[0] == "2 Celsius" and outputs[2] == "2 Fahrenheit"
+    assert isinstance(outputs[1], ToolArgumentError)
+
+
+def test_handle_tool_calls_fails_calls_a_short_batch_left_out():
+    registry = make_registry(lambda calls: ["12 Celsius"])
+    calls = [tool_call(call_id, {"location": "Boston", "unit": "Celsius"}) for call_id in "ab"]
+    assert registry.handle_tool_calls(calls) == ["12 Celsius", "Error: no result for get_current_temperature"]
+
+
+def test_handle_tool_calls_rejects_a_long_batch():
+    registry = make_registry(lambda calls: ["1", "2"])
+    with pytest.raises(ValueError):
+        registry.handle_tool_calls([tool_call("a", {"location": "Boston", "unit": "Celsius"})])
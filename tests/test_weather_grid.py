@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from weather_grid import TemperatureGrid, write_grid, write_synthetic_grid
+
+T0 = 1_700_000_000.0
+
+
+@pytest.fixture(scope="module")
+def global_grid(tmp_path_factory):
+    path = tmp_path_factory.mktemp("grid") / "global.wgrd"
+    return write_synthetic_grid(str(path), resolution=5.0, hours=6, start=T0, step=3600.0, seed=3)
+
+
+@pytest.fixture(scope="module")
+def regional_grid(tmp_path_factory):
+    # Covers part of the globe only, so longitudes are clamped rather than wrapped
+    path = tmp_path_factory.mktemp("grid") / "regional.wgrd"
+    data = np.random.default_rng(5).normal(15.0, 8.0, (3, 9, 12))
+    write_grid(str(path), data, 20.0, 2.5, -130.0, 5.0, T0, 10800.0)
+    return TemperatureGrid.open(str(path))
+
+
+def random_points(grid, count, seed):
+    rng = np.random.default_rng(seed)
+    latitudes = rng.uniform(-95.0, 95.0, count)
+    longitudes = rng.uniform(-200.0, 560.0, count)
+    # Also hit the edges and the grid points themselves
+    latitudes[:4] = [-90.0, 90.0, grid.lat0, grid.lat0 + grid.dlat * (grid.nlat - 1)]
+    longitudes[:4] = [-180.0, 180.0, grid.lon0, grid.lon0 + grid.dlon * (grid.nlon - 1)]
+    times = T0 + rng.uniform(-7200.0, grid.ntime * grid.dt + 7200.0, count)
+    return latitudes, longitudes, times
+
+
+@pytest.mark.parametrize("grid_name", ["global_grid", "regional_grid"])
+@pytest.mark.parametrize("method", ["bilinear", "nearest"])
+def test_lookup_many_matches_lookup(request, grid_name, method):
+    grid = request.getfixturevalue(grid_name)
+    latitudes, longitudes, times = random_points(grid, 300, seed=11)
+    many = grid.lookup_many(latitudes, longitudes, times, method=method)
+    one_by_one = [grid.lookup(lat, lon, when, method=method)
+                  for lat, lon, when in zip(latitudes, longitudes, times)]
+    np.testing.assert_allclose(many, one_by_one, rtol=1e-6, atol=1e-4)
+
+
+def test_lookup_many_with_one_time(global_grid):
+    latitudes, longitudes, _ = random_points(global_grid, 50, seed=12)
+    when = T0 + 2 * 3600.0
+    many = global_grid.lookup_many(latitudes, longitudes, when)
+    expected = [global_grid.lookup(lat, lon, when) for lat, lon in zip(latitudes, longitudes)]
+    np.testing.assert_allclose(many, expected, rtol=1e-6, atol=1e-4)
+
+
+def test_lookup_returns_grid_values_at_grid_points(regional_grid):
+    value = regional_grid.lookup(20.0 + 2.5 * 4, -130.0 + 5.0 * 7, T0 + 10800.0)
+    assert value == pytest.approx(float(regional_grid.data[1, 4, 7]))
+
+
+def test_unknown_method(global_grid):
+    with pytest.raises(ValueError):
+        global_grid.lookup(0.0, 0.0, T0, method="cubic")
+    with pytest.raises(ValueError):
+        global_grid.lookup_many([0.0], [0.0], T0, method="cubic")
+
+
+def test_open_rejects_other_files(tmp_path):
+    path = tmp_path / "not-a-grid"
+    path.write_bytes(b"x" * 256)
+    with pytest.raises(ValueError):
+        TemperatureGrid.open(str(path))
@@ -0,0 +1,241 @@
+import asyncio
+import itertools
+import json
+import os
+import socket
+from types import SimpleNamespace
+
+import pytest
+
+from chat_server import read_request, send_json
+from worker_supervisor import Dispatcher, WorkerSupervisor, shard, worker_address, worker_options
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="workers listen on Unix sockets")
+
+
+async def dispatch(dispatcher, method, path, payload=None):
+    # Sends one request through the dispatcher and returns (status, body)
+    client_socket, server_socket = socket.socketpair()
+    reader, writer = await asyncio.open_connection(sock=client_socket)
+    server_reader, server_writer = await asyncio.open_connection(sock=server_socket)
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+    await writer.drain()
+    await dispatcher.handle_connection(server_reader, server_writer)
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ", 2)[1]), body
+
+
+class FakeWorker:
+    """
+    Speaks the worker's session API on a Unix socket, like a ChatServer.
+    """
+
+    def __init__(self, index, address, max_sessions):
+        self.index = index
+        self.address = address
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        self.server = None
+
+    async def start(self):
+        self.sessions = {}  # a restarted worker has forgotten everything
+        self.server = await asyncio.start_unix_server(self.handle, self.address)
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        os.unlink(self.address)
+
+    async def handle(self, reader, writer):
+        method, path, _, body = await read_request(reader)
+        parts = [part for part in path.split("/") if part]
+        if method == "POST" and parts == ["sessions"]:
+            options = json.loads(body)
+            if len(self.sessions) >= self.max_sessions:
+                await send_json(writer, 503, {"error": "Too many open sessions."})
+            else:
+                self.sessions[options["session_id"]] = options["thread_id"]
+                await send_json(writer, 201, options)
+        elif parts[:1] == ["sessions"] and parts[1] not in self.sessions:
+            await send_json(writer, 404, {"error": "Unknown session."})
+        elif method == "DELETE":
+            del self.sessions[parts[1]]
+            await send_json(writer, 200, {"deleted": parts[1]})
+        elif parts[2:] == ["messages"]:
+            await send_json(writer, 200, {"worker": self.index, "thread_id": self.sessions[parts[1]]})
+        else:
+            await send_json(writer, 404, {"error": "Not found."})
+        writer.close()
+
+
+class FakeThreads:
+    def __init__(self):
+        self.ids = itertools.count()
+        self.deleted = []
+
+    async def create(self):
+        return SimpleNamespace(id=f"thread_{next(self.ids)}")
+
+    async def delete(self, thread_id):
+        self.deleted.append(thread_id)
+
+
+class Cluster:
+    # A Dispatcher in front of in-process fake workers
+    def __init__(self, socket_dir, workers=3, max_sessions=10, dispatcher_sessions=None):
+        self.threads = FakeThreads()
+        addresses = [worker_address(str(socket_dir), index) for index in range(workers)]
+        self.workers = [FakeWorker(index, address, max_sessions) for index, address in enumerate(addresses)]
+        supervisor = SimpleNamespace(workers=workers, addresses=addresses, options={"max_sessions": max_sessions},
+                                     stats=lambda: [])
+        client = SimpleNamespace(beta=SimpleNamespace(threads=self.threads))
+        self.dispatcher = Dispatcher(client, supervisor, connect_timeout=1.0, max_sessions=dispatcher_sessions)
+
+    async def start(self):
+        for worker in self.workers:
+            await worker.start()
+
+    async def stop(self):
+        for worker in self.workers:
+            await worker.stop()
+
+    async def request(self, method, path, payload=None):
+        status, body = await dispatch(self.dispatcher, method, path, payload)
+        return status, json.loads(body)
+
+
+def run_cluster(tmp_path, scenario, **kwargs):
+    async def main():
+        cluster = Cluster(tmp_path, **kwargs)
+        await cluster.start()
+        try:
+            await scenario(cluster)
+        finally:
+            await cluster.stop()
+    asyncio.run(main())
+
+
+def test_shard_is_stable_and_in_range():
+    assert shard("thread_abc", 4) == shard("thread_abc", 4)
+    assert {shard(f"thread_{n}", 4) for n in range(200)} == {0, 1, 2, 3}
+
+
+def test_routes_every_request_to_the_worker_owning_the_thread(tmp_path):
+    async def scenario(cluster):
+        sessions = [(await cluster.request("POST", "/sessions"))[1] for _ in range(12)]
+        for session in sessions:
+            status, payload = await cluster.request("POST", f"/sessions/{session['session_id']}/messages",
+                                                    {"content": "Weather?"})
+            assert status == 200
+            assert payload == {"worker": shard(session["thread_id"], 3), "thread_id": session["thread_id"]}
+        assert sum(cluster.dispatcher.routed) == 12
+        assert (await cluster.request("GET", "/sessions/nope/messages"))[0] == 404
+
+    run_cluster(tmp_path, scenario)
+
+
+def test_restarted_worker_gets_its_sessions_back(tmp_path):
+    async def scenario(cluster):
+        _, session = await cluster.request("POST", "/sessions")
+        worker = cluster.workers[shard(session["thread_id"], 3)]
+        # The worker crashes and comes back with no sessions
+        await worker.stop()
+        await worker.start()
+        status, payload = await cluster.request("POST", f"/sessions/{session['session_id']}/messages", {})
+        assert status == 200 and payload["thread_id"] == session["thread_id"]
+        assert worker.sessions == {session["session_id"]: session["thread_id"]}
+
+    run_cluster(tmp_path, scenario)
+
+
+def test_other_404s_do_not_re_register(tmp_path):
+    async def scenario(cluster):
+        _, session = await cluster.request("POST", "/sessions")
+        worker = cluster.workers[shard(session["thread_id"], 3)]
+        del worker.sessions[session["session_id"]]
+        worker.max_sessions = 0  # re-registration would be refused
+        status, payload = await cluster.request("POST", f"/sessions/{session['session_id']}/messages", {})
+        assert (status, payload) == (503, {"error": "Too many open sessions."})
+        worker.max_sessions = 10
+        worker.sessions[session["session_id"]] = session["thread_id"]
+        status, payload = await cluster.request("GET", f"/sessions/{session['session_id']}/unknown")
+        assert (status, payload) == (404, {"error": "Not found."})
+
+    run_cluster(tmp_path, scenario)
+
+
+def test_full_worker_makes_room_with_its_oldest_session(tmp_path):
+    async def scenario(cluster):
+        responses = [await cluster.request("POST", "/sessions") for _ in range(6)]
+        assert [status for status, _ in responses] == [201] * 6
+        assert cluster.threads.deleted == []
+        sessions = [session for _, session in responses]
+        # The newest session of each worker is the one still open
+        newest = {}
+        for session in sessions:
+            newest[shard(session["thread_id"], 3)] = session["session_id"]
+        assert set(cluster.dispatcher.sessions) == set(newest.values())
+
+    # Only the workers' own cap applies here
+    run_cluster(tmp_path, scenario, max_sessions=1, dispatcher_sessions=100)
+
+
+def test_refused_session_deletes_its_thread(tmp_path):
+    async def scenario(cluster):
+        for worker in cluster.workers:
+            worker.max_sessions = 0
+        status, payload = await cluster.request("POST", "/sessions")
+        assert (status, payload) == (503, {"error": "Too many open sessions."})
+        assert cluster.threads.deleted == ["thread_0"]
+        assert not cluster.dispatcher.sessions
+
+    run_cluster(tmp_path, scenario)
+
+
+def test_dispatcher_cap_closes_the_least_recently_used_session(tmp_path):
+    async def scenario(cluster):
+        first = (await cluster.request("POST", "/sessions"))[1]["session_id"]
+        second = (await cluster.request("POST", "/sessions"))[1]["session_id"]
+        await cluster.request("POST", f"/sessions/{first}/messages", {})  # first is now the most recent
+        third = (await cluster.request("POST", "/sessions"))[1]["session_id"]
+        assert list(cluster.dispatcher.sessions) == [first, third]
+        assert all(second not in worker.sessions for worker in cluster.workers)
+
+    run_cluster(tmp_path, scenario, dispatcher_sessions=2)
+
+
+def test_supervisor_restarts_a_crashed_worker(tmp_path, monkeypatch):
+    from http_client import new_async_client
+    from mock_server import MockScript, MockServer
+
+    monkeypatch.setenv("OPENAI_API_KEY", "mock")
+
+    async def main(server):
+        supervisor = WorkerSupervisor(2, worker_options(assistant_id="asst_mock", base_url=server.base_url),
+                                      socket_dir=str(tmp_path), drain_timeout=2)
+        dispatcher = Dispatcher(new_async_client(api_key="mock", base_url=server.base_url), supervisor,
+                                connect_timeout=20)
+        supervisor.start()
+        monitor = asyncio.create_task(supervisor.monitor(interval=0.05))
+        try:
+            status, session = await dispatcher.create_session()
+            assert status == 201
+            index = dispatcher.worker_for(session["thread_id"])
+            supervisor.processes[index].kill()
+            await asyncio.to_thread(supervisor.processes[index].join, 5)
+
+            # Waits for the restart, then hands the session to the new process
+            path = f"/sessions/{session['session_id']}/messages"
+            status, body = await dispatch(dispatcher, "POST", path, {"content": "Weather in San Francisco?"})
+            assert status == 200 and b"event: done" in body
+            assert supervisor.restarts[index] == 1
+            assert [worker["alive"] for worker in supervisor.stats()] == [True, True]
+        finally:
+            monitor.cancel()
+            await supervisor.stop()
+
+    with MockServer(MockScript(think_time=0.01, token_delay=0.0)) as server:
+        asyncio.run(main(server))
@@ -0,0 +1,96 @@
+import re
+
+# \\ is matched first so an escaped backslash is never read as the start of \( or \[
+_TOKENS = re.compile(r"\\\\|\\[()\[\]]|\*\*")
+_REPLACEMENTS = {
+    "\\\\": "\\\\",  # escaped backslash, kept as is
+    "\\(": "(",     # LaTeX inline math delimiters
+    "\\)": ")",
+    "\\[": "[",     # LaTeX display math delimiters
+    "\\]": "]",
+    "**": "",       # markdown bold markers
+}
+
+
+def _replace(match):
+    return _REPLACEMENTS[match.group(0)]
+
+
+def _trailing_run(text, char):
+    return len(text) - len(text.rstrip(char))
+
+
+class TextNormalizer:
+    """
+    Cleans assistant text for the terminal while it streams in.
+
+    Replaces LaTeX math delimiters such as `\\(` with plain brackets, drops
+    markdown bold markers, and trims leading and trailing whitespace like
+    `str.strip()` would on the whole reply. Text is cleaned delta by delta:
+    a backslash or `*` at the end of a delta is held back until the next one
+    shows whether it starts an escape sequence, and trailing whitespace is
+    held back until more text follows. Every character is scanned a bounded
+    number of times, so the cost is linear in the length of the reply.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._carry = ""    # possible start of an escape sequence split across deltas
+        self._space = ""    # whitespace that is only emitted if more text follows
+        self._started = False
+        self.parts = []     # everything emitted so far; "".join(parts) is the cleaned text
+
+    def feed(self, delta):
+        """
+        Adds a delta and returns the cleaned text that can be shown now.
+        """
+        text = self._carry + delta
+        hold = 0
+        if _trailing_run(text, "\\") % 2:
+            hold = 1
+        elif _trailing_run(text, "*") % 2:
+            hold = 1
+        if hold:
+            text, self._carry = text[:-hold], text[-hold:]
+        else:
+            self._carry = ""
+        return self._emit(_TOKENS.sub(_replace, text))
+
+    def finish(self):
+        """
+        Flushes whatever was held back and returns it; trailing whitespace is dropped.
+        """
+        text, self._carry = self._carry, ""
+        cleaned = self._emit(text)
+        self._space = ""
+        return cleaned
+
+    def text(self):
+        return "".join(self.parts)
+
+    def _emit(self, cleaned):
+        if not self._started:
+            cleaned = cleaned.lstrip()
+            if not cleaned:
+                return ""
+            self._started = True
+        body = cleaned.rstrip()
+        if not body:
+            self._space += cleaned
+            return ""
+        out = self._space + body
+        self._space = cleaned[len(body):]
+        self.parts.append(out)
+        return out
+
+
+def normalize(text):
+    """
+    Cleans a complete piece of text in one go.
+    """
+    normalizer = TextNormalizer()
+    normalizer.feed(text)
+    normalizer.finish()
+    return normalizer.text()
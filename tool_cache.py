@@ -0,0 +1,303 @@
+from collections import OrderedDict
+import functools
+import threading
+import time
+
+DEFAULT_TTL = 300.0  # seconds a cached reading stays fresh
+DEFAULT_MAXSIZE = 1024
+
+# Every temperature is cached in this unit and converted on the way out
+CACHE_UNIT = "Celsius"
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe mapping whose entries expire after a fixed time and which
+    evicts the least recently used entry once it is full.
+
+    Args:
+        ttl: Seconds an entry stays valid after it is stored.
+        maxsize: Maximum number of entries kept.
+        clock: Function returning the current time in seconds.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, maxsize=DEFAULT_MAXSIZE, clock=time.monotonic):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1.")
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for `key`, or `default` if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        """
+        Stores `value` under `key`, evicting the least recently used entry if needed.
+        """
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        """
+        Removes `key` and returns its value, or `default` if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is None or entry[0] <= self.clock():
+            return default
+        return entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """
+        Returns the cache counters as a dict.
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def normalize_location(location):
+    """
+    Normalizes a free-text location so that "san francisco,  CA" and
+    "San Francisco, CA" share a cache entry.
+    """
+    return " ".join(str(location).replace(",", ", ").split()).casefold()
+
+
+def convert_temperature(value, from_unit, to_unit):
+    """
+    Converts a temperature between Celsius and Fahrenheit.
+    """
+    if from_unit == to_unit:
+        return value
+    if from_unit == "Celsius" and to_unit == "Fahrenheit":
+        return value * 9 / 5 + 32
+    if from_unit == "Fahrenheit" and to_unit == "Celsius":
+        return (value - 32) * 5 / 9
+    raise ValueError("Invalid unit. Must be 'Celsius' or 'Fahrenheit'.")
+
+
+def cached_temperature(get_temperature, cache, default_unit=None, flight=None):
+    """
+    Wraps a temperature tool so that each location hits the backend once per TTL.
+
+    The backend is always asked for Celsius; Fahrenheit answers are converted
+    from the same cached reading. With a SingleFlight, concurrent misses for
+    the same location share one backend call.
+
+    Args:
+        get_temperature: The tool function, returning strings like "NN Celsius".
+        cache: The TTLCache to store readings in.
+        default_unit: Optional function returning the unit for a location when none is given.
+        flight: Optional SingleFlight coalescing concurrent misses.
+
+    Returns:
+        A function with the same signature and output format as `get_temperature`.
+    """
+    @functools.wraps(get_temperature)
+    def wrapper(**kwargs):
+        location = kwargs.get("location", "Unknown Location")
+        unit = kwargs.get("unit") or (default_unit(location) if default_unit else "Celsius")
+
+        if unit not in ["Celsius", "Fahrenheit"]:
+            raise ValueError("Invalid unit. Must be 'Celsius' or 'Fahrenheit'.")
+
+        key = (normalize_location(location), CACHE_UNIT)
+        if kwargs.get("time") is not None:
+            key += (kwargs["time"],)  # same keys as the batch wrapper
+        reading = cache.get(key, _MISSING)
+        if reading is _MISSING:
+            def fetch():
+                output = get_temperature(**{**kwargs, "unit": CACHE_UNIT})
+                reading = float(output.split()[0])
+                cache.set(key, reading)
+                return reading
+            reading = flight.do(key, fetch) if flight is not None else fetch()
+
+        temperature = round(convert_temperature(reading, CACHE_UNIT, unit))
+        return f"{temperature} {unit}"
+
+    wrapper.cache = cache
+    return wrapper
+
+
+def cached_temperature_batch(get_temperatures, cache, default_unit=None, flight=None):
+    """
+    Batch counterpart of `cached_temperature`, sharing the same cache entries.
+
+    Calls answered from the cache never reach the backend; the rest are sent
+    to it together in Celsius. With a SingleFlight, locations another caller
+    is already fetching are waited for instead of fetched again.
+
+    Args:
+        get_temperatures: Backend taking a list of argument dicts and returning
+            one "NN Celsius" string (or exception) per dict.
+        cache: The TTLCache to store readings in.
+        default_unit: Optional function returning the unit for a location when none is given.
+        flight: Optional SingleFlight coalescing concurrent misses.
+
+    Returns:
+        A function with the same signature as `get_temperatures`.
+    """
+    @functools.wraps(get_temperatures)
+    def wrapper(calls):
+        outputs = [None] * len(calls)
+        misses = []  # (index, unit, key)
+        for index, kwargs in enumerate(calls):
+            location = kwargs.get("location", "Unknown Location")
+            unit = kwargs.get("unit") or (default_unit(location) if default_unit else "Celsius")
+            if unit not in ["Celsius", "Fahrenheit"]:
+                outputs[index] = ValueError("Invalid unit. Must be 'Celsius' or 'Fahrenheit'.")
+                continue
+            key = (normalize_location(location), CACHE_UNIT)
+            if kwargs.get("time") is not None:
+                key += (kwargs["time"],)
+            reading = cache.get(key, _MISSING)
+            if reading is _MISSING:
+                misses.append((index, unit, key))
+            else:
+                outputs[index] = f"{round(convert_temperature(reading, CACHE_UNIT, unit))} {unit}"
+
+        if misses:
+            requests = {key: {**calls[index], "unit": CACHE_UNIT} for index, _, key in misses}
+
+            def fetch(keys):
+                readings = []
+                for key, result in zip(keys, get_temperatures([requests[key] for key in keys])):
+                    if isinstance(result, Exception):
+                        readings.append(result)
+                        continue
+                    reading = float(result.split()[0])
+                    cache.set(key, reading)
+                    readings.append(reading)
+                return readings
+
+            keys = [key for _, _, key in misses]
+            readings = flight.do_many(keys, fetch) if flight is not None else fetch(keys)
+            for (index, unit, _), reading in zip(misses, readings):
+                if isinstance(reading, Exception):
+                    outputs[index] = reading
+                else:
+                    outputs[index] = f"{round(convert_temperature(reading, CACHE_UNIT, unit))} {unit}"
+        return outputs
+
+    wrapper.cache = cache
+    return wrapper
+
+
+def cached_rain_probability(get_rain_probability, cache, flight=None):
+    """
+    Wraps a rain probability tool so that each location hits the backend once per TTL.
+
+    Args:
+        get_rain_probability: The tool function.
+        cache: The TTLCache to store results in.
+        flight: Optional SingleFlight coalescing concurrent misses.
+
+    Returns:
+        A function with the same signature as `get_rain_probability`.
+    """
+    @functools.wraps(get_rain_probability)
+    def wrapper(**kwargs):
+        key = (normalize_location(kwargs.get("location", "Unknown Location")), None)
+        if kwargs.get("time") is not None:
+            key += (kwargs["time"],)  # same keys as the batch wrapper
+        output = cache.get(key, _MISSING)
+        if output is _MISSING:
+            def fetch():
+                output = get_rain_probability(**kwargs)
+                cache.set(key, output)
+                return output
+            output = flight.do(key, fetch) if flight is not None else fetch()
+        return output
+
+    wrapper.cache = cache
+    return wrapper
+
+
+def cached_rain_probability_batch(get_rain_probabilities, cache, flight=None):
+    """
+    Batch counterpart of `cached_rain_probability`, sharing the same cache entries.
+
+    Args:
+        get_rain_probabilities: Backend taking a list of argument dicts and
+            returning one output (or exception) per dict.
+        cache: The TTLCache to store results in.
+        flight: Optional SingleFlight coalescing concurrent misses.
+
+    Returns:
+        A function with the same signature as `get_rain_probabilities`.
+    """
+    @functools.wraps(get_rain_probabilities)
+    def wrapper(calls):
+        outputs = [None] * len(calls)
+        misses = []  # (index, key)
+        for index, kwargs in enumerate(calls):
+            key = (normalize_location(kwargs.get("location", "Unknown Location")), None)
+            if kwargs.get("time") is not None:
+                key += (kwargs["time"],)
+            output = cache.get(key, _MISSING)
+            if output is _MISSING:
+                misses.append((index, key))
+            else:
+                outputs[index] = output
+
+        if misses:
+            requests = {key: calls[index] for index, key in misses}
+
+            def fetch(keys):
+                results = get_rain_probabilities([requests[key] for key in keys])
+                for key, result in zip(keys, results):
+                    if not isinstance(result, Exception):
+                        cache.set(key, result)
+                return results
+
+            keys = [key for _, key in misses]
+            results = flight.do_many(keys, fetch) if flight is not None else fetch(keys)
+            for (index, _), result in zip(misses, results):
+                outputs[index] = result
+        return outputs
+
+    wrapper.cache = cache
+    return wrapper
@@ -0,0 +1,184 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import threading
+import time
+
+from instrumentation import tracer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_TIMEOUT = 10.0  # seconds allowed for each tool call
+
+
+class ToolExecutor:
+    """
+    Runs the tool calls of a single `requires_action` step concurrently.
+
+    All calls are submitted to a bounded thread pool at once, so a turn costs
+    roughly the latency of the slowest tool instead of the sum of all of them.
+    Every call yields exactly one `{"tool_call_id", "output"}` entry, in the
+    same order as the tool calls, so the list can go straight into a single
+    `submit_tool_outputs_*` request.
+
+    When `call_batch` is given, several calls to the same tool in one step
+    (e.g. one temperature call per city) are fused into a single batch call
+    for tools `can_batch` accepts, so the backend answers them together.
+
+    Each call's `timeout` runs from the moment it starts, not from when it
+    was queued. Python threads cannot be killed, so a call that times out
+    keeps running in the background; its pool is retired at that point and
+    later calls go to a fresh one, so a hung tool cannot starve later turns.
+    A retired pool's threads exit once their calls return; `abandoned`
+    counts the timed-out calls still running.
+
+    Args:
+        call_tool: Function taking one tool call object and returning its output string.
+        max_workers: Maximum number of tool calls running at the same time.
+        timeout: Seconds each call may run before it is reported as an error.
+        call_batch: Optional function taking a list of calls to one tool and
+            returning one output string (or exception) per call.
+        can_batch: Function telling whether a tool name can go through `call_batch`.
+    """
+
+    def __init__(self, call_tool, max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_TIMEOUT,
+                 call_batch=None, can_batch=None):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1.")
+        self.call_tool = call_tool
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.call_batch = call_batch
+        self.can_batch = can_batch or (lambda name: call_batch is not None)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self.abandoned = 0
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="tool-call",
+                )
+            return self._pool
+
+    def _retire_pool(self, pool):
+        # Workers stuck in timed-out calls stay with the old pool
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False)
+
+    def _submit(self, task, turn):
+        pool = self._get_pool()
+        started = []  # filled in by the worker, so the timeout runs from the call's own start
+
+        def call():
+            started.append(time.monotonic())
+            if len(task) > 1:
+                return self._run_batch(task, turn)
+            return [self._run_one(task[0], turn)]
+        return pool, pool.submit(call), started
+
+    def _on_abandoned_done(self, future):
+        with self._pool_lock:
+            self.abandoned -= 1
+
+    def _run_one(self, tool, turn=None):
+        try:
+            with tracer.span(f"tool.{tool.function.name}", turn=turn, tool_call_id=tool.id):
+                return str(self.call_tool(tool))
+        except Exception as e:
+            logger.debug(f"Tool Call ID: {tool.id} | Error: {e}")
+            return f"Error: {e}"
+
+    def _run_batch(self, tools, turn=None):
+        name = tools[0].function.name
+        try:
+            with tracer.span(f"tool.{name}", turn=turn, fused=len(tools)):
+                results = self.call_batch(tools)
+        except Exception as e:
+            logger.debug(f"Batch of {len(tools)} {name} calls | Error: {e}")
+            return [f"Error: {e}"] * len(tools)
+        results = list(results)
+        if len(results) > len(tools):
+            # Outputs can no longer be matched to their calls
+            logger.warning(f"Batch of {len(tools)} {name} calls returned {len(results)} results")
+            return [f"Error: {name} returned {len(results)} results for {len(tools)} calls"] * len(tools)
+        outputs = [f"Error: {result}" if isinstance(result, Exception) else str(result) for result in results]
+        # A short batch fails the calls it left out, so every call still gets an output
+        return outputs + [f"Error: no result for {name}"] * (len(tools) - len(outputs))
+
+    def _group(self, tool_calls):
+        # Calls to the same batchable tool become one task; everything else runs alone
+        tasks = []
+        groups = {}
+        for tool in tool_calls:
+            name = tool.function.name
+            if self.call_batch is not None and self.can_batch(name):
+                group = groups.get(name)
+                if group is None:
+                    group = groups[name] = []
+                    tasks.append(group)
+                group.append(tool)
+            else:
+                tasks.append([tool])
+        return tasks
+
+    def run(self, tool_calls):
+        """
+        Executes the tool calls and collects their outputs.
+
+        Args:
+            tool_calls: The tool calls from `required_action.submit_tool_outputs`.
+
+        Returns:
+            A list of `{"tool_call_id", "output"}` dicts, one per tool call.
+        """
+        tool_calls = list(tool_calls)
+        if not tool_calls:
+            return []
+
+        # Worker threads cannot see the caller's turn, so hand it over
+        turn = tracer.current_turn()
+        tasks = self._group(tool_calls)
+        calls = [self._submit(task, turn) for task in tasks]
+
+        outputs = {}
+        for task, (pool, future, started) in zip(tasks, calls):
+            while True:
+                if not started and pool is not self._pool and future.cancel():
+                    # Still queued behind calls that timed out: move it to the current pool
+                    pool, future, started = self._submit(task, turn)
+                if self.timeout is None:
+                    results = future.result()
+                    break
+                remaining = self.timeout
+                if started:
+                    remaining = max(0.0, started[0] + self.timeout - time.monotonic())
+                try:
+                    results = future.result(timeout=remaining)
+                    break
+                except FutureTimeoutError:
+                    if not started:
+                        continue  # its clock starts when a worker picks it up
+                with self._pool_lock:
+                    self.abandoned += 1
+                future.add_done_callback(self._on_abandoned_done)
+                self._retire_pool(pool)
+                logger.warning(f"Tool Call ID: {task[0].id} | Timed out after {self.timeout}s "
+                               f"({self.abandoned} timed-out calls still running)")
+                results = [f"Error: {task[0].function.name} timed out after {self.timeout} seconds"] * len(task)
+                break
+            outputs.update((tool.id, output) for tool, output in zip(task, results))
+        return [{"tool_call_id": tool.id, "output": outputs[tool.id]} for tool in tool_calls]
+
+    def shutdown(self):
+        """
+        Stops the worker threads. Calls that are still running are not waited for.
+        """
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
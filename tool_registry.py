@@ -0,0 +1,287 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ToolArgumentError(ValueError):
+    """
+    Raised when the arguments of a tool call do not match the tool's schema.
+    """
+
+
+# JSON schema "type" keywords mapped to the Python types json.loads produces
+_JSON_TYPES = {
+    "string": (str,),
+    "number": (int, float),
+    "integer": (int,),
+    "boolean": (bool,),
+    "array": (list,),
+    "object": (dict,),
+    "null": (type(None),),
+}
+
+
+def compile_validator(schema, path="arguments"):
+    """
+    Compiles a JSON schema into a validation function.
+
+    Only the subset of JSON schema used by function tools is supported:
+    `type`, `enum`, `properties`, `required`, `additionalProperties` and `items`.
+    The schema is walked once here, so validating a call is a handful of
+    isinstance checks and set lookups.
+
+    Args:
+        schema: The JSON schema dict (e.g. a tool's "parameters").
+        path: Name used for the value in error messages.
+
+    Returns:
+        A function that takes a decoded value and raises ToolArgumentError if it is invalid.
+    """
+    checks = []
+
+    schema_type = schema.get("type")
+    if schema_type is not None:
+        type_names = schema_type if isinstance(schema_type, list) else [schema_type]
+        python_types = tuple(t for name in type_names for t in _JSON_TYPES[name])
+        # bool is a subclass of int, but JSON keeps them apart
+        reject_bool = "boolean" not in type_names
+
+        def check_type(value):
+            if not isinstance(value, python_types) or (reject_bool and isinstance(value, bool)):
+                raise ToolArgumentError(f"{path} must be of type {' or '.join(type_names)}.")
+        checks.append(check_type)
+
+    if "enum" in schema:
+        allowed = list(schema["enum"])
+        try:
+            allowed_set = frozenset(allowed)
+        except TypeError:
+            allowed_set = None
+
+        def check_enum(value):
+            try:
+                ok = value in allowed_set if allowed_set is not None else value in allowed
+            except TypeError:
+                ok = False
+            if not ok:
+                raise ToolArgumentError(
+                    f"Invalid {path}. Must be one of: {', '.join(repr(a) for a in allowed)}."
+                )
+        checks.append(check_enum)
+
+    properties = schema.get("properties")
+    if properties is not None or "required" in schema:
+        property_validators = {
+            name: compile_validator(subschema, name)
+            for name, subschema in (properties or {}).items()
+        }
+        required = tuple(schema.get("required", ()))
+        allow_extra = schema.get("additionalProperties", True) is not False
+
+        def check_properties(value):
+            if not isinstance(value, dict):
+                return
+            for name in required:
+                if name not in value:
+                    raise ToolArgumentError(f"Missing required argument '{name}'.")
+            for name, item in value.items():
+                validator = property_validators.get(name)
+                if validator is not None:
+                    validator(item)
+                elif not allow_extra:
+                    raise ToolArgumentError(f"Unexpected argument '{name}'.")
+        checks.append(check_properties)
+
+    if "items" in schema:
+        item_validator = compile_validator(schema["items"], f"{path} item")
+
+        def check_items(value):
+            if isinstance(value, list):
+                for item in value:
+                    item_validator(item)
+        checks.append(check_items)
+
+    def validate(value):
+        for check in checks:
+            check(value)
+    return validate
+
+
+class Tool:
+    """
+    A function tool the assistant can call.
+
+    Args:
+        name: The function name the model uses to call the tool.
+        handler: Function called with the decoded arguments as keyword arguments.
+        description: Description shown to the model.
+        parameters: JSON schema of the arguments.
+        batch: Optional function taking a list of argument dicts and returning
+            one output (or exception) per dict, used to answer several calls at once.
+    """
+
+    def __init__(self, name, handler, description, parameters, batch=None):
+        self.name = name
+        self.handler = handler
+        self.batch = batch
+        self.description = description
+        self.parameters = parameters
+        self.validate = compile_validator(parameters)
+
+    def to_payload(self):
+        """
+        Returns the tool definition in the format expected by `assistants.create`.
+        """
+        return {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": self.description,
+                "parameters": self.parameters,
+            },
+        }
+
+
+class ToolRegistry:
+    """
+    Keeps every tool in one place, keyed by name.
+
+    The registry builds the `tools=[...]` payload for the assistant and
+    dispatches tool calls with a single dict lookup. Arguments are decoded and
+    validated once per call before the handler runs.
+    """
+
+    def __init__(self):
+        self._tools = {}
+        self._payload = None
+
+    def register(self, name, handler=None, *, description, parameters, batch=None):
+        """
+        Registers a tool. Can also be used as a decorator when `handler` is omitted.
+
+        Args:
+            name: The function name the model uses to call the tool.
+            handler: Function called with the decoded arguments as keyword arguments.
+            description: Description shown to the model.
+            parameters: JSON schema of the arguments.
+            batch: Optional batch handler, see Tool.
+        """
+        if handler is None:
+            def decorator(func):
+                self.register(name, func, description=description, parameters=parameters, batch=batch)
+                return func
+            return decorator
+
+        if name in self._tools:
+            raise ValueError(f"Tool '{name}' is already registered.")
+        self._tools[name] = Tool(name, handler, description, parameters, batch)
+        self._payload = None
+        return handler
+
+    def __contains__(self, name):
+        return name in self._tools
+
+    def __iter__(self):
+        return iter(self._tools.values())
+
+    def __len__(self):
+        return len(self._tools)
+
+    def get(self, name):
+        """
+        Returns the registered Tool, raising ValueError for unknown names.
+        """
+        try:
+            return self._tools[name]
+        except KeyError:
+            raise ValueError(f"Unknown tool '{name}'") from None
+
+    def tools_payload(self):
+        """
+        Returns the `tools` list for `client.beta.assistants.create`.
+        """
+        if self._payload is None:
+            self._payload = [tool.to_payload() for tool in self._tools.values()]
+        return self._payload
+
+    def parse_arguments(self, name, arguments):
+        """
+        Decodes and validates the JSON arguments of a call to the named tool.
+
+        Args:
+            name: The tool name.
+            arguments: The raw JSON string from `tool.function.arguments`.
+
+        Returns:
+            The decoded arguments dict.
+        """
+        tool = self.get(name)
+        try:
+            decoded = json.loads(arguments) if arguments else {}
+        except json.JSONDecodeError as e:
+            raise ToolArgumentError(f"Arguments are not valid JSON: {e}") from None
+        tool.validate(decoded)
+        return decoded
+
+    def call(self, name, arguments):
+        """
+        Runs the named tool with raw JSON arguments.
+
+        Returns:
+            The tool output as a string.
+        """
+        decoded = self.parse_arguments(name, arguments)
+        return str(self._tools[name].handler(**decoded))
+
+    def handle_tool_call(self, tool):
+        """
+        Runs a tool call object from a run's required action.
+
+        Args:
+            tool: The tool call object (with `id` and `function.name`/`function.arguments`).
+
+        Returns:
+            The tool output as a string.
+        """
+        logger.debug(f"Tool Call ID: {tool.id} | Arguments: {tool.function.arguments}")
+        return self.call(tool.function.name, tool.function.arguments)
+
+    def supports_batch(self, name):
+        """
+        Returns True if the named tool has a batch handler.
+        """
+        tool = self._tools.get(name)
+        return tool is not None and tool.batch is not None
+
+    def handle_tool_calls(self, tools):
+        """
+        Runs several calls to the same tool with one call to its batch handler.
+
+        Args:
+            tools: Tool call objects that all name the same tool.
+
+        Returns:
+            One entry per call: the output string, or the exception that call failed with.
+        """
+        tools = list(tools)
+        tool = self.get(tools[0].function.name)
+        if tool.batch is None:
+            raise ValueError(f"Tool '{tool.name}' has no batch handler.")
+
+        # Calls the batch handler leaves out fail like a single call would, rather than answering "None"
+        outputs = [f"Error: no result for {tool.name}"] * len(tools)
+        valid = []  # (index, decoded arguments)
+        for index, call in enumerate(tools):
+            logger.debug(f"Tool Call ID: {call.id} | Arguments: {call.function.arguments}")
+            try:
+                valid.append((index, self.parse_arguments(tool.name, call.function.arguments)))
+            except ToolArgumentError as e:
+                outputs[index] = e
+        if valid:
+            results = list(tool.batch([arguments for _, arguments in valid]))
+            if len(results) > len(valid):
+                raise ValueError(f"Tool '{tool.name}' returned {len(results)} results for {len(valid)} calls.")
+            for (index, _), result in zip(valid, results):
+                outputs[index] = result if isinstance(result, Exception) else str(result)
+        return outputs
@@ -0,0 +1,234 @@
+import argparse
+import math
+import os
+import struct
+import time
+
+import numpy as np
+
+# File layout: a fixed little-endian header, zero padding up to DATA_OFFSET,
+# then float32 Celsius values in C order with shape (time, lat, lon), so
+# each time step is one contiguous slab.
+MAGIC = b"WGRD"
+VERSION = 1
+_HEADER = struct.Struct("<4sIIII6d")  # magic, version, ntime, nlat, nlon, lat0, dlat, lon0, dlon, t0, dt
+DATA_OFFSET = 128
+DTYPE = np.dtype("<f4")
+
+
+class TemperatureGrid:
+    """
+    A regular lat x lon x time temperature field backed by a memory-mapped file.
+
+    Opening the file only reads the header; the operating system pages in the
+    few values each lookup touches, so startup cost does not grow with the
+    size of the dataset. Grid coordinates are implicit (origin plus step), so
+    a lookup is a handful of arithmetic operations and at most four reads.
+
+    Args:
+        data: Array of shape (ntime, nlat, nlon), usually an np.memmap.
+        lat0, dlat: Latitude of the first row and the step between rows.
+        lon0, dlon: Longitude of the first column and the step between columns.
+        t0, dt: Unix time of the first step and the seconds between steps.
+    """
+
+    def __init__(self, data, lat0, dlat, lon0, dlon, t0, dt):
+        self.data = data
+        self.ntime, self.nlat, self.nlon = data.shape
+        self.lat0, self.dlat = lat0, dlat
+        self.lon0, self.dlon = lon0, dlon
+        self.t0, self.dt = t0, dt
+        # Longitude wraps around when the grid covers the whole globe
+        self.periodic = self.nlon * abs(dlon) >= 360.0 - 1e-9
+
+    @classmethod
+    def open(cls, path):
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError(f"{path} is too short to be a temperature grid.")
+        magic, version, ntime, nlat, nlon, lat0, dlat, lon0, dlon, t0, dt = _HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a temperature grid.")
+        if version != VERSION:
+            raise ValueError(f"Unsupported temperature grid version {version} in {path}.")
+        data = np.memmap(path, dtype=DTYPE, mode="r", offset=DATA_OFFSET, shape=(ntime, nlat, nlon))
+        return cls(data, lat0, dlat, lon0, dlon, t0, dt)
+
+    def time_index(self, when=None):
+        """
+        Returns the time step nearest to `when` (Unix seconds, default now), clamped to the grid.
+        """
+        when = time.time() if when is None else when
+        if self.ntime == 1 or self.dt <= 0:
+            return 0
+        return min(self.ntime - 1, max(0, int(round((when - self.t0) / self.dt))))
+
+    def _position(self, value, origin, step, size, periodic=False):
+        # Fractional grid index of a coordinate
+        position = (value - origin) / step
+        if periodic:
+            return position % size
+        return min(size - 1.0, max(0.0, position))
+
+    def lookup(self, latitude, longitude, when=None, method="bilinear"):
+        """
+        Returns the temperature in Celsius at a point.
+
+        Args:
+            latitude: Degrees north.
+            longitude: Degrees east.
+            when: Unix time of the reading; defaults to now.
+            method: "bilinear" or "nearest".
+        """
+        t = self.time_index(when)
+        y = self._position(latitude, self.lat0, self.dlat, self.nlat)
+        x = self._position(longitude, self.lon0, self.dlon, self.nlon, self.periodic)
+        data = self.data
+
+        if method == "nearest":
+            i = min(self.nlat - 1, int(round(y)))
+            j = int(round(x)) % self.nlon if self.periodic else min(self.nlon - 1, int(round(x)))
+            return float(data[t, i, j])
+        if method != "bilinear":
+            raise ValueError(f"Unknown interpolation method '{method}'")
+
+        i0 = min(int(y), self.nlat - 1)
+        j0 = min(int(x), self.nlon - 1)
+        i1 = min(i0 + 1, self.nlat - 1)
+        j1 = (j0 + 1) % self.nlon if self.periodic else min(j0 + 1, self.nlon - 1)
+        fy, fx = y - i0, x - j0
+        top = data[t, i0, j0] * (1 - fx) + data[t, i0, j1] * fx
+        bottom = data[t, i1, j0] * (1 - fx) + data[t, i1, j1] * fx
+        return float(top * (1 - fy) + bottom * fy)
+
+    def lookup_many(self, latitudes, longitudes, when=None, method="bilinear"):
+        """
+        Vectorized `lookup` for many points at once.
+
+        Args:
+            latitudes: Sequence of degrees north.
+            longitudes: Sequence of degrees east, same length.
+            when: Unix time for every point, a sequence of times (NaN meaning
+                now), or None for now.
+            method: "bilinear" or "nearest".
+
+        Returns:
+            A float64 array of temperatures in Celsius.
+        """
+        lat = np.asarray(latitudes, dtype=np.float64)
+        lon = np.asarray(longitudes, dtype=np.float64)
+        now = time.time()
+        if when is None:
+            when = np.full(lat.shape, now)
+        else:
+            when = np.broadcast_to(np.asarray(when, dtype=np.float64), lat.shape)
+            when = np.where(np.isnan(when), now, when)
+        if self.ntime == 1 or self.dt <= 0:
+            t = np.zeros(lat.shape, dtype=np.intp)
+        else:
+            t = np.clip(np.rint((when - self.t0) / self.dt), 0, self.ntime - 1).astype(np.intp)
+
+        y = np.clip((lat - self.lat0) / self.dlat, 0.0, self.nlat - 1.0)
+        x = (lon - self.lon0) / self.dlon
+        x = np.mod(x, self.nlon) if self.periodic else np.clip(x, 0.0, self.nlon - 1.0)
+        data = self.data
+
+        if method == "nearest":
+            i = np.minimum(np.rint(y).astype(np.intp), self.nlat - 1)
+            j = np.rint(x).astype(np.intp)
+            j = np.mod(j, self.nlon) if self.periodic else np.minimum(j, self.nlon - 1)
+            return data[t, i, j].astype(np.float64)
+        if method != "bilinear":
+            raise ValueError(f"Unknown interpolation method '{method}'")
+
+        i0 = np.minimum(y.astype(np.intp), self.nlat - 1)
+        j0 = np.minimum(x.astype(np.intp), self.nlon - 1)
+        i1 = np.minimum(i0 + 1, self.nlat - 1)
+        j1 = np.mod(j0 + 1, self.nlon) if self.periodic else np.minimum(j0 + 1, self.nlon - 1)
+        fy, fx = y - i0, x - j0
+        top = data[t, i0, j0] * (1 - fx) + data[t, i0, j1] * fx
+        bottom = data[t, i1, j0] * (1 - fx) + data[t, i1, j1] * fx
+        return top * (1 - fy) + bottom * fy
+
+
+def write_grid(path, data, lat0, dlat, lon0, dlon, t0, dt):
+    """
+    Writes an array of shape (ntime, nlat, nlon) in Celsius as a grid file.
+    """
+    data = np.asarray(data, dtype=DTYPE)
+    ntime, nlat, nlon = data.shape
+    header = _HEADER.pack(MAGIC, VERSION, ntime, nlat, nlon, lat0, dlat, lon0, dlon, t0, dt)
+    with open(path, "wb") as f:
+        f.write(header.ljust(DATA_OFFSET, b"\0"))
+        data.tofile(f)
+
+
+def write_synthetic_grid(path, resolution=1.0, hours=48, start=None, step=3600.0, seed=0):
+    """
+    Writes a plausible global temperature field for tests and benchmarks.
+
+    Temperatures fall off with latitude, follow the sun around the globe
+    during the day and carry a little spatial noise. Steps are generated and
+    written one at a time, so memory use stays at one time slab.
+
+    Args:
+        path: File to write.
+        resolution: Grid spacing in degrees.
+        hours: Number of time steps.
+        start: Unix time of the first step; defaults to the start of the current hour.
+        step: Seconds between time steps.
+        seed: Seed for the noise, so files are reproducible.
+
+    Returns:
+        The opened TemperatureGrid.
+    """
+    start = math.floor(time.time() / 3600) * 3600 if start is None else start
+    lats = np.arange(-90.0, 90.0 + resolution / 2, resolution)
+    lons = np.arange(-180.0, 180.0, resolution)
+    rng = np.random.default_rng(seed)
+    base = 30.0 * np.cos(np.radians(lats))[:, None] - 5.0 + rng.normal(0.0, 1.5, (lats.size, lons.size))
+
+    header = _HEADER.pack(MAGIC, VERSION, hours, lats.size, lons.size, lats[0], resolution,
+                          lons[0], resolution, float(start), step)
+    with open(path, "wb") as f:
+        f.write(header.ljust(DATA_OFFSET, b"\0"))
+        for n in range(hours):
+            utc_hour = ((start + n * step) / 3600.0) % 24
+            # Warmest around 15:00 local solar time
+            local_hour = utc_hour + lons[None, :] / 15.0
+            diurnal = 6.0 * np.cos(2 * np.pi * (local_hour - 15.0) / 24.0)
+            (base + diurnal).astype(DTYPE).tofile(f)
+    return TemperatureGrid.open(path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Create or query a memory-mapped temperature grid.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="Write a synthetic global grid")
+    generate.add_argument("path")
+    generate.add_argument("--resolution", type=float, default=1.0, help="Degrees between grid points")
+    generate.add_argument("--hours", type=int, default=48)
+    generate.add_argument("--seed", type=int, default=0)
+
+    lookup = commands.add_parser("lookup", help="Print the temperature at a point")
+    lookup.add_argument("path")
+    lookup.add_argument("latitude", type=float)
+    lookup.add_argument("longitude", type=float)
+    lookup.add_argument("--method", choices=["bilinear", "nearest"], default="bilinear")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "generate":
+        grid = write_synthetic_grid(args.path, args.resolution, args.hours, seed=args.seed)
+        size = os.path.getsize(args.path)
+        print(f"Wrote {grid.ntime} x {grid.nlat} x {grid.nlon} grid ({size / 1e6:.1f} MB) to {args.path}")
+    else:
+        grid = TemperatureGrid.open(args.path)
+        started = time.perf_counter()
+        value = grid.lookup(args.latitude, args.longitude, method=args.method)
+        elapsed = time.perf_counter() - started
+        print(f"{value:.1f} Celsius ({elapsed * 1e6:.0f} us)")
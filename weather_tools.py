@@ -0,0 +1,198 @@
+import json
+import os
+
+from answer_cache import DEFAULT_ANSWER_CACHE_PATH, AnswerCache
+from gazetteer import infer_unit
+from get_current_temperature import get_current_temperature, get_current_temperatures
+from get_rain_probability import get_rain_probabilities, get_rain_probability
+from tool_cache import (DEFAULT_MAXSIZE, DEFAULT_TTL, TTLCache, cached_rain_probability,
+                        cached_rain_probability_batch, cached_temperature, cached_temperature_batch)
+from single_flight import SingleFlight
+from tool_executor import ToolExecutor
+from tool_registry import ToolRegistry
+
+# Definition of the weather assistant shared by every entry point
+MODEL = "gpt-4o"
+INSTRUCTIONS = "You are a weather bot. Use the provided functions to answer questions."
+
+# Tool results are cached per location; tune with WEATHER_CACHE_TTL / WEATHER_CACHE_SIZE
+CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", DEFAULT_TTL))
+CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", DEFAULT_MAXSIZE))
+
+temperature_cache = TTLCache(ttl=CACHE_TTL, maxsize=CACHE_SIZE)
+rain_cache = TTLCache(ttl=CACHE_TTL, maxsize=CACHE_SIZE)
+
+# Concurrent cache misses for the same location share one backend call
+temperature_flight = SingleFlight()
+rain_flight = SingleFlight()
+
+temperatures = cached_temperature_batch(get_current_temperatures, temperature_cache, default_unit=infer_unit,
+                                        flight=temperature_flight)
+rain_probabilities = cached_rain_probability_batch(get_rain_probabilities, rain_cache, flight=rain_flight)
+
+registry = ToolRegistry()
+
+registry.register(
+    "get_current_temperature",
+    cached_temperature(get_current_temperature, temperature_cache, default_unit=infer_unit,
+                       flight=temperature_flight),
+    batch=temperatures,
+    description="Get the current temperature for a specific location",
+    parameters={
+        "type": "object",
+        "properties": {
+            "location": {
+                "type": "string",
+                "description": "The city and state, e.g., San Francisco, CA"
+            },
+            "unit": {
+                "type": "string",
+                "enum": ["Celsius", "Fahrenheit"],
+                "description": "The temperature unit to use. Infer this from the user's location."
+            }
+        },
+        "required": ["location", "unit"]
+    },
+)
+
+registry.register(
+    "get_rain_probability",
+    cached_rain_probability(get_rain_probability, rain_cache, flight=rain_flight),
+    batch=rain_probabilities,
+    description="Get the probability of rain for a specific location",
+    parameters={
+        "type": "object",
+        "properties": {
+            "location": {
+                "type": "string",
+                "description": "The city and state, e.g., San Francisco, CA"
+            }
+        },
+        "required": ["location"]
+    },
+)
+
+
+def _batch_calls(locations, times, **extra):
+    if times is not None and len(times) != len(locations):
+        raise ValueError("'times' must have one entry per location.")
+    return [
+        {"location": location, "time": times[i] if times else None, **extra}
+        for i, location in enumerate(locations)
+    ]
+
+
+def _batch_output(calls, results, field):
+    # Compact JSON: one object per location, with the value or the error
+    entries = []
+    for call, result in zip(calls, results):
+        entry = {"location": call["location"]}
+        if call["time"] is not None:
+            entry["time"] = call["time"]
+        if isinstance(result, Exception):
+            entry["error"] = str(result)
+        else:
+            entry[field] = result
+        entries.append(entry)
+    return json.dumps(entries, ensure_ascii=False, separators=(",", ":"))
+
+
+@registry.register(
+    "get_current_temperatures",
+    description="Get the temperature for several locations at once, optionally at given times. "
+                "Prefer this over repeated get_current_temperature calls when comparing places.",
+    parameters={
+        "type": "object",
+        "properties": {
+            "locations": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "The cities and states, e.g., [\"San Francisco, CA\", \"Paris, France\"]"
+            },
+            "unit": {
+                "type": "string",
+                "enum": ["Celsius", "Fahrenheit"],
+                "description": "The temperature unit to use for every location. Infer this from the user's locations."
+            },
+            "times": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Optional ISO 8601 time for each location, in the same order; defaults to now."
+            }
+        },
+        "required": ["locations", "unit"]
+    },
+)
+def get_temperatures_tool(locations, unit=None, times=None):
+    calls = _batch_calls(locations, times, unit=unit)
+    return _batch_output(calls, temperatures(calls), "temperature")
+
+
+@registry.register(
+    "get_rain_probabilities",
+    description="Get the probability of rain for several locations at once, optionally at given times.",
+    parameters={
+        "type": "object",
+        "properties": {
+            "locations": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "The cities and states, e.g., [\"San Francisco, CA\", \"Paris, France\"]"
+            },
+            "times": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Optional ISO 8601 time for each location, in the same order; defaults to now."
+            }
+        },
+        "required": ["locations"]
+    },
+)
+def get_rain_probabilities_tool(locations, times=None):
+    calls = _batch_calls(locations, times)
+    return _batch_output(calls, rain_probabilities(calls), "probability")
+
+
+def new_executor(**kwargs):
+    """
+    Returns a ToolExecutor for the weather tools that fuses same-tool calls
+    into one batch call. Keyword arguments go to ToolExecutor.
+    """
+    return ToolExecutor(
+        registry.handle_tool_call,
+        call_batch=registry.handle_tool_calls,
+        can_batch=registry.supports_batch,
+        **kwargs,
+    )
+
+
+def new_answer_cache(path=None, **kwargs):
+    """
+    Returns an AnswerCache that checks answers by replaying their weather
+    tool calls, or None when no path is given and ANSWER_CACHE_PATH is unset.
+    Keyword arguments go to AnswerCache.
+    """
+    path = path or DEFAULT_ANSWER_CACHE_PATH
+    if not path:
+        return None
+    return AnswerCache(registry.call, path=path, **kwargs)
+
+
+def cache_stats():
+    """
+    Returns the hit/miss/eviction counters of the tool result caches.
+    """
+    return {
+        "get_current_temperature": temperature_cache.stats(),
+        "get_rain_probability": rain_cache.stats(),
+    }
+
+
+def coalescing_stats():
+    """
+    Returns how many backend calls were shared between concurrent callers.
+    """
+    return {
+        "get_current_temperature": temperature_flight.stats(),
+        "get_rain_probability": rain_flight.stats(),
+    }
@@ -0,0 +1,542 @@
+import argparse
+import asyncio
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+import uuid
+
+from dotenv import load_dotenv
+
+if __name__ == "__main__":
+    # Project modules read their settings from the environment when they are
+    # imported; spawned workers inherit the environment loaded here
+    load_dotenv()
+
+from assistant_cache import CachedAssistant, get_cached_assistant
+from chat_server import (DEFAULT_MAX_CONCURRENT_RUNS, DEFAULT_MAX_SESSIONS, DEFAULT_QUEUE_SIZE, ChatServer,
+                         read_request, send_json)
+from http_client import new_async_client, new_client
+from weather_tools import INSTRUCTIONS, MODEL, new_answer_cache, registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = int(os.getenv("CHAT_WORKERS", str(os.cpu_count() or 1)))
+DEFAULT_DRAIN_TIMEOUT = float(os.getenv("CHAT_DRAIN_TIMEOUT", "30"))  # seconds a stopping worker may finish its turns
+DEFAULT_CONNECT_TIMEOUT = 30.0  # seconds the dispatcher waits for a restarting worker
+DEFAULT_WORKER_PORT = 8100      # first worker port where Unix sockets are not available
+RESTART_DELAY = 0.5             # seconds before restarting a crashed worker, doubled on every quick crash
+MAX_RESTART_DELAY = 30.0
+HEALTHY_UPTIME = 30.0           # a worker up this long has its restart delay reset
+
+
+def shard(thread_id, workers):
+    """
+    Returns the index of the worker that owns a thread.
+
+    Uses a stable hash, so every dispatcher (and every restart) agrees.
+    """
+    digest = hashlib.sha1(thread_id.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % workers
+
+
+def worker_address(socket_dir, index):
+    """
+    Returns where worker `index` listens: a Unix socket path, or a local (host, port).
+    """
+    if hasattr(socket, "AF_UNIX"):
+        return os.path.join(socket_dir, f"worker-{index}.sock")
+    return ("127.0.0.1", DEFAULT_WORKER_PORT + index)
+
+
+async def _open_connection(address):
+    if isinstance(address, str):
+        return await asyncio.open_unix_connection(address)
+    return await asyncio.open_connection(*address)
+
+
+async def _start_server(handler, address):
+    if isinstance(address, str):
+        if os.path.exists(address):
+            os.unlink(address)  # left behind by a worker that crashed
+        return await asyncio.start_unix_server(handler, address)
+    return await asyncio.start_server(handler, *address)
+
+
+# --- worker -------------------------------------------------------------------
+
+def run_worker(index, address, options):
+    """
+    Entry point of a worker process: serves the chat engine on `address`.
+
+    SIGTERM (or SIGINT) drains the worker: it stops accepting connections,
+    lets the turns being streamed finish for up to `drain_timeout` seconds
+    and exits.
+    """
+    logging.basicConfig(level=options["log_level"],
+                        format=f"[worker {index}] %(levelname)s %(name)s: %(message)s")
+    asyncio.run(_serve_worker(index, address, options))
+
+
+async def _serve_worker(index, address, options):
+    server = ChatServer(
+        new_async_client(api_key=os.getenv("OPENAI_API_KEY"), base_url=options["base_url"]),
+        # Resolved once by the supervisor, so workers start without an API call
+        CachedAssistant(options["assistant_id"], MODEL, INSTRUCTIONS),
+        max_concurrent_runs=options["max_concurrent_runs"],
+        max_sessions=options["max_sessions"],
+        queue_size=options["queue_size"],
+        answer_cache=new_answer_cache(options["answer_cache"]),
+    )
+    listener = await _start_server(server.handle_connection, address)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    logger.info(f"Worker {index} (pid {os.getpid()}) serving on {address}")
+    await stop.wait()
+
+    listener.close()
+    logger.info(f"Worker {index} draining {server.active_turns} turn(s)")
+    if not await server.drain(options["drain_timeout"]):
+        logger.warning(f"Worker {index} stopped with {server.active_turns} turn(s) still streaming")
+
+
+# --- supervisor -----------------------------------------------------------------
+
+class WorkerSupervisor:
+    """
+    Runs the chat engine in `workers` processes and keeps them running.
+
+    Each worker is a ChatServer listening on its own local socket, so JSON
+    and SSE parsing, event handling and tool calls of different workers run
+    on different cores instead of sharing one GIL. A worker that dies is
+    restarted on the same socket, after a delay that grows while it keeps
+    crashing. `drain_worker` and `rolling_restart` stop workers gracefully.
+
+    Workers call the API through their own AsyncOpenAI clients and are not
+    paced by RequestScheduler, which only admits the blocking calls of a
+    single process. Their load is bounded by `max_concurrent_runs` per
+    worker, so keep `workers * max_concurrent_runs` within the account's
+    rate limits.
+
+    Args:
+        workers: Number of worker processes.
+        options: Settings passed to every worker (see `worker_options`).
+        socket_dir: Directory for the workers' Unix sockets; a temporary one by default.
+        drain_timeout: Seconds a stopping worker may spend finishing its turns.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, options=None, socket_dir=None, drain_timeout=DEFAULT_DRAIN_TIMEOUT):
+        if workers < 1:
+            raise ValueError("At least one worker is needed.")
+        self.workers = workers
+        self.options = dict(options or worker_options(), drain_timeout=drain_timeout)
+        self.drain_timeout = drain_timeout
+        self._own_socket_dir = socket_dir is None
+        self.socket_dir = socket_dir or tempfile.mkdtemp(prefix="weather-chat-")
+        self.addresses = [worker_address(self.socket_dir, index) for index in range(workers)]
+        # Spawned, not forked: the parent holds an event loop and HTTP connections
+        self._context = multiprocessing.get_context("spawn")
+        self.processes = [None] * workers
+        self.restarts = [0] * workers
+        self._started_at = [0.0] * workers
+        self._restart_delay = [RESTART_DELAY] * workers
+        self._restart_at = [None] * workers
+        self._draining = set()
+        self._stopping = False
+
+    def start(self):
+        for index in range(self.workers):
+            self.start_worker(index)
+
+    def start_worker(self, index):
+        process = self._context.Process(target=run_worker, args=(index, self.addresses[index], self.options),
+                                        name=f"chat-worker-{index}", daemon=True)
+        process.start()
+        self.processes[index] = process
+        self._started_at[index] = time.monotonic()
+        self._restart_at[index] = None
+        logger.info(f"Started worker {index} (pid {process.pid})")
+
+    async def monitor(self, interval=0.5):
+        """
+        Restarts workers that exited without being asked to, until `stop` is called.
+        """
+        while not self._stopping:
+            now = time.monotonic()
+            for index, process in enumerate(self.processes):
+                if process is None or process.is_alive() or index in self._draining:
+                    continue
+                if self._restart_at[index] is None:
+                    if now - self._started_at[index] >= HEALTHY_UPTIME:
+                        self._restart_delay[index] = RESTART_DELAY
+                    delay = self._restart_delay[index]
+                    self._restart_delay[index] = min(MAX_RESTART_DELAY, delay * 2)
+                    self._restart_at[index] = now + delay
+                    logger.warning(f"Worker {index} exited with code {process.exitcode}; restarting in {delay:.1f}s")
+                elif now >= self._restart_at[index]:
+                    self.restarts[index] += 1
+                    self.start_worker(index)
+            await asyncio.sleep(interval)
+
+    async def _wait_for_exit(self, process):
+        await asyncio.to_thread(process.join, self.drain_timeout + 5)
+        if process.is_alive():
+            logger.warning(f"Worker pid {process.pid} did not drain in time; killing it")
+            process.kill()
+            await asyncio.to_thread(process.join)
+
+    async def drain_worker(self, index, restart=True):
+        """
+        Lets a worker finish the turns it is streaming, then stops it.
+
+        Its sessions wait in the dispatcher until it is back, when `restart` is set.
+        """
+        process = self.processes[index]
+        self._draining.add(index)
+        try:
+            if process is not None and process.is_alive():
+                process.terminate()
+                await self._wait_for_exit(process)
+            if restart and not self._stopping:
+                self.start_worker(index)
+        finally:
+            self._draining.discard(index)
+
+    async def rolling_restart(self):
+        """
+        Drains and restarts the workers one at a time, so only one shard pauses at once.
+        """
+        for index in range(self.workers):
+            await self.drain_worker(index)
+
+    async def stop(self):
+        """
+        Drains every worker at the same time and removes their sockets.
+        """
+        self._stopping = True
+        running = [process for process in self.processes if process is not None and process.is_alive()]
+        for process in running:
+            process.terminate()
+        await asyncio.gather(*(self._wait_for_exit(process) for process in running))
+        if self._own_socket_dir:
+            shutil.rmtree(self.socket_dir, ignore_errors=True)
+
+    def stats(self):
+        return [
+            {
+                "worker": index,
+                "pid": process.pid if process is not None else None,
+                "alive": process is not None and process.is_alive(),
+                "draining": index in self._draining,
+                "restarts": self.restarts[index],
+            }
+            for index, process in enumerate(self.processes)
+        ]
+
+
+# --- dispatcher -----------------------------------------------------------------
+
+def _unknown_session(response):
+    """
+    Tells whether the rest of a worker's 404 response (headers and body) is
+    the worker not knowing the session, rather than an unknown path.
+    """
+    _, _, body = response.partition(b"\r\n\r\n")
+    try:
+        return json.loads(body).get("error") == "Unknown session."
+    except (ValueError, AttributeError):
+        return False
+
+
+class Dispatcher:
+    """
+    Front end that routes each session to the worker owning its thread.
+
+    A new session's thread is created here, so its worker can be chosen by
+    hashing the thread ID; every later request of the session goes to that
+    same worker. Responses, including SSE streams, are relayed as they
+    arrive. When a worker has restarted and no longer knows a session, it is
+    handed the thread again; the conversation itself lives in the thread,
+    and only that worker's in-memory state for it (earlier questions used
+    as answer cache context) is lost.
+
+    At most `max_sessions` sessions are tracked. Opening one more closes
+    the least recently used session, here and on its worker. Hashing does
+    not spread threads evenly, so a single worker can fill up first; its
+    own least recently used session then makes room. A thread whose worker
+    still refuses the session is deleted again.
+
+    Args:
+        client: AsyncOpenAI client, used to create threads.
+        supervisor: The WorkerSupervisor whose workers requests are sent to.
+        connect_timeout: Seconds to wait for a worker that is restarting.
+        max_sessions: Maximum number of open sessions; by default the workers' combined `max_sessions`.
+    """
+
+    def __init__(self, client, supervisor, connect_timeout=DEFAULT_CONNECT_TIMEOUT, max_sessions=None):
+        self.client = client
+        self.supervisor = supervisor
+        self.connect_timeout = connect_timeout
+        if max_sessions is None:
+            max_sessions = supervisor.workers * supervisor.options.get("max_sessions", DEFAULT_MAX_SESSIONS)
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()  # session ID -> thread ID, least recently used first
+        self.routed = [0] * supervisor.workers
+
+    def worker_for(self, thread_id):
+        return shard(thread_id, self.supervisor.workers)
+
+    async def _open_worker(self, index):
+        # Retry while the worker is restarting or draining
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                return await _open_connection(self.supervisor.addresses[index])
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise ConnectionRefusedError(f"Worker {index} is unavailable.")
+                await asyncio.sleep(0.1)
+
+    async def _send(self, index, method, path, body=b""):
+        reader, upstream = await self._open_worker(index)
+        upstream.write(
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: worker-{index}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await upstream.drain()
+        return reader, upstream
+
+    async def _call(self, index, method, path, payload=None):
+        # A request with a JSON response, read whole
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        reader, upstream = await self._send(index, method, path, body)
+        try:
+            response = await reader.read()
+        finally:
+            upstream.close()
+        head, _, body = response.partition(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        return status, json.loads(body or b"{}")
+
+    async def _evict(self, worker=None):
+        # The least recently used session, optionally only among one worker's
+        if worker is None:
+            session_id, thread_id = self.sessions.popitem(last=False)
+        else:
+            session_id = next((session_id for session_id, thread_id in self.sessions.items()
+                               if self.worker_for(thread_id) == worker), None)
+            if session_id is None:
+                return False
+            thread_id = self.sessions.pop(session_id)
+        index = self.worker_for(thread_id)
+        logger.info(f"Closing session {session_id}, the least recently used of {self.max_sessions}")
+        try:
+            await self._call(index, "DELETE", f"/sessions/{session_id}")
+        except (OSError, ValueError) as e:
+            # The worker forgets it on its next restart anyway
+            logger.warning(f"Could not close session {session_id} on worker {index}: {e}")
+        return True
+
+    async def _delete_thread(self, thread_id):
+        try:
+            await self.client.beta.threads.delete(thread_id)
+        except Exception as e:
+            logger.warning(f"Failed to delete thread {thread_id}: {e}")
+
+    async def create_session(self):
+        while self.sessions and len(self.sessions) >= self.max_sessions:
+            await self._evict()
+        thread = await self.client.beta.threads.create()
+        index = self.worker_for(thread.id)
+        request = {"thread_id": thread.id, "session_id": uuid.uuid4().hex}
+        try:
+            status, payload = await self._call(index, "POST", "/sessions", request)
+            if status == 503 and payload.get("error") == "Too many open sessions." and await self._evict(index):
+                status, payload = await self._call(index, "POST", "/sessions", request)
+        except Exception:
+            await self._delete_thread(thread.id)
+            raise
+        if status == 201:
+            self.sessions[payload["session_id"]] = thread.id
+        else:
+            # Nobody will ever use the thread
+            await self._delete_thread(thread.id)
+        return status, payload
+
+    async def _relay(self, index, method, path, body, writer, session_id):
+        for attempt in range(2):
+            reader, upstream = await self._send(index, method, path, body)
+            try:
+                status_line = await reader.readline()
+                if attempt == 0 and status_line.split(b" ", 2)[1:2] == [b"404"]:
+                    rest = await reader.read()
+                    if not _unknown_session(rest):
+                        writer.write(status_line + rest)
+                        await writer.drain()
+                        return
+                    # The worker restarted since the session was opened
+                    logger.info(f"Handing session {session_id} back to worker {index}")
+                    status, payload = await self._call(index, "POST", "/sessions",
+                                                       {"thread_id": self.sessions[session_id],
+                                                        "session_id": session_id})
+                    if status != 201:
+                        await send_json(writer, status, payload)
+                        return
+                    continue
+                writer.write(status_line)
+                while True:
+                    chunk = await reader.read(65536)
+                    if not chunk:
+                        break
+                    writer.write(chunk)
+                    # Paces the worker to this client, as ChatServer does for its own clients
+                    await writer.drain()
+                return
+            finally:
+                upstream.close()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            request = await read_request(reader)
+            if request is None:
+                return
+            method, path, _, body = request
+            parts = [part for part in path.split("?", 1)[0].split("/") if part]
+
+            if method == "POST" and parts == ["sessions"]:
+                status, payload = await self.create_session()
+                await send_json(writer, status, payload)
+            elif method == "GET" and parts == ["workers"]:
+                await send_json(writer, 200, {"workers": self.supervisor.stats(), "routed": self.routed,
+                                              "sessions": len(self.sessions)})
+            elif len(parts) >= 2 and parts[0] == "sessions":
+                session_id = parts[1]
+                thread_id = self.sessions.get(session_id)
+                if thread_id is None:
+                    await send_json(writer, 404, {"error": "Unknown session."})
+                    return
+                self.sessions.move_to_end(session_id)
+                index = self.worker_for(thread_id)
+                self.routed[index] += 1
+                await self._relay(index, method, path, body, writer, session_id)
+                if method == "DELETE" and len(parts) == 2:
+                    self.sessions.pop(session_id, None)
+            else:
+                await send_json(writer, 404, {"error": "Not found."})
+        except ConnectionRefusedError as e:
+            await send_json(writer, 503, {"error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logger.exception("Request failed")
+            await send_json(writer, 502, {"error": str(e)})
+        finally:
+            writer.close()
+
+
+def worker_options(assistant_id=None, base_url=None, max_concurrent_runs=DEFAULT_MAX_CONCURRENT_RUNS,
+                   max_sessions=DEFAULT_MAX_SESSIONS, queue_size=DEFAULT_QUEUE_SIZE, answer_cache=None,
+                   log_level=logging.INFO):
+    """
+    Returns the settings every worker's ChatServer is built with.
+
+    `max_concurrent_runs` and `max_sessions` apply to each worker.
+    """
+    return {
+        "assistant_id": assistant_id,
+        "base_url": base_url,
+        "max_concurrent_runs": max_concurrent_runs,
+        "max_sessions": max_sessions,
+        "queue_size": queue_size,
+        "answer_cache": answer_cache,
+        "log_level": log_level,
+    }
+
+
+async def serve(supervisor, dispatcher, host="127.0.0.1", port=8000):
+    """
+    Starts the workers and serves the dispatcher until SIGTERM or SIGINT.
+
+    SIGHUP drains and restarts the workers one at a time.
+    """
+    supervisor.start()
+    server = await asyncio.start_server(dispatcher.handle_connection, host, port)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    if hasattr(signal, "SIGHUP"):
+        loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.ensure_future(supervisor.rolling_restart()))
+    monitor = asyncio.create_task(supervisor.monitor())
+    logger.info(f"Dispatching to {supervisor.workers} workers on http://{host}:{port}")
+
+    await stop.wait()
+    logger.info("Shutting down; draining workers")
+    server.close()
+    monitor.cancel()
+    await supervisor.stop()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve the weather assistant from several worker processes, sharded by thread.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="Worker processes (default: CHAT_WORKERS or the number of CPUs)")
+    parser.add_argument("--socket-dir", default=None, help="Directory for the workers' sockets (default: a temp dir)")
+    parser.add_argument("--drain-timeout", type=float, default=DEFAULT_DRAIN_TIMEOUT)
+    parser.add_argument("--assistant-id", default=None)
+    parser.add_argument("--max-concurrent-runs", type=int, default=DEFAULT_MAX_CONCURRENT_RUNS, help="Per worker")
+    parser.add_argument("--max-sessions", type=int, default=DEFAULT_MAX_SESSIONS, help="Per worker")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE)
+    parser.add_argument("--answer-cache", default=None,
+                        help="SQLite file of answers shared by the workers (default: ANSWER_CACHE_PATH, if set)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    try:
+        assistant = get_cached_assistant(
+            new_client(api_key=api_key),
+            model=MODEL,
+            instructions=INSTRUCTIONS,
+            tools=registry.tools_payload(),
+            assistant_id=args.assistant_id,
+        )
+    except Exception as init_e:
+        print(f"Failed to initialize client or assistant: {init_e}")
+        sys.exit(1)
+
+    supervisor = WorkerSupervisor(
+        args.workers,
+        worker_options(
+            assistant_id=assistant.id,
+            max_concurrent_runs=args.max_concurrent_runs,
+            max_sessions=args.max_sessions,
+            queue_size=args.queue_size,
+            answer_cache=args.answer_cache,
+        ),
+        socket_dir=args.socket_dir,
+        drain_timeout=args.drain_timeout,
+    )
+    dispatcher = Dispatcher(new_async_client(api_key=api_key), supervisor)
+    asyncio.run(serve(supervisor, dispatcher, args.host, args.port))